@@ -0,0 +1,76 @@
+import argparse
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+import rocketxg as rxg
+from rocketxg.simulator.ball_simulator import BallSimulator, pack_states, shot_verdicts
+
+
+def hit_states(replay: ParsedReplay, context: rxg.ReplayContext):
+    """Packed ball states and hitter teams of every hit by a player on a team."""
+    frames = []
+    teams = []
+    for hit in replay.analyzer["hits"]:
+        is_orange = context.teams.get(hit["player_unique_id"])
+        if isinstance(is_orange, bool):
+            frames.append(hit["frame_number"])
+            teams.append(is_orange)
+    return pack_states(context, frames), np.array(teams, dtype=bool)
+
+
+def timed(simulator: BallSimulator, states, teams, time_s, adaptive):
+    start = time.perf_counter()
+    results = simulator.simulate_states(states, teams, time_s, adaptive=adaptive)
+    return results, time.perf_counter() - start
+
+
+def run(replay_paths, time_s: float = 3):
+    """
+    Simulates every hit of the replays with per-tick and adaptive stepping and
+    compares the outcomes. Returns the number of hits whose verdicts differ.
+    """
+    simulator = BallSimulator()
+    ticks = round(simulator.arena.tick_rate * time_s)
+    total_hits = 0
+    mismatches = 0
+    per_tick_time = 0
+    adaptive_time = 0
+    for path in replay_paths:
+        replay = ParsedReplay.load(path)
+        context = rxg.ReplayContext(replay)
+        states, teams = hit_states(replay, context)
+
+        exact, exact_time = timed(simulator, states, teams, time_s, adaptive=False)
+        fast, fast_time = timed(simulator, states, teams, time_s, adaptive=True)
+        exact_shot, exact_goal = shot_verdicts(exact, ticks)
+        fast_shot, fast_goal = shot_verdicts(fast, ticks)
+        differs = (exact_shot != fast_shot) | (exact_goal != fast_goal)
+
+        total_hits += len(states)
+        mismatches += int(differs.sum())
+        per_tick_time += exact_time
+        adaptive_time += fast_time
+        print(
+            f"{Path(path).name}: {len(states)} hits, {int(exact_shot.sum())} shots, "
+            f"{int(differs.sum())} mismatches, "
+            f"per-tick {exact_time:.2f}s, adaptive {fast_time:.2f}s"
+        )
+
+    print(f"Hits: {total_hits}, mismatches: {mismatches}")
+    if adaptive_time > 0:
+        print(
+            f"Per-tick {per_tick_time:.2f}s, adaptive {adaptive_time:.2f}s "
+            f"({per_tick_time / adaptive_time:.1f}x)"
+        )
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("replays", type=str, nargs="+")
+    parser.add_argument("-t", "--time", type=float, default=3)
+    args = parser.parse_args()
+    mismatches = run(args.replays, args.time)
+    sys.exit(1 if mismatches else 0)
@@ -1,54 +1,356 @@
+import argparse
+import hashlib
 import os
 import sys
-import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import List, Tuple
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
 import rocketxg as rxg
 import pandas as pd
-from rocketxg.hit_analysis import get_shooter_analysis, get_opponent_analysis, get_ball_analysis
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from database.aggregates import AggregateStore, ReplayStats, canonical_player_ids, replay_stats
+from database.builder import parse_directory_structure
+from database.events import EventStore, event_rows
+from database.models import ReplayCatalog
+from rocketxg.dataset import ShotDataset, UNKNOWN
+from rocketxg.features import FeatureCache, extract_features, find_shots
+from rocketxg.frame_store import CONTEXT_COLUMNS, FrameStore
+from rocketxg.possessions.possession import PossessionAnalyzer
+from rocketxg.score import XGScorer, assign_xg, load_scorer
+from rocketxg.simulator.cache import SimulationCache
+from rocketxg.simulator.prefilter import ShotPrefilter
 
-def run(replay_dir: str, out_dir: str):
+# Simulation cache, feature cache, frame store and xG model of the current process,
+# set up by _init_worker
+_sim_cache: SimulationCache | None = None
+_feature_cache: FeatureCache | None = None
+_frame_store: FrameStore | None = None
+_scorer: XGScorer | None = None
+# Whether possession chains are analyzed for the aggregates and the event tables
+_analyze_chains: bool = False
+
+# Rows of the possession_chains, possessions and hits tables of a replay
+EventRows = Tuple[List[dict], List[dict], List[dict]]
+ReplayResult = Tuple[pd.DataFrame, ReplayStats | None, EventRows | None]
+
+
+@dataclass
+class ReplayJob:
+    path: Path
+    replay_hash: str | None  # None until a worker hashes the file
+    season: str
+    event: str
+    team1: str | None = None
+    team2: str | None = None
+
+
+def jobs_from_directory(replay_dir: str):
+    """
+    Replays found on disk, placed in the RLCS hierarchy from their path. They are
+    hashed by the workers, so the corpus isn't read up front.
+    """
     for path in Path(replay_dir).rglob('*.replay'):
-        if path.is_dir():
+        if not path.is_file():
             continue
-        print(f"Path: {path}")
-        os.makedirs(out_dir, exist_ok=True)
-        out_path = Path(out_dir) / "data.parquet"
-        replay = ParsedReplay.load(path)
-        hits = rxg.generate_hits_table(replay)
-        players = list(hits.keys())
-        game_id = uuid.uuid4()
-        dataset = []
-        for player in players:
-            player.generate_possessions()
-            player.generate_shots(replay, time_s=3)
-            for shot, data in player.shots.items():
-                game_state = {
-                    "game_id": game_id.hex,
-                    "is_goal": shot.is_goal
-                }
-                ball_data = get_ball_analysis(shot, replay)
-                game_state.update(ball_data)
-                opponent_data = get_opponent_analysis(shot, players, replay)
-                game_state.update(opponent_data)
-                shooter_data = get_shooter_analysis(shot, replay)
-                game_state.update(shooter_data)
-                dataset.append(game_state)
-        
-        dataset_df = pd.DataFrame(dataset)
         try:
-            if out_path.exists():
-                dataset_df.to_parquet(out_path, engine='fastparquet', append=True)
-            else:
-                dataset_df.to_parquet(out_path, engine='fastparquet')
-        except Exception as e:
-            Warning(e)
-            
-            
-            
-            
-    
+            hierarchy = parse_directory_structure(path)
+        except ValueError:
+            hierarchy = {}
+        yield ReplayJob(
+            path=path,
+            replay_hash=None,
+            season=hierarchy.get("season_name") or UNKNOWN,
+            event=hierarchy.get("event_name") or UNKNOWN
+        )
+
+
+def jobs_from_catalog(database_url: str):
+    """Parsed replays registered by RLCSParser."""
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        rows = session.execute(select(
+            ReplayCatalog.parsed_path,
+            ReplayCatalog.replay_hash,
+            ReplayCatalog.season_name,
+            ReplayCatalog.event_name,
+            ReplayCatalog.team1,
+            ReplayCatalog.team2
+        )).all()
+    for parsed_path, replay_hash, season, event, team1, team2 in rows:
+        yield ReplayJob(
+            path=Path(parsed_path),
+            replay_hash=replay_hash,
+            season=season or UNKNOWN,
+            event=event or UNKNOWN,
+            team1=team1,
+            team2=team2
+        )
+
+
+def _init_worker(
+    sim_cache_path: str | None,
+    feature_cache_path: str | None = None,
+    frame_dir: str | None = None,
+    model_path: str | None = None,
+    analyze_chains: bool = False
+):
+    global _sim_cache, _feature_cache, _frame_store, _scorer, _analyze_chains
+    # Everything is set, so serial runs don't keep the setup of an earlier run
+    _sim_cache = SimulationCache(sim_cache_path) if sim_cache_path is not None else None
+    _feature_cache = FeatureCache(feature_cache_path) if feature_cache_path is not None else None
+    _frame_store = FrameStore(frame_dir) if frame_dir is not None else None
+    _scorer = load_scorer(model_path) if model_path is not None else None
+    _analyze_chains = analyze_chains
+
+
+def parsed_folder(path: Path) -> Path:
+    """
+    Folder holding the files of a parsed replay. Catalogs written before
+    _parse_replay stored the folder itself hold its parent (parsed_dir/<hash>),
+    which only contains the folder named after the replay file.
+    """
+    if not path.is_dir() or (path / "metadata.json").exists():
+        return path
+    folders = [child for child in path.iterdir() if child.is_dir()]
+    return folders[0] if len(folders) == 1 else path
+
+
+def load_context(job: ReplayJob) -> rxg.ReplayContext:
+    """
+    Context of a replay, memory-mapped from the frame store when it holds the
+    replay. Otherwise the replay is loaded and, with a frame store, written to it.
+    """
+    if _frame_store is not None and job.replay_hash in _frame_store:
+        return rxg.ReplayContext.from_frames(
+            _frame_store.load(job.replay_hash, CONTEXT_COLUMNS)
+        )
+    replay = ParsedReplay.load(parsed_folder(job.path))
+    if _frame_store is not None:
+        _frame_store.write(job.replay_hash, replay)
+    return rxg.ReplayContext(replay)
+
+
+def _process_job(job: ReplayJob) -> Tuple[ReplayJob, ReplayResult]:
+    """Hashes the replay file if needed and processes it, returns the hashed job too."""
+    if job.replay_hash is None:
+        with open(job.path, "rb") as file:
+            job = replace(job, replay_hash=hashlib.file_digest(file, "sha256").hexdigest())
+    return job, process_replay(job)
+
+
+def process_replay(job: ReplayJob) -> ReplayResult:
+    """
+    Load -> hits -> possessions -> shot simulation -> features for one replay.
+
+    With a feature cache only the stale feature groups are computed and the replay
+    isn't loaded at all when everything is cached. Also returns what the replay
+    contributes to the player and team aggregates, or None when its shots weren't
+    detected again. The aggregates get the replay's possession chains when they
+    are analyzed and the xG of its shots when there is a model. The chains are
+    also returned as event_rows, or None when they weren't analyzed.
+    """
+    detected = {}
+
+    def detect_shots(context):
+        # The chain analysis simulates many of the hits find_shots does, sharing a
+        # cache (an in-memory one for this replay if needed) simulates them once
+        cache = _sim_cache
+        if cache is None and _analyze_chains:
+            cache = SimulationCache()
+        shots, players = find_shots(context, sim_cache=cache)
+        chains = None
+        if _analyze_chains:
+            analyzer = PossessionAnalyzer(prefilter=ShotPrefilter(), cache=cache)
+            _, _, chains = analyzer.analyze_replay(context.replay, context)
+        detected.update(context=context, shots=shots, players=players, chains=chains)
+        return shots
+
+    if _feature_cache is not None:
+        dataset_df = _feature_cache.features(
+            job.replay_hash, lambda: load_context(job), detect_shots
+        )
+    else:
+        context = load_context(job)
+        dataset_df = extract_features(context, detect_shots(context))
+    stats = events = None
+    if detected:
+        xg = None
+        if _scorer is not None:
+            shot_xg = _scorer.predict_proba(_scorer.feature_matrix(dataset_df))
+            if detected["chains"] is not None:
+                assign_xg(detected["chains"], detected["shots"], shot_xg)
+            shots = detected["shots"]
+            xg = dict(zip(
+                zip(shots["frame"].tolist(), shots["shooter_id"].tolist()), shot_xg.tolist()
+            ))
+        stats = replay_stats(
+            detected["context"], detected["players"], xg, detected["chains"]
+        )
+        if detected["chains"] is not None:
+            events = event_rows(
+                job.replay_hash,
+                detected["chains"],
+                canonical_player_ids(detected["context"].replay.metadata["players"])
+            )
+    dataset_df.insert(0, "replay_hash", job.replay_hash)
+    dataset_df["season"] = job.season
+    dataset_df["event"] = job.event
+    return dataset_df, stats, events
+
+
+class DatasetWriter:
+    """Buffers per-replay results and writes them to a ShotDataset in sized row groups."""
+    def __init__(self, dataset: ShotDataset, row_group_size: int = 100_000):
+        self.dataset = dataset
+        self.row_group_size = row_group_size
+        self.buffer = []
+        self.buffered_rows = 0
+
+    def write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        self.buffer.append(df)
+        self.buffered_rows += len(df)
+        if self.buffered_rows >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        df = pd.concat(self.buffer, ignore_index=True)
+        self.buffer = []
+        self.buffered_rows = 0
+        self.dataset.write(df, row_group_size=self.row_group_size)
+
+
+def _process_all(
+    jobs, workers: int,
+    sim_cache_path: str | None = None,
+    feature_cache_path: str | None = None,
+    frame_dir: str | None = None,
+    model_path: str | None = None,
+    analyze_chains: bool = False
+):
+    """
+    Yields (job, ReplayResult) or (job, Exception) for every replay, the job
+    holding its hash unless it failed.
+    """
+    initargs = (sim_cache_path, feature_cache_path, frame_dir, model_path, analyze_chains)
+    if workers <= 1:
+        _init_worker(*initargs)
+        for job in jobs:
+            try:
+                yield _process_job(job)
+            except Exception as e:
+                yield job, e
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=initargs
+    ) as pool:
+        futures = {pool.submit(_process_job, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+def run(
+    replay_dir: str | None,
+    out_dir: str,
+    workers: int = 1,
+    row_group_size: int = 100_000,
+    database_url: str | None = None,
+    sim_cache_path: str | None = None,
+    feature_cache_path: str | None = None,
+    frame_dir: str | None = None,
+    model_path: str | None = None
+):
+    """
+    Runs the pipeline and writes the shots to a ShotDataset in out_dir.
+
+    Replays come from the replay catalog when database_url is given, otherwise
+    from the .replay files in replay_dir. They are processed in a pool of
+    workers while this process is the only writer. Simulation results are shared
+    through the SQLite file at sim_cache_path when given, so re-runs over the same
+    replays barely touch RocketSim. Features are cached per replay in
+    feature_cache_path when given, so only new replays and extractors whose version
+    changed are computed. Replays are memory-mapped from the FrameStore in
+    frame_dir when given, and written to it the first time. With a database the
+    player and team aggregates are updated for every replay whose shots were
+    detected, replacing what it contributed before: teams are named after the
+    catalog match, chains are analyzed and shots are scored with the xG model at
+    model_path when given. The chains, possessions and hits of the replay are
+    stored with the EventStore too.
+    Returns the replays that failed.
+    """
+    if database_url:
+        jobs = list(jobs_from_catalog(database_url))
+    else:
+        jobs = list(jobs_from_directory(replay_dir))
+    dataset = ShotDataset(out_dir)
+    writer = DatasetWriter(dataset, row_group_size)
+    session = None
+    if database_url:
+        engine = create_engine(database_url)
+        aggregates = AggregateStore(engine.dialect.name)
+        event_store = EventStore(engine)
+        session = Session(engine)
+    failures = {}
+    # Copies of the same replay under other paths are only written once
+    written = set()
+    for job, result in _process_all(
+        jobs, workers, sim_cache_path, feature_cache_path, frame_dir,
+        model_path, analyze_chains=session is not None
+    ):
+        if isinstance(result, Exception):
+            failures[job.path] = result
+            print(f"Failed {job.path}: {result}", file=sys.stderr)
+            continue
+        if job.replay_hash in written:
+            print(f"Skipping duplicate replay: {job.path}")
+            continue
+        written.add(job.replay_hash)
+        print(f"Path: {job.path}")
+        shots_df, stats, events = result
+        if shots_df.empty:
+            dataset.remove(job.season, job.event, [job.replay_hash])
+        writer.write(shots_df)
+        if session is not None and stats is not None:
+            stats = aggregates.name_teams(session, stats, (job.team1, job.team2))
+            aggregates.ingest(session, job.replay_hash, stats)
+            session.commit()
+        if session is not None and events is not None:
+            event_store.write_rows(job.replay_hash, events)
+    writer.flush()
+    if session is not None:
+        session.close()
+    dataset.compact(target_rows=row_group_size)
+
+    print(f"Processed {len(jobs) - len(failures)}/{len(jobs)} replays into {out_dir}")
+    for path, error in failures.items():
+        print(f"  {path}: {error!r}", file=sys.stderr)
+    return failures
+
+
 if __name__ == "__main__":
-    replay_dir = sys.argv[1]
-    out_dir = sys.argv[2]
-    run(replay_dir, out_dir)
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("replay_dir", type=str, nargs="?")
+    parser.add_argument("out_dir", type=str)
+    parser.add_argument("-u", "--dburl", type=str, default=None)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--row-group-size", type=int, default=100_000)
+    parser.add_argument("--sim-cache", type=str, default=None)
+    parser.add_argument("--feature-cache", type=str, default=None)
+    parser.add_argument("-f", "--frames", type=str, default=None)
+    parser.add_argument("-m", "--model", type=str, default=None)
+    args = parser.parse_args()
+    failures = run(
+        args.replay_dir, args.out_dir, args.workers, args.row_group_size, args.dburl,
+        args.sim_cache, args.feature_cache, args.frames, args.model
+    )
+    sys.exit(1 if failures else 0)
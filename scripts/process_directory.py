@@ -5,6 +5,10 @@ parser = argparse.ArgumentParser()
 parser.add_argument("-i", "--input", type=str)
 parser.add_argument("-o", "--output", type=str)
 parser.add_argument("-u", "--dburl", type=str)
+parser.add_argument("-w", "--workers", type=int, default=1)
+parser.add_argument("-f", "--frames", type=str, default=None)
 args = parser.parse_args()
-db = RLCSParser(database_url=args.dburl, parsed_dir=args.output)
-db.process_directory(args.input)
+db = RLCSParser(
+    database_url=args.dburl, parsed_dir=args.output, frame_dir=args.frames
+)
+db.process_directory(args.input, workers=args.workers)
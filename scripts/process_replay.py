@@ -2,27 +2,24 @@ import sys
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
 import rocketxg as rxg
 import pandas as pd
-from rocketxg.hit_analysis import get_shooter_analysis, get_opponent_analysis, get_ball_analysis
+from rocketxg.hit_analysis import get_shots_analysis
 
 def run(replay_dir: str):
     replay = ParsedReplay.load(replay_dir)
-    hits = rxg.generate_hits_table(replay)
+    context = rxg.ReplayContext(replay)
+    hits = rxg.generate_hits_table(replay, context)
     players = list(hits.keys())
-    dataset = []
+    shots = []
     for player in players:
         player.generate_possessions()
-        player.generate_shots(replay, time_s=3)
-        for shot, data in player.shots.items():
-            game_state = {}
-            ball_data = get_ball_analysis(shot, replay)
-            game_state.update(ball_data)
-            opponent_data = get_opponent_analysis(shot, players, replay)
-            game_state.update(opponent_data)
-            shooter_data = get_shooter_analysis(shot, replay)
-            game_state.update(shooter_data)
-            dataset.append(game_state)
+        player.generate_shots(replay, time_s=3, context=context)
+        shots.extend(player.shots)
     
-    dataset_df = pd.DataFrame(dataset)
+    dataset_df = get_shots_analysis(
+        [shot.frame for shot in shots],
+        [shot.player.id for shot in shots],
+        context
+    )
     dataset_df.to_parquet(replay_dir.removesuffix(".replay") + ".parquet")
             
             
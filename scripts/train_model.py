@@ -0,0 +1,47 @@
+import argparse
+from rocketxg.train import train, save_model
+
+
+def run(
+    dataset_dir: str,
+    model_dir: str,
+    season=None,
+    event=None,
+    num_boost_round: int = 5000,
+    early_stopping_rounds: int = 50,
+    validation_fraction: float = 0.2,
+    cache_dir: str | None = None,
+    version: str | None = None
+):
+    booster, features = train(
+        dataset_dir,
+        num_boost_round=num_boost_round,
+        early_stopping_rounds=early_stopping_rounds,
+        validation_fraction=validation_fraction,
+        season=season,
+        event=event,
+        cache_dir=cache_dir
+    )
+    path = save_model(booster, features, model_dir, version)
+    print(
+        f"Best iteration {booster.best_iteration} "
+        f"(validation logloss {booster.best_score:.5f}), saved to {path}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset_dir", type=str)
+    parser.add_argument("model_dir", type=str)
+    parser.add_argument("-s", "--season", type=str, nargs="*", default=None)
+    parser.add_argument("-e", "--event", type=str, nargs="*", default=None)
+    parser.add_argument("-n", "--rounds", type=int, default=5000)
+    parser.add_argument("--early-stopping", type=int, default=50)
+    parser.add_argument("--validation", type=float, default=0.2)
+    parser.add_argument("--cache-dir", type=str, default=None)
+    parser.add_argument("--version", type=str, default=None)
+    args = parser.parse_args()
+    run(
+        args.dataset_dir, args.model_dir, args.season, args.event,
+        args.rounds, args.early_stopping, args.validation, args.cache_dir, args.version
+    )
@@ -0,0 +1,297 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple, TYPE_CHECKING
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.orm import Session
+from .models import (
+    Player,
+    PlayerReplayStats,
+    PlayerAggregate,
+    TeamReplayStats,
+    TeamAggregate,
+    ReplayCatalog
+)
+from .queries import dialect_insert
+
+if TYPE_CHECKING:
+    from rocketxg.context import ReplayContext
+    from rocketxg.player import Player as ReplayPlayer
+    from rocketxg.possessions.base import PossessionChain
+
+PLAYER_STATS = (
+    "hits", "isolated_hits", "dribbles", "followups", "possessions",
+    "possession_time", "shots", "goals", "xg"
+)
+TEAM_STATS = PLAYER_STATS + ("chains", "chain_time")
+
+
+def canonical_player_id(player: dict) -> str:
+    """
+    Id of a replay metadata player that is the same in every replay: the platform
+    and online id, or the replay's unique_id for players without an online id.
+    """
+    online_id = player.get("online_id")
+    if online_id and str(online_id) != "0":
+        kind = player.get("online_id_kind")
+        return f"{kind}:{online_id}" if kind else str(online_id)
+    return str(player["unique_id"])
+
+
+def canonical_player_ids(players: Iterable[dict]) -> Dict[str, str]:
+    """unique_id to canonical id of replay.metadata["players"]."""
+    return {player["unique_id"]: canonical_player_id(player) for player in players}
+
+
+def roster_key(player_ids: Iterable[str]) -> str:
+    """Team name made of its canonical player ids, for teams without a known name."""
+    return ",".join(sorted(player_ids))
+
+
+@dataclass
+class ReplayStats:
+    """What one replay contributes to the aggregates.
+
+    Attributes:
+        players (dict): Canonical player id to name, platform, is_orange and PLAYER_STATS.
+        teams (dict): Team name to is_orange and TEAM_STATS.
+    """
+    players: Dict[str, dict] = field(default_factory=dict)
+    teams: Dict[str, dict] = field(default_factory=dict)
+
+
+def replay_stats(
+    context: "ReplayContext",
+    players: Iterable["ReplayPlayer"],
+    xg: Mapping[Tuple[int, str], float] | None = None,
+    chains: List["PossessionChain"] | None = None,
+    frames_per_second: float = 30
+) -> ReplayStats:
+    """
+    Folds the hits, possessions and shots of a replay's players (after
+    generate_possessions and generate_shots) into ReplayStats.
+
+    xg maps the (frame, shooter_id) of shots, as in find_shots, to their xG.
+    chains from PossessionAnalyzer add chain counts to the teams. Teams are named
+    by their roster, see AggregateStore.name_teams for their match names.
+    """
+    metadata = {player["unique_id"]: player for player in context.replay.metadata["players"]}
+    xg = xg or {}
+    stats = ReplayStats()
+    rosters = defaultdict(list)
+    for player in players:
+        player_metadata = metadata.get(player.id, {"unique_id": player.id})
+        player_id = canonical_player_id(player_metadata)
+        possessions = player.possessions
+        stats.players[player_id] = {
+            "name": player.name,
+            "platform": player_metadata.get("online_id_kind"),
+            "is_orange": player.is_orange,
+            "hits": len(player.all_hits),
+            "isolated_hits": len(player.isolated_hits),
+            "dribbles": len(player.dribbles),
+            "followups": len(player.followups),
+            "possessions": len(player.isolated_hits) + len(possessions),
+            "possession_time": sum(
+                possession[-1].frame - possession[0].frame for possession in possessions
+            ) / frames_per_second,
+            "shots": len(player.shots),
+            "goals": sum(hit.is_goal for hit in player.all_hits),
+            "xg": float(sum(xg.get((hit.frame, player.id), 0) for hit in player.shots))
+        }
+        rosters[player.is_orange].append(player_id)
+
+    team_chains = defaultdict(list)
+    for chain in chains or []:
+        if chain.team is not None:
+            team_chains[bool(chain.team)].append(chain)
+    for is_orange, roster in rosters.items():
+        rows = [stats.players[player_id] for player_id in roster]
+        team = {"is_orange": is_orange}
+        for stat in PLAYER_STATS:
+            team[stat] = sum(row[stat] for row in rows)
+        team["chains"] = len(team_chains[is_orange])
+        team["chain_time"] = float(sum(chain.duration for chain in team_chains[is_orange]))
+        stats.teams[roster_key(roster)] = team
+    return stats
+
+
+class AggregateStore:
+    """
+    Running per-player and per-team aggregates kept in the database.
+
+    The contribution of every ingested replay is kept in player_replay_stats and
+    team_replay_stats. Ingesting a replay again replaces its contribution and only
+    applies the difference to player_aggregates and team_aggregates, so the
+    aggregates never need a full recount and leaderboards are an indexed read.
+    """
+    _TABLES = (
+        (PlayerReplayStats, PlayerAggregate, "player_id", PLAYER_STATS),
+        (TeamReplayStats, TeamAggregate, "team", TEAM_STATS)
+    )
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+
+    def ingest(self, session: Session, replay_hash: str, stats: ReplayStats):
+        """Adds (or replaces) the contribution of a replay. The caller commits."""
+        if stats.players:
+            statement = dialect_insert(self.dialect, Player)
+            session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_={"name": statement.excluded.name, "platform": statement.excluded.platform}
+                ),
+                [
+                    {"id": player_id, "name": row["name"], "platform": row["platform"]}
+                    for player_id, row in stats.players.items()
+                ]
+            )
+        for (replay_model, aggregate_model, key, columns), rows in zip(
+            self._TABLES, (stats.players, stats.teams)
+        ):
+            self._replace(session, replay_model, aggregate_model, key, columns, replay_hash, rows)
+
+    def name_teams(self, session: Session, stats: ReplayStats, names: Sequence[str | None]) -> ReplayStats:
+        """
+        Keys the teams of a replay's stats by the catalog names (team1, team2) of its
+        match instead of their rosters.
+
+        Replays don't say which team played blue, so the names go to the sides whose
+        players played the most earlier replays under them, team1 being blue when
+        neither name has history. Stats are returned unchanged when the names are
+        unknown or the same.
+        """
+        if None in names or len(set(names)) != 2:
+            return stats
+        rosters = defaultdict(set)
+        for player_id, row in stats.players.items():
+            rosters[row["is_orange"]].add(player_id)
+        history = {}
+        for name in names:
+            history[name] = set(session.scalars(
+                select(PlayerReplayStats.player_id).distinct().join(
+                    TeamReplayStats,
+                    and_(
+                        TeamReplayStats.replay_hash == PlayerReplayStats.replay_hash,
+                        TeamReplayStats.is_orange == PlayerReplayStats.is_orange
+                    )
+                ).where(TeamReplayStats.team == name)
+            ))
+        team1, team2 = names
+        in_order = len(rosters[False] & history[team1]) + len(rosters[True] & history[team2])
+        swapped = len(rosters[False] & history[team2]) + len(rosters[True] & history[team1])
+        sides = {False: team1, True: team2} if in_order >= swapped else {False: team2, True: team1}
+        return ReplayStats(
+            players=stats.players,
+            teams={sides[team["is_orange"]]: team for team in stats.teams.values()}
+        )
+
+    def remove(self, session: Session, replay_hash: str):
+        """Takes the contribution of a replay out of the aggregates."""
+        self.ingest(session, replay_hash, ReplayStats())
+
+    def _replace(
+        self, session: Session, replay_model, aggregate_model, key: str,
+        columns: tuple, replay_hash: str, rows: Dict[str, dict]
+    ):
+        old_rows = session.execute(
+            select(getattr(replay_model, key), *[getattr(replay_model, column) for column in columns])
+            .where(replay_model.replay_hash == replay_hash)
+        ).tuples()
+        # Difference of every stat and of the game count, per key
+        deltas = {
+            row_key: [-value for value in values] + [-1] for row_key, *values in old_rows
+        }
+        for row_key, row in rows.items():
+            delta = deltas.get(row_key, [0] * (len(columns) + 1))
+            deltas[row_key] = [
+                change + new for change, new in zip(delta, [row[column] for column in columns] + [1])
+            ]
+
+        session.execute(delete(replay_model).where(replay_model.replay_hash == replay_hash))
+        if rows:
+            session.execute(insert(replay_model), [
+                {
+                    "replay_hash": replay_hash,
+                    key: row_key,
+                    "is_orange": row["is_orange"],
+                    **{column: row[column] for column in columns}
+                }
+                for row_key, row in rows.items()
+            ])
+        if deltas:
+            aggregate_columns = (*columns, "games")
+            statement = dialect_insert(self.dialect, aggregate_model)
+            statement = statement.on_conflict_do_update(
+                index_elements=[key],
+                set_={
+                    column: getattr(aggregate_model, column) + getattr(statement.excluded, column)
+                    for column in aggregate_columns
+                }
+            )
+            session.execute(statement, [
+                {key: row_key, **dict(zip(aggregate_columns, delta))}
+                for row_key, delta in deltas.items()
+            ])
+
+    def rebuild(self, session: Session):
+        """Recounts the aggregates from the per-replay contributions."""
+        for replay_model, aggregate_model, key, columns in self._TABLES:
+            query = select(
+                getattr(replay_model, key),
+                func.count(),
+                *[func.sum(getattr(replay_model, column)) for column in columns]
+            ).group_by(getattr(replay_model, key))
+            session.execute(delete(aggregate_model))
+            session.execute(
+                insert(aggregate_model).from_select([key, "games", *columns], query)
+            )
+
+    def leaderboard(
+        self,
+        session: Session,
+        stat: str = "goals",
+        per_game: bool = False,
+        limit: int = 10,
+        min_games: int = 1,
+        teams: bool = False,
+        season: str | None = None
+    ) -> List[tuple]:
+        """
+        Top players (or teams) by a stat as (id, name, games, value) rows.
+
+        Without a season this reads the aggregates, with one the season's replay
+        contributions are summed through the replay catalog.
+        """
+        replay_model, aggregate_model, key, columns = self._TABLES[int(teams)]
+        if stat not in columns:
+            raise ValueError(f"Unknown stat {stat!r}, expected one of {columns}")
+
+        if season is None:
+            source = aggregate_model
+            key_column = getattr(aggregate_model, key)
+            games = aggregate_model.games
+            total = getattr(aggregate_model, stat)
+        else:
+            source = (
+                select(
+                    getattr(replay_model, key).label(key),
+                    func.count().label("games"),
+                    func.sum(getattr(replay_model, stat)).label(stat)
+                )
+                .join(ReplayCatalog, ReplayCatalog.replay_hash == replay_model.replay_hash)
+                .where(ReplayCatalog.season_name == season)
+                .group_by(getattr(replay_model, key))
+                .subquery()
+            )
+            key_column = source.c[key]
+            games = source.c.games
+            total = source.c[stat]
+
+        value = (total * 1.0 / games) if per_game else total
+        name = key_column if teams else Player.name
+        query = select(key_column, name, games, value.label("value")).select_from(source)
+        if not teams:
+            query = query.outerjoin(Player, Player.id == key_column)
+        query = query.where(games >= min_games).order_by(value.desc()).limit(limit)
+        return [tuple(row) for row in session.execute(query)]
@@ -1,9 +1,10 @@
 import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from progress.bar import IncrementalBar
 from rlgym_tools.rocket_league.replays.parsed_replay import process_replay
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, delete, event, func, insert, select
 from sqlalchemy.orm import sessionmaker, Session
 from .models import (
     Season,
@@ -15,8 +16,21 @@ from .models import (
     Round,
     Match,
     Replay,
-    Base
+    ReplayCatalog,
+    IngestManifest,
+    Base,
+    StageFromRound,
+    StageFromGroup,
+    SplitFromEvent,
+    SplitFromRegion,
+    EventFromMatch,
+    EventFromStage
 )
+from .queries import join_all_tables, dialect_insert
+from rocketxg.frame_store import FrameStore
+
+# Manifest statuses which mean an unchanged file never has to be read again
+_DONE_STATUSES = ("parsed", "duplicate")
 
 
 def _check_any(checks: List[str], string: str) -> bool:
@@ -80,120 +94,301 @@ def parse_directory_structure(path: Path, version: str = "latest") -> Dict:
             )
 
 
+def _enable_sqlite_savepoints(engine):
+    """
+    Lets SQLAlchemy emit BEGIN itself so SAVEPOINT works with pysqlite.
+
+    See "Serializable isolation / Savepoints / Transactional DDL" in the
+    SQLAlchemy SQLite dialect documentation.
+    """
+    @event.listens_for(engine, "connect")
+    def _do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+def _stat_key(path: Path) -> Tuple[str, int, int]:
+    """Manifest key of a replay file: (raw_path, size, mtime_ns)."""
+    stat = path.stat()
+    return str(path), stat.st_size, stat.st_mtime_ns
+
+
+def _try_hash(replay_path: Path) -> str | None:
+    try:
+        return RLCSParser._generate_replay_hash(replay_path)
+    except OSError as e:
+        print(f"Skipping {replay_path}: {str(e)}")
+        return None
+
+
+def _parse_replay(
+    replay_path: Path, replay_hash: str,
+    parsed_dir: Path, version: str = "latest",
+    frame_dir: Path | None = None
+) -> Dict:
+    """
+    Parses a single replay to disk and returns the rows needed to register it.
+
+    This runs inside worker processes, so it must not touch the database.
+    If frame_dir is given the frames are also written to a FrameStore there.
+    Raises RuntimeError when carball fails or writes nothing.
+    """
+    hierarchy = parse_directory_structure(replay_path, version=version)
+    output_folder = parsed_dir / replay_hash
+    # process_replay writes into a folder named after the replay file
+    parsed_path = output_folder / replay_path.name.replace(".replay", "")
+    print(f"Processing {replay_path} at {parsed_path}")
+    result = process_replay(replay_path=replay_path, output_folder=output_folder)
+    if result is not None and result.returncode != 0:
+        raise RuntimeError(
+            f"carball exited with {result.returncode} parsing {replay_path}, "
+            f"see {parsed_path / 'carball.e.log'}"
+        )
+    if not (parsed_path / "metadata.json").exists():
+        raise RuntimeError(f"Parsing {replay_path} produced no output in {parsed_path}")
+    if frame_dir is not None:
+        FrameStore(frame_dir).write_parsed(replay_hash, parsed_path)
+    return {
+        "hierarchy": hierarchy,
+        "teams": RLCSParser._parse_match_name(hierarchy.get("match_name")),
+        "replay_hash": replay_hash,
+        "raw_path": replay_path,
+        "parsed_path": parsed_path
+    }
+
+
 class RLCSParser:
     def __init__(
         self, database_url: str = "sqlite:///rlcs.db",
-        parsed_dir: str = "./parsed"
+        parsed_dir: str = "./parsed",
+        batch_size: int = 100,
+        frame_dir: str | None = None
     ):
         self.engine = create_engine(database_url)
         self.Session = sessionmaker(bind=self.engine)
         self.parsed_dir = Path(parsed_dir)
+        self.frame_dir = Path(frame_dir) if frame_dir else None
+        self.batch_size = batch_size
+        # Dimension row ids keyed on (model, natural key) for the current run
+        self._cache: Dict[Tuple, int] = {}
 
+        if self.engine.dialect.name == "sqlite":
+            _enable_sqlite_savepoints(self.engine)
         Base.metadata.create_all(self.engine)
 
-    def _get_or_create(self, session: Session, model, **kwargs):
-        instance = session.query(model).filter_by(**kwargs).first()
-        if not instance:
-            instance = model(**kwargs)
-            session.add(instance)
-            session.commit()
-        return instance
+    def _insert(self, model):
+        return dialect_insert(self.engine.dialect.name, model)
 
-    def process_replay(self, replay_path: Path, version: str = "latest"):
-        hierarchy = parse_directory_structure(replay_path, version=version)
-        teams = self._parse_match_name(hierarchy.get("match_name"))
+    def _get_or_create(self, session: Session, model, **kwargs) -> int:
+        """
+        Returns the id of the row matching the natural key in kwargs.
+
+        None values match NULL columns (filter_by emits IS NULL), so rows with a
+        missing parent are found too. The insert only happens on a miss, and a row
+        written concurrently is skipped by the NULL-safe unique indexes in
+        models.py. Databases holding duplicates from before those indexes resolve
+        to the oldest row.
+        """
+        key = (model, tuple(kwargs.items()))
+        instance_id = self._cache.get(key)
+        if instance_id is None:
+            query = select(model.id).filter_by(**kwargs).order_by(model.id).limit(1)
+            instance_id = session.scalars(query).first()
+            if instance_id is None:
+                session.execute(
+                    self._insert(model).values(**kwargs).on_conflict_do_nothing()
+                )
+                instance_id = session.scalars(query).one()
+            self._cache[key] = instance_id
+        return instance_id
 
+    def _record(self, session: Session, key: Tuple, replay_hash: str, status: str):
+        raw_path, size, mtime_ns = key
+        session.execute(
+            self._insert(IngestManifest).values(
+                raw_path=raw_path, size=size, mtime_ns=mtime_ns,
+                hash=replay_hash, status=status
+            ).on_conflict_do_update(
+                index_elements=["raw_path", "size", "mtime_ns"],
+                set_={"hash": replay_hash, "status": status}
+            )
+        )
+
+    def process_replay(self, replay_path: Path, version: str = "latest"):
+        key = _stat_key(replay_path)
         with Session(self.engine) as session:
+            entry = session.get(IngestManifest, key)
+            if entry and entry.status in _DONE_STATUSES:
+                print(f"Skipping unchanged replay: {replay_path}")
+                return
+
+            replay_hash = self._generate_replay_hash(replay_path)
+            if session.get(Replay, replay_hash):
+                print(f"Skipping duplicate replay: {replay_path}")
+                self._record(session, key, replay_hash, "duplicate")
+                session.commit()
+                return
+
             try:
-                season = self._get_or_create(
-                    session, Season,
-                    name=hierarchy.get("season_name")
+                parsed = _parse_replay(
+                    replay_path, replay_hash, self.parsed_dir,
+                    version=version, frame_dir=self.frame_dir
                 )
+                status = "parsed" if self._write_replay(session, parsed) else "duplicate"
+            except Exception:
+                self._record(session, key, replay_hash, "failed")
+                session.commit()
+                raise
+            self._record(session, key, replay_hash, status)
+            session.commit()
 
-                split = self._get_or_create(
-                    session, Split,
-                    season=season,
-                    name=hierarchy.get("split_name"),
+    def _write_replay(self, session: Session, parsed: Dict) -> bool:
+        """
+        Registers a parsed replay and its RLCS hierarchy in the database.
+
+        The rows are written inside a savepoint so a failing replay can be
+        rolled back without losing the rest of the pending batch.
+        """
+        hierarchy = parsed["hierarchy"]
+        teams = parsed["teams"]
+        replay_path = parsed["raw_path"]
+
+        savepoint = session.begin_nested()
+        try:
+            season = self._get_or_create(
+                session, Season,
+                name=hierarchy.get("season_name")
+            )
+
+            split = self._get_or_create(
+                session, Split,
+                season_id=season,
+                name=hierarchy.get("split_name"),
+            )
+
+            region = None
+            region_name = hierarchy.get("region_name")
+            if region_name:
+                region = self._get_or_create(
+                    session, Region,
+                    split_id=split,
+                    name=region_name
                 )
 
-                region = None
-                region_name = hierarchy.get("region_name")
-                if region_name:
-                    region = self._get_or_create(
-                        session, Region,
-                        split=split,
-                        name=region_name
-                    )
+            event = self._get_or_create(
+                session, Event,
+                region_id=region,
+                split_id=split,
+                name=hierarchy.get("event_name")
+            )
 
-                event = self._get_or_create(
-                    session, Event,
-                    region=region,
-                    split=split,
-                    name=hierarchy.get("event_name")
+            stage = None
+            group = None
+            round = None
+            stage_name = hierarchy.get("stage_name")
+            if stage_name:
+                stage = self._get_or_create(
+                    session, Stage,
+                    event_id=event,
+                    name=stage_name
                 )
 
-                stage = None
-                group = None
-                round = None
-                stage_name = hierarchy.get("stage_name")
-                if stage_name:
-                    stage = self._get_or_create(
-                        session, Stage,
-                        event=event,
-                        name=stage_name
+                group_name = hierarchy.get("group_name")
+                if group_name:
+                    group = self._get_or_create(
+                        session, Group,
+                        stage_id=stage,
+                        name=group_name
                     )
 
-                    group_name = hierarchy.get("group_name")
-                    if group_name:
-                        group = self._get_or_create(
-                            session, Group,
-                            stage=stage,
-                            name=group_name
-                        )
-
-                    round_name = hierarchy.get("round_name")
-                    if round_name:
-                        round = self._get_or_create(
-                            session, Round,
-                            group=group,
-                            stage=stage,
-                            name=round_name
-                        )
-
-                match = self._get_or_create(
-                    session, Match,
-                    round=round,
-                    event=event,
-                    name=hierarchy.get("match_name"),
-                    team1=teams["team1"],
-                    team2=teams["team2"]
-                )
+                round_name = hierarchy.get("round_name")
+                if round_name:
+                    round = self._get_or_create(
+                        session, Round,
+                        group_id=group,
+                        stage_id=stage,
+                        name=round_name
+                    )
 
-                replay_hash = self._generate_replay_hash(replay_path)
-                parsed_path = self._get_parsed_path(replay_hash)
-                print(f"Processing {replay_path} at {parsed_path}")
-                process_replay(replay_path=replay_path, output_folder=parsed_path)
-                
-                if session.query(Replay).get(replay_hash):
-                    print(f"Skipping duplicate replay: {replay_path}")
-                    return
-
-                replay = Replay(
-                    hash=replay_hash,
-                    match=match,
-                    game_number=self._extract_game_number(replay_path.name),
-                    raw_path=str(replay_path),
-                    parsed_path=str(parsed_path)
-                )
-                
-                session.add(replay)
-                session.commit()
-                print(f"Processed {replay_path} successfully")
+            match = self._get_or_create(
+                session, Match,
+                round_id=round,
+                event_id=event,
+                name=hierarchy.get("match_name"),
+                team1=teams["team1"],
+                team2=teams["team2"]
+            )
 
-            except Exception as e:
-                session.rollback()
-                print(f"Failed to process {replay_path}: {str(e)}")
-                raise
+            replay_hash = parsed["replay_hash"]
+            if session.get(Replay, replay_hash):
+                print(f"Skipping duplicate replay: {replay_path}")
+                savepoint.commit()
+                return False
+
+            replay = Replay(
+                hash=replay_hash,
+                match_id=match,
+                game_number=self._extract_game_number(replay_path.name),
+                raw_path=str(replay_path),
+                parsed_path=str(parsed["parsed_path"])
+            )
+            catalog = ReplayCatalog(
+                replay_hash=replay_hash,
+                season_name=hierarchy.get("season_name"),
+                split_name=hierarchy.get("split_name"),
+                region_name=hierarchy.get("region_name"),
+                event_name=hierarchy.get("event_name"),
+                stage_name=hierarchy.get("stage_name"),
+                group_name=hierarchy.get("group_name"),
+                round_name=hierarchy.get("round_name"),
+                match_name=hierarchy.get("match_name"),
+                team1=teams["team1"],
+                team2=teams["team2"],
+                game_number=replay.game_number,
+                parsed_path=replay.parsed_path
+            )
+            
+            session.add_all([replay, catalog])
+            savepoint.commit()
+            print(f"Processed {replay_path} successfully")
+            return True
+
+        except Exception as e:
+            savepoint.rollback()
+            # Ids created inside the rolled back savepoint are gone
+            self._cache.clear()
+            print(f"Failed to process {replay_path}: {str(e)}")
+            raise
+
+    def rebuild_catalog(self):
+        """Fills replay_catalog from the normalized tables, e.g. for old databases."""
+        columns = {
+            "replay_hash": Replay.hash,
+            "season_name": Season.name,
+            "split_name": func.coalesce(SplitFromEvent.name, SplitFromRegion.name),
+            "region_name": Region.name,
+            "event_name": func.coalesce(EventFromMatch.name, EventFromStage.name),
+            "stage_name": func.coalesce(StageFromRound.name, StageFromGroup.name),
+            "group_name": Group.name,
+            "round_name": Round.name,
+            "match_name": Match.name,
+            "team1": Match.team1,
+            "team2": Match.team2,
+            "game_number": Replay.game_number,
+            "parsed_path": Replay.parsed_path
+        }
+        with Session(self.engine) as session:
+            query = join_all_tables(session.query(
+                *[func.min(column) for column in columns.values()]
+            )).group_by(Replay.hash)
+            session.execute(delete(ReplayCatalog))
+            session.execute(
+                insert(ReplayCatalog).from_select(list(columns), query.statement)
+            )
+            session.commit()
 
     def _get_parsed_path(self, replay_hash: str) -> Path:
         return self.parsed_dir / replay_hash
@@ -209,23 +404,122 @@ class RLCSParser:
     @staticmethod
     def _generate_replay_hash(path: Path) -> str:
         with open(path, "rb") as file:
-            return hashlib.sha256(file.read()).hexdigest()
+            return hashlib.file_digest(file, "sha256").hexdigest()
         
     @staticmethod
     def _extract_game_number(filename: str) -> int:
         try: return int(''.join(filter(str.isdigit, filename)))
         except: return -1
 
-    def process_directory(self, root_dir: str, version: str = "latest"):
-        """Process all replays in a directory structure"""
+    def process_directory(
+        self, root_dir: str, version: str = "latest", workers: int = 1
+    ):
+        """
+        Process all replays in a directory structure.
+
+        Files whose (path, size, mtime) is already in the ingest manifest are
+        skipped without being read, and duplicates are detected from the
+        hash before anything is parsed. With workers > 1 the replays are
+        hashed and parsed in a pool of processes while this process stays
+        the only writer to the database. Inserts are committed once every
+        batch_size replays.
+        """
         root_path = Path(root_dir)
-        replay_paths = [
-            path for path in root_path.glob("**/*.replay")
+        replay_keys = {
+            path: _stat_key(path) for path in root_path.glob("**/*.replay")
             if path.is_file()
-        ]
-        
-        for replay_path in IncrementalBar('Collecting games').iter(replay_paths):
+        }
+
+        with Session(self.engine) as session:
+            done = set(session.execute(
+                select(
+                    IngestManifest.raw_path,
+                    IngestManifest.size,
+                    IngestManifest.mtime_ns
+                ).where(IngestManifest.status.in_(_DONE_STATUSES))
+            ).tuples())
+            replay_paths = [
+                path for path, key in replay_keys.items() if key not in done
+            ]
+            print(f"Skipping {len(replay_keys) - len(replay_paths)} unchanged replays")
+
+            known_hashes = set(session.scalars(select(Replay.hash)))
+            to_parse = []
+            for replay_path, replay_hash in self._hash_all(replay_paths, workers):
+                if replay_hash is None:
+                    continue
+                if replay_hash in known_hashes:
+                    print(f"Skipping duplicate replay: {replay_path}")
+                    self._record(
+                        session, replay_keys[replay_path], replay_hash, "duplicate"
+                    )
+                    continue
+                known_hashes.add(replay_hash)
+                to_parse.append((replay_path, replay_hash))
+            session.commit()
+
+            if workers <= 1:
+                parsed_replays = self._parse_serial(to_parse, version)
+            else:
+                parsed_replays = self._parse_parallel(to_parse, version, workers)
+
+            pending = 0
+            bar = IncrementalBar('Collecting games', max=len(to_parse))
+            for replay_path, replay_hash, parsed in bar.iter(parsed_replays):
+                key = replay_keys[replay_path]
+                status = "failed"
+                if parsed is not None:
+                    try:
+                        if self._write_replay(session, parsed):
+                            status = "parsed"
+                        else:
+                            status = "duplicate"
+                    except Exception as e:
+                        print(f"Skipping {replay_path}: {str(e)}")
+                self._record(session, key, replay_hash, status)
+                pending += 1
+                if pending >= self.batch_size:
+                    session.commit()
+                    pending = 0
+            session.commit()
+        self._cache.clear()
+
+    def _hash_all(self, replay_paths: List[Path], workers: int):
+        if workers <= 1:
+            hashes = map(_try_hash, replay_paths)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                hashes = list(pool.map(_try_hash, replay_paths, chunksize=64))
+        return zip(replay_paths, hashes)
+
+    def _parse_serial(self, to_parse: List[Tuple[Path, str]], version: str):
+        for replay_path, replay_hash in to_parse:
             try:
-                self.process_replay(replay_path, version=version)
+                parsed = _parse_replay(
+                    replay_path, replay_hash, self.parsed_dir,
+                    version, self.frame_dir
+                )
             except Exception as e:
-                print(f"Skipping {replay_path}: {str(e)}")
\ No newline at end of file
+                print(f"Skipping {replay_path}: {str(e)}")
+                parsed = None
+            yield replay_path, replay_hash, parsed
+
+    def _parse_parallel(
+        self, to_parse: List[Tuple[Path, str]], version: str, workers: int
+    ):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(
+                    _parse_replay, replay_path, replay_hash,
+                    self.parsed_dir, version, self.frame_dir
+                ): (replay_path, replay_hash)
+                for replay_path, replay_hash in to_parse
+            }
+            for future in as_completed(futures):
+                replay_path, replay_hash = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    print(f"Skipping {replay_path}: {str(e)}")
+                    parsed = None
+                yield replay_path, replay_hash, parsed
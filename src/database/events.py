@@ -0,0 +1,118 @@
+from typing import Dict, Iterable, List, Mapping, Tuple, TYPE_CHECKING
+from sqlalchemy import Engine, delete, insert
+from sqlalchemy.engine import Connection
+from .models import Hit, Possession, PossessionChain
+
+if TYPE_CHECKING:
+    from rocketxg.possessions.base import PossessionChain as ReplayChain
+
+
+def _is_orange(team) -> bool | None:
+    return None if team is None else bool(team)
+
+
+def _name(value) -> str | None:
+    return None if value is None else str(value)
+
+
+def event_rows(
+    replay_hash: str,
+    chains: Iterable["ReplayChain"],
+    player_ids: Mapping[str, str] | None = None
+) -> Tuple[List[dict], List[dict], List[dict]]:
+    """
+    Rows of the possession_chains, possessions and hits tables for the chains of a
+    replay (as returned by PossessionAnalyzer). player_ids maps the replay's player
+    ids to the ids stored, e.g. canonical_player_ids.
+    """
+    player_ids = player_ids or {}
+    chain_rows, possession_rows, hit_rows = [], [], []
+    for chain_index, chain in enumerate(chains):
+        chain_rows.append({
+            "replay_hash": replay_hash,
+            "chain_index": chain_index,
+            "start_frame": chain.start_frame,
+            "end_frame": chain.end_frame,
+            "is_orange": _is_orange(chain.team),
+            "num_possessions": len(chain.possessions),
+            "num_hits": chain.num_hits,
+            "num_players": chain.num_players,
+            "duration": chain.duration,
+            "outcome": _name(chain.outcome)
+        })
+        for possession in chain.possessions:
+            possession_index = len(possession_rows)
+            possession_rows.append({
+                "replay_hash": replay_hash,
+                "possession_index": possession_index,
+                "chain_index": chain_index,
+                "start_frame": possession.start_frame,
+                "end_frame": possession.end_frame,
+                "player_id": player_ids.get(possession.player_id, possession.player_id),
+                "is_orange": _is_orange(possession.team),
+                "num_hits": possession.num_hits,
+                "duration": possession.duration,
+                "is_dribble": possession.is_dribble,
+                "possession_type": possession.possession_type
+            })
+            first_hit = len(hit_rows)
+            hit_rows.extend(
+                {
+                    "replay_hash": replay_hash,
+                    "hit_index": first_hit + i,
+                    "possession_index": possession_index,
+                    "chain_index": chain_index,
+                    "frame_number": hit.frame_number,
+                    "player_id": player_ids.get(hit.player_id, hit.player_id),
+                    "is_orange": _is_orange(hit.team),
+                    "hit_type": _name(hit.hit_type),
+                    "outcome": _name(hit.outcome),
+                    "on_goal": hit.on_goal,
+                    "xg": hit.xg
+                }
+                for i, hit in enumerate(possession.hits)
+            )
+    return chain_rows, possession_rows, hit_rows
+
+
+class EventStore:
+    """
+    Hits, possessions and chains of replays in the database.
+
+    A replay is written with one executemany per table inside a single
+    transaction, replacing whatever was stored for it before.
+    """
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def write(
+        self,
+        replay_hash: str,
+        chains: Iterable["ReplayChain"],
+        player_ids: Mapping[str, str] | None = None
+    ) -> Dict[str, int]:
+        """Stores the chains of a replay, returns the number of rows written per table."""
+        return self.write_rows(replay_hash, event_rows(replay_hash, chains, player_ids))
+
+    def write_rows(
+        self, replay_hash: str, rows: Tuple[List[dict], List[dict], List[dict]]
+    ) -> Dict[str, int]:
+        """Stores the event_rows of a replay, e.g. built in a worker process."""
+        with self.engine.begin() as connection:
+            self._delete(connection, replay_hash)
+            for model, model_rows in zip((PossessionChain, Possession, Hit), rows):
+                if model_rows:
+                    connection.execute(insert(model), model_rows)
+        return {
+            model.__tablename__: len(model_rows)
+            for model, model_rows in zip((PossessionChain, Possession, Hit), rows)
+        }
+
+    def remove(self, replay_hash: str):
+        with self.engine.begin() as connection:
+            self._delete(connection, replay_hash)
+
+    @staticmethod
+    def _delete(connection: Connection, replay_hash: str):
+        for model in (Hit, Possession, PossessionChain):
+            connection.execute(delete(model).where(model.replay_hash == replay_hash))
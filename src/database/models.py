@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, Date, Float, Boolean, ForeignKey,
+    ForeignKeyConstraint, Index, UniqueConstraint, func
+)
 from sqlalchemy.orm import declarative_base, relationship, aliased
 
 Base = declarative_base()
@@ -6,6 +9,7 @@ Base = declarative_base()
 
 class Season(Base):
     __tablename__ = 'seasons'
+    __table_args__ = (UniqueConstraint("name"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(32))
     start_date = Column(Date)
@@ -15,6 +19,7 @@ class Season(Base):
 
 class Split(Base):
     __tablename__ = 'splits'
+    __table_args__ = (UniqueConstraint("season_id", "name"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     season_id = Column(Integer, ForeignKey('seasons.id'))
     name = Column(String(32))
@@ -26,6 +31,7 @@ class Split(Base):
 
 class Region(Base):
     __tablename__ = 'regions'
+    __table_args__ = (UniqueConstraint("split_id", "name"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     split_id = Column(Integer, ForeignKey('splits.id'))
     name = Column(String(32))
@@ -50,6 +56,7 @@ class Event(Base):
 
 class Stage(Base):
     __tablename__ = 'stages'
+    __table_args__ = (UniqueConstraint("event_id", "name"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     event_id = Column(Integer, ForeignKey("events.id"))
     name = Column(String(64), nullable=False)
@@ -62,6 +69,7 @@ class Stage(Base):
 
 class Group(Base):
     __tablename__ = 'groups'
+    __table_args__ = (UniqueConstraint("stage_id", "name"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     stage_id = Column(Integer, ForeignKey("stages.id"))
     name = Column(String(64), nullable=False)
@@ -105,6 +113,201 @@ class Replay(Base):
     parsed_path = Column(String(255))
 
     match = relationship("Match", back_populates="replays")
+    catalog = relationship("ReplayCatalog", back_populates="replay", uselist=False)
+
+
+class ReplayCatalog(Base):
+    """One row per replay with its RLCS hierarchy already resolved to names."""
+    __tablename__ = 'replay_catalog'
+    __table_args__ = (
+        Index("ix_replay_catalog_season_split", "season_name", "split_name"),
+        Index("ix_replay_catalog_season_event", "season_name", "event_name"),
+    )
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    season_name = Column(String(32))
+    split_name = Column(String(32))
+    region_name = Column(String(32))
+    event_name = Column(String(64), index=True)
+    stage_name = Column(String(64))
+    group_name = Column(String(64))
+    round_name = Column(String(32))
+    match_name = Column(String(64))
+    team1 = Column(String(32), index=True)
+    team2 = Column(String(32), index=True)
+    game_number = Column(Integer)
+    parsed_path = Column(String(255))
+
+    replay = relationship("Replay", back_populates="catalog")
+
+
+class IngestManifest(Base):
+    """Files already seen by the ingester, keyed by path and stat result."""
+    __tablename__ = 'ingest_manifest'
+    raw_path = Column(String(255), primary_key=True)
+    size = Column(BigInteger, primary_key=True)
+    mtime_ns = Column(BigInteger, primary_key=True)
+    hash = Column(String(64))
+    status = Column(String(16), nullable=False)  # 'parsed', 'duplicate', 'failed'
+
+
+class Player(Base):
+    """A player across replays, keyed by canonical (platform) id."""
+    __tablename__ = 'players'
+    id = Column(String(64), primary_key=True)
+    name = Column(String(64))
+    platform = Column(String(16))
+
+    aggregate = relationship("PlayerAggregate", back_populates="player", uselist=False)
+
+
+class PlayerStatColumns:
+    """Counts and sums folded per player. possession_time is in seconds."""
+    hits = Column(Integer, nullable=False, default=0)
+    isolated_hits = Column(Integer, nullable=False, default=0)
+    dribbles = Column(Integer, nullable=False, default=0)
+    followups = Column(Integer, nullable=False, default=0)
+    possessions = Column(Integer, nullable=False, default=0)
+    possession_time = Column(Float, nullable=False, default=0)
+    shots = Column(Integer, nullable=False, default=0)
+    goals = Column(Integer, nullable=False, default=0)
+    xg = Column(Float, nullable=False, default=0)
+
+
+class TeamStatColumns(PlayerStatColumns):
+    chains = Column(Integer, nullable=False, default=0)
+    chain_time = Column(Float, nullable=False, default=0)
+
+
+class PlayerReplayStats(PlayerStatColumns, Base):
+    """What one replay contributed to a player's aggregate."""
+    __tablename__ = 'player_replay_stats'
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    player_id = Column(String(64), ForeignKey("players.id"), primary_key=True, index=True)
+    is_orange = Column(Boolean)
+
+
+class PlayerAggregate(PlayerStatColumns, Base):
+    """Running totals of a player over every ingested replay."""
+    __tablename__ = 'player_aggregates'
+    __table_args__ = (
+        Index("ix_player_aggregates_shots", "shots"),
+        Index("ix_player_aggregates_goals", "goals"),
+        Index("ix_player_aggregates_xg", "xg"),
+    )
+    player_id = Column(String(64), ForeignKey("players.id"), primary_key=True)
+    games = Column(Integer, nullable=False, default=0)
+
+    player = relationship("Player", back_populates="aggregate")
+
+
+class TeamReplayStats(TeamStatColumns, Base):
+    """What one replay contributed to a team's aggregate."""
+    __tablename__ = 'team_replay_stats'
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    team = Column(String(255), primary_key=True, index=True)
+    is_orange = Column(Boolean)
+
+
+class TeamAggregate(TeamStatColumns, Base):
+    """Running totals of a team over every ingested replay."""
+    __tablename__ = 'team_aggregates'
+    __table_args__ = (
+        Index("ix_team_aggregates_shots", "shots"),
+        Index("ix_team_aggregates_goals", "goals"),
+        Index("ix_team_aggregates_xg", "xg"),
+    )
+    team = Column(String(255), primary_key=True)
+    games = Column(Integer, nullable=False, default=0)
+
+
+class PossessionChain(Base):
+    """A chain of possessions by one team, numbered in replay order."""
+    __tablename__ = 'possession_chains'
+    __table_args__ = (
+        Index("ix_possession_chains_replay_frame", "replay_hash", "start_frame"),
+    )
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    chain_index = Column(Integer, primary_key=True)
+    start_frame = Column(Integer, nullable=False)
+    end_frame = Column(Integer, nullable=False)
+    is_orange = Column(Boolean)
+    num_possessions = Column(Integer, nullable=False)
+    num_hits = Column(Integer, nullable=False)
+    num_players = Column(Integer, nullable=False)
+    duration = Column(Float, nullable=False)  # seconds
+    outcome = Column(String(16))
+
+
+class Possession(Base):
+    """A possession by one player, numbered in replay order."""
+    __tablename__ = 'possessions'
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["replay_hash", "chain_index"],
+            ["possession_chains.replay_hash", "possession_chains.chain_index"]
+        ),
+        Index("ix_possessions_replay_frame", "replay_hash", "start_frame"),
+        Index("ix_possessions_player", "player_id"),
+    )
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    possession_index = Column(Integer, primary_key=True)
+    chain_index = Column(Integer, nullable=False)
+    start_frame = Column(Integer, nullable=False)
+    end_frame = Column(Integer, nullable=False)
+    player_id = Column(String(64))
+    is_orange = Column(Boolean)
+    num_hits = Column(Integer, nullable=False)
+    duration = Column(Float, nullable=False)  # seconds
+    is_dribble = Column(Boolean, nullable=False)
+    possession_type = Column(String(16))
+
+
+class Hit(Base):
+    """A touch of the ball, numbered in replay order."""
+    __tablename__ = 'hits'
+    __table_args__ = (
+        ForeignKeyConstraint(
+            ["replay_hash", "possession_index"],
+            ["possessions.replay_hash", "possessions.possession_index"]
+        ),
+        ForeignKeyConstraint(
+            ["replay_hash", "chain_index"],
+            ["possession_chains.replay_hash", "possession_chains.chain_index"]
+        ),
+        Index("ix_hits_replay_frame", "replay_hash", "frame_number"),
+        Index("ix_hits_player", "player_id"),
+        Index("ix_hits_hit_type", "hit_type", "on_goal"),
+    )
+    replay_hash = Column(String(64), ForeignKey("replays.hash"), primary_key=True)
+    hit_index = Column(Integer, primary_key=True)
+    possession_index = Column(Integer, nullable=False)
+    chain_index = Column(Integer, nullable=False)
+    frame_number = Column(Integer, nullable=False)
+    player_id = Column(String(64))
+    is_orange = Column(Boolean)
+    hit_type = Column(String(16))
+    outcome = Column(String(16))
+    on_goal = Column(Boolean)
+    xg = Column(Float)
+
+
+# Natural keys with optional parents. NULLs never conflict in a unique constraint,
+# so the missing parent is indexed as 0 (ids start at 1).
+Index(
+    "uq_events_natural_key",
+    func.coalesce(Event.region_id, 0), Event.split_id, Event.name,
+    unique=True
+)
+Index(
+    "uq_rounds_natural_key",
+    Round.stage_id, func.coalesce(Round.group_id, 0), Round.name,
+    unique=True
+)
+Index(
+    "uq_matches_natural_key",
+    func.coalesce(Match.round_id, 0), Match.event_id, Match.name, Match.team1, Match.team2,
+    unique=True
+)
 
 StageFromRound = aliased(Stage)
 StageFromGroup = aliased(Stage)
@@ -1,7 +1,23 @@
 from sqlalchemy.sql import or_
 from sqlalchemy.orm import Query
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .models import *
 
+# Hit types of shots: goals are shots that scored
+SHOT_HIT_TYPES = ("shot", "goal")
+
+
+def dialect_insert(dialect: str, model):
+    """INSERT for the dialect, which supports on_conflict_do_nothing/do_update."""
+    match dialect:
+        case "sqlite":
+            return sqlite_insert(model)
+        case "postgresql":
+            return postgresql_insert(model)
+        case _:
+            raise ValueError(f"Unsupported database dialect: {dialect}")
+
 def join_all_tables(query: Query):
     return (
         query.select_from(Replay).join(Match)\
@@ -30,4 +46,55 @@ def join_all_tables(query: Query):
             SplitFromEvent.season_id == Season.id,
             SplitFromRegion.season_id == Season.id
         ))
-    )
\ No newline at end of file
+    )
+
+
+def query_catalog(
+    query: Query,
+    season: str | None = None,
+    split: str | None = None,
+    event: str | None = None,
+    stage: str | None = None,
+    team: str | None = None
+):
+    """Filters a query on ReplayCatalog using its indexed hierarchy columns."""
+    filters = {
+        ReplayCatalog.season_name: season,
+        ReplayCatalog.split_name: split,
+        ReplayCatalog.event_name: event,
+        ReplayCatalog.stage_name: stage
+    }
+    query = query.select_from(ReplayCatalog)
+    for column, value in filters.items():
+        if value is not None:
+            query = query.filter(column == value)
+    if team is not None:
+        query = query.filter(
+            or_(ReplayCatalog.team1 == team, ReplayCatalog.team2 == team)
+        )
+    return query
+
+
+def query_hits(
+    query: Query,
+    hit_type: str | None = None,
+    on_goal: bool | None = None,
+    player_id: str | None = None,
+    **catalog_filters
+):
+    """
+    Filters a query on Hit by type, player and the replay's catalog entry (see
+    query_catalog). hit_type "shot" includes the goals (SHOT_HIT_TYPES).
+    """
+    query = query_catalog(query, **catalog_filters).join(
+        Hit, Hit.replay_hash == ReplayCatalog.replay_hash
+    )
+    if hit_type == "shot":
+        query = query.filter(Hit.hit_type.in_(SHOT_HIT_TYPES))
+    elif hit_type is not None:
+        query = query.filter(Hit.hit_type == hit_type)
+    if on_goal is not None:
+        query = query.filter(Hit.on_goal == on_goal)
+    if player_id is not None:
+        query = query.filter(Hit.player_id == player_id)
+    return query
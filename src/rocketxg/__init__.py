@@ -8,10 +8,52 @@ from .hit import (
     generate_hits_table
 )
 
+from .context import ReplayContext
+
+from .timeline import EventTimeline
+
+from .records import (
+    Team,
+    HitType,
+    Outcome
+)
+
+from .dataset import (
+    ShotDataset,
+    load_shots
+)
+
+from .frame_store import (
+    FrameStore,
+    ReplayFrames
+)
+
+from .features import (
+    FeatureCache,
+    register_extractor
+)
+
 __all__ = [
     "Player",
     "generate_players",
     
     "Hit",
-    "generate_hits_table"
+    "generate_hits_table",
+
+    "ReplayContext",
+
+    "EventTimeline",
+
+    "Team",
+    "HitType",
+    "Outcome",
+
+    "ShotDataset",
+    "load_shots",
+
+    "FrameStore",
+    "ReplayFrames",
+
+    "FeatureCache",
+    "register_extractor"
 ]
\ No newline at end of file
@@ -0,0 +1,88 @@
+import numpy as np
+from functools import cached_property
+from typing import Dict
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+from .frame_store import ReplayFrames
+from .player import Player, generate_players
+from .timeline import EventTimeline
+from .utils.math import quat_to_rot_mtx_batch
+from .utils.columns import STATE_COLUMNS, PLAYER_COLUMNS, QUAT
+
+
+class ReplayContext:
+    """Per-replay data shared by hits, possessions, feature extraction and simulators.
+
+    Build it once per replay and pass it around instead of re-deriving players and
+    frame data from the ParsedReplay. The frame arrays are built on first access.
+    
+    Attributes:
+        replay (ParsedReplay | ReplayFrames): The replay this context was built from.
+        players (dict): Player id to Player for every player on a team.
+        teams (dict): Player id to is_orange for every player in the metadata.
+        ball (np.ndarray): (n_frames, 13) ball states with columns STATE_COLUMNS.
+        ball_team (np.ndarray): hit_team_num of the ball for every frame.
+        ball_rot_mats (np.ndarray): (n_frames, 3, 3) ball rotation matrices.
+        player_states (dict): player_dfs key to (n_frames, 14) player states with
+            columns PLAYER_COLUMNS.
+        timeline (EventTimeline): Hits, goals, demos and kickoffs indexed by frame.
+    """
+    def __init__(self, replay: ParsedReplay | ReplayFrames):
+        self.replay = replay
+        self.players: Dict[int, Player] = {
+            player.id: player for player in generate_players(replay)
+        }
+        self.teams: Dict[int, bool] = {
+            player["unique_id"]: player["is_orange"]
+            for player in replay.metadata["players"]
+        }
+
+    @classmethod
+    def from_frames(cls, frames: ReplayFrames) -> "ReplayContext":
+        """
+        Context of a replay loaded from a FrameStore with CONTEXT_COLUMNS. The frame
+        arrays are read from the memory-mapped columns, no DataFrame is built.
+        """
+        if frames.metadata is None or frames.analyzer is None:
+            raise ValueError("ReplayFrames need the replay metadata and analyzer")
+        context = cls(frames)
+        context.ball = np.ascontiguousarray(
+            ReplayFrames.to_numpy(frames.ball, STATE_COLUMNS), dtype=np.float64
+        )
+        context.ball_team = frames.ball.column("hit_team_num").to_numpy()
+        context.player_states = {
+            player: np.ascontiguousarray(
+                ReplayFrames.to_numpy(table, PLAYER_COLUMNS), dtype=np.float64
+            )
+            for player, table in frames.players.items()
+        }
+        return context
+
+    @cached_property
+    def ball(self) -> np.ndarray:
+        return np.ascontiguousarray(
+            self.replay.ball_df[STATE_COLUMNS].to_numpy(dtype=np.float64)
+        )
+
+    @cached_property
+    def ball_team(self) -> np.ndarray:
+        return self.replay.ball_df["hit_team_num"].to_numpy()
+
+    @cached_property
+    def ball_rot_mats(self) -> np.ndarray:
+        return quat_to_rot_mtx_batch(self.ball[:, QUAT])
+
+    @cached_property
+    def player_states(self) -> Dict[str, np.ndarray]:
+        return {
+            player: np.ascontiguousarray(
+                state[PLAYER_COLUMNS].to_numpy(dtype=np.float64)
+            )
+            for player, state in self.replay.player_dfs.items()
+        }
+
+    @cached_property
+    def timeline(self) -> EventTimeline:
+        return EventTimeline.from_replay(self.replay, self.teams)
+
+    def player_state(self, player_id, frame: int) -> np.ndarray:
+        return self.player_states[str(player_id)][frame]
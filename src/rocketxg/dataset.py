@@ -0,0 +1,139 @@
+import os
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pathlib import Path
+from typing import Iterable, List
+from urllib.parse import quote
+
+PARTITIONS = ["season", "event"]
+PARTITIONING = ds.partitioning(
+    pa.schema([(name, pa.string()) for name in PARTITIONS]), flavor="hive"
+)
+KEY = "replay_hash"
+UNKNOWN = "unknown"
+
+
+def _write_parquet(table: pa.Table, path: Path, row_group_size: int | None = None):
+    tmp_path = path.with_suffix(".tmp")
+    pq.write_table(table, tmp_path, row_group_size=row_group_size)
+    os.replace(tmp_path, path)
+
+
+class ShotDataset:
+    """
+    Shot features stored as a parquet dataset partitioned by season/event.
+
+    Rows are keyed by replay hash: writing a replay replaces the rows it had
+    before, so re-running the pipeline never duplicates data.
+
+    Attributes:
+        root (Path): Root directory of the hive partitioned dataset.
+    """
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def partition_dir(self, season: str, event: str) -> Path:
+        return (
+            self.root
+            / f"season={quote(str(season), safe='')}"
+            / f"event={quote(str(event), safe='')}"
+        )
+
+    def partition_dirs(self) -> List[Path]:
+        return sorted(self.root.glob("season=*/event=*"))
+
+    def write(self, df: pd.DataFrame, row_group_size: int | None = None):
+        """Writes rows with season, event and replay_hash columns, replacing old rows of those replays."""
+        df = df.fillna({name: UNKNOWN for name in PARTITIONS})
+        for (season, event), rows in df.groupby(PARTITIONS, sort=False):
+            directory = self.partition_dir(season, event)
+            os.makedirs(directory, exist_ok=True)
+            rows = rows.drop(columns=PARTITIONS)
+            self._remove_replays(directory, rows[KEY].unique())
+            _write_parquet(
+                pa.Table.from_pandas(rows, preserve_index=False),
+                directory / f"part-{uuid.uuid4().hex}.parquet",
+                row_group_size
+            )
+
+    def remove(self, season: str, event: str, replay_hashes: Iterable[str]):
+        """Deletes the rows of the given replays, e.g. when a replay no longer has any shots."""
+        directory = self.partition_dir(season, event)
+        if directory.exists():
+            self._remove_replays(directory, replay_hashes)
+
+    def compact(self, target_rows: int = 1_000_000):
+        """Merges the files of each partition that are smaller than target_rows."""
+        for directory in self.partition_dirs():
+            small_files = [
+                path for path in sorted(directory.glob("*.parquet"))
+                if pq.ParquetFile(path).metadata.num_rows < target_rows
+            ]
+            if len(small_files) < 2:
+                continue
+            merged = pa.concat_tables(
+                [pq.read_table(path) for path in small_files],
+                promote_options="default"
+            )
+            _write_parquet(
+                merged,
+                directory / f"part-{uuid.uuid4().hex}.parquet",
+                row_group_size=target_rows
+            )
+            for path in small_files:
+                path.unlink()
+
+    @staticmethod
+    def _remove_replays(directory: Path, replay_hashes: Iterable[str]):
+        value_set = pa.array(list(replay_hashes), pa.string())
+        for path in directory.glob("*.parquet"):
+            keys = pq.read_table(path, columns=[KEY])[KEY]
+            mask = pc.is_in(keys, value_set=value_set)
+            if not pc.any(mask).as_py():
+                continue
+            kept = pq.read_table(path).filter(pc.invert(mask))
+            if kept.num_rows:
+                _write_parquet(kept, path)
+            else:
+                path.unlink()
+
+
+def open_dataset(root: str | Path) -> ds.Dataset:
+    return ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+
+
+def partition_filter(
+    season: str | Iterable[str] | None = None,
+    event: str | Iterable[str] | None = None
+) -> ds.Expression | None:
+    """Dataset filter on the season and event partitions, each a name or a list of names."""
+    expression = None
+    for name, value in zip(PARTITIONS, (season, event)):
+        if value is None:
+            continue
+        values = [value] if isinstance(value, str) else list(value)
+        condition = ds.field(name).isin(values)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def load_shots(
+    root: str | Path,
+    season: str | Iterable[str] | None = None,
+    event: str | Iterable[str] | None = None,
+    columns: List[str] | None = None
+) -> pd.DataFrame:
+    """
+    Loads shots from a ShotDataset, reading only the matching partitions and columns.
+
+    season and event take a name or a list of names. Partition columns can be
+    requested in columns like any other column.
+    """
+    dataset = open_dataset(root)
+    return dataset.to_table(
+        columns=columns, filter=partition_filter(season, event)
+    ).to_pandas()
@@ -0,0 +1,218 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow.parquet as pq
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, TYPE_CHECKING
+from .context import ReplayContext
+from .hit import generate_hits_table
+from .hit_analysis import BALL_FEATURES, PLAYER_FEATURES, get_shots_analysis
+from .simulator.prefilter import ShotPrefilter
+
+if TYPE_CHECKING:
+    from .player import Player
+    from .simulator.cache import SimulationCache
+
+# Shots are the rows every extractor works on, bump SHOTS_VERSION when find_shots
+# changes which hits are shots so every cached column group is recomputed.
+SHOTS = "shots"
+SHOTS_VERSION = 1
+SHOT_TIME = 3  # s, simulation horizon deciding which hits are shots
+SHOT_COLUMNS = ["frame", "shooter_id", "is_goal"]
+# Opponent columns are padded to a 3v3 so every replay has the same features
+MAX_OPPONENTS = 3
+SHOT_ANALYSIS_COLUMNS = (
+    ["ball_" + column for column in BALL_FEATURES]
+    + [
+        f"op_{opponent_num}_{column}"
+        for opponent_num in range(MAX_OPPONENTS) for column in PLAYER_FEATURES
+    ]
+    + ["shooter_" + column for column in PLAYER_FEATURES]
+)
+
+
+@dataclass(frozen=True)
+class FeatureExtractor:
+    """A named, versioned function from a replay's shots to feature columns.
+
+    func takes the ReplayContext and the shots table (SHOT_COLUMNS) and returns a
+    DataFrame with one row per shot. Bump version whenever its output changes.
+    """
+    name: str
+    version: int
+    func: Callable[[ReplayContext, pd.DataFrame], pd.DataFrame]
+
+
+EXTRACTORS: Dict[str, FeatureExtractor] = {}
+
+
+def register_extractor(name: str, version: int):
+    """Decorator adding a feature extractor to EXTRACTORS."""
+    def decorator(func):
+        if name == SHOTS or name in EXTRACTORS:
+            raise ValueError(f"Feature extractor {name!r} is already registered")
+        EXTRACTORS[name] = FeatureExtractor(name, version, func)
+        return func
+    return decorator
+
+
+@register_extractor("shot_analysis", 2)
+def shot_analysis(context: ReplayContext, shots: pd.DataFrame) -> pd.DataFrame:
+    """Ball, opponent and shooter states at each shot (get_shots_analysis), SHOT_ANALYSIS_COLUMNS."""
+    return get_shots_analysis(
+        shots["frame"].to_numpy(), shots["shooter_id"].tolist(), context
+    ).reindex(columns=SHOT_ANALYSIS_COLUMNS)
+
+
+def find_shots(
+    context: ReplayContext,
+    time_s: float = SHOT_TIME,
+    sim_cache: "SimulationCache | None" = None,
+    prefilter: ShotPrefilter | None = None
+) -> Tuple[pd.DataFrame, List["Player"]]:
+    """
+    Hits -> possessions -> shot simulation for one replay.
+
+    Pass a prefilter to read how many simulations it skipped from its stats.
+    Returns the shots table and the players with their hits, possessions and shots.
+    """
+    hits = generate_hits_table(context.replay, context)
+    players = list(hits.keys())
+    if prefilter is None:
+        prefilter = ShotPrefilter()
+    shots = []
+    for player in players:
+        player.generate_possessions()
+        player.generate_shots(
+            context.replay, time_s=time_s, context=context, prefilter=prefilter, cache=sim_cache
+        )
+        shots.extend(player.shots)
+    shots_df = pd.DataFrame({
+        "frame": pd.Series([shot.frame for shot in shots], dtype="int64"),
+        "shooter_id": pd.Series([shot.player.id for shot in shots], dtype="object"),
+        "is_goal": pd.Series([shot.is_goal for shot in shots], dtype="bool")
+    })
+    return shots_df, players
+
+
+def _check_rows(name: str, shots: pd.DataFrame, df: pd.DataFrame):
+    if len(df) != len(shots):
+        raise ValueError(f"Feature group {name!r} has {len(df)} rows for {len(shots)} shots")
+
+
+def _join(shots: pd.DataFrame, columns: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """is_goal followed by the extractors' columns, one row per shot in shots order."""
+    for name, df in columns.items():
+        _check_rows(name, shots, df)
+    return pd.concat(
+        [shots[["is_goal"]].reset_index(drop=True)]
+        + [df.reset_index(drop=True) for df in columns.values()],
+        axis=1
+    )
+
+
+def extract_features(
+    context: ReplayContext,
+    shots: pd.DataFrame,
+    extractors: Dict[str, FeatureExtractor] | None = None
+) -> pd.DataFrame:
+    """Runs every extractor on the shots of a replay, without caching."""
+    extractors = EXTRACTORS if extractors is None else extractors
+    return _join(shots, {
+        name: extractor.func(context, shots) for name, extractor in extractors.items()
+    })
+
+
+class FeatureCache:
+    """
+    Per-replay feature column groups keyed by replay hash.
+
+    The shots and each extractor's columns are stored in their own parquet file at
+    root/<name>/<version>/<replay hash>.parquet, where the version of a column
+    group includes the shots version it was computed on. A group is stale when
+    its file doesn't exist or its row count differs from the shots, so changing one
+    extractor only recomputes that extractor, and the replay is only reloaded for
+    replays with a stale group. Recomputed shots make every group stale.
+
+    Attributes:
+        root (Path): Cache directory.
+        extractors (dict): Extractors whose columns make up the features.
+    """
+    def __init__(self, root: str | Path, extractors: Dict[str, FeatureExtractor] | None = None):
+        self.root = Path(root)
+        self.extractors = EXTRACTORS if extractors is None else extractors
+
+    def version(self, name: str) -> str:
+        if name == SHOTS:
+            return f"v{SHOTS_VERSION}"
+        return f"v{self.extractors[name].version}-shots{SHOTS_VERSION}"
+
+    def path(self, name: str, replay_hash: str) -> Path:
+        return self.root / name / self.version(name) / f"{replay_hash}.parquet"
+
+    def stale(self, replay_hash: str) -> List[str]:
+        """Column groups of a replay that have to be (re)computed, shots first."""
+        shots_path = self.path(SHOTS, replay_hash)
+        if not shots_path.exists():
+            return [SHOTS, *self.extractors]
+        num_shots = pq.ParquetFile(shots_path).metadata.num_rows
+        return [
+            name for name in self.extractors
+            if not self.path(name, replay_hash).exists()
+            or pq.ParquetFile(self.path(name, replay_hash)).metadata.num_rows != num_shots
+        ]
+
+    def read(self, name: str, replay_hash: str) -> pd.DataFrame:
+        return pd.read_parquet(self.path(name, replay_hash))
+
+    def write(self, name: str, replay_hash: str, df: pd.DataFrame):
+        path = self.path(name, replay_hash)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        df.reset_index(drop=True).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def features(
+        self,
+        replay_hash: str,
+        load_context: Callable[[], ReplayContext],
+        detect_shots: Callable[[ReplayContext], pd.DataFrame] | None = None
+    ) -> pd.DataFrame:
+        """
+        Features of a replay, computing only its stale column groups.
+
+        load_context is only called when something is stale and detect_shots (by
+        default the shots table of find_shots) only when the shots are.
+        """
+        if detect_shots is None:
+            detect_shots = lambda context: find_shots(context)[0]
+        stale = self.stale(replay_hash)
+        if stale:
+            context = load_context()
+            if SHOTS in stale:
+                self.write(SHOTS, replay_hash, detect_shots(context))
+            shots = self.read(SHOTS, replay_hash)
+            for name in stale:
+                if name != SHOTS:
+                    df = self.extractors[name].func(context, shots)
+                    _check_rows(name, shots, df)
+                    self.write(name, replay_hash, df)
+        return self.join(replay_hash)
+
+    def join(self, replay_hash: str) -> pd.DataFrame:
+        """Cached features of a replay: is_goal and every extractor's columns."""
+        return _join(
+            self.read(SHOTS, replay_hash),
+            {name: self.read(name, replay_hash) for name in self.extractors}
+        )
+
+    def prune(self) -> int:
+        """Deletes the cached versions no current extractor uses, returns how many."""
+        current = {name: self.version(name) for name in (SHOTS, *self.extractors)}
+        removed = 0
+        for directory in self.root.glob("*/*"):
+            if directory.is_dir() and current.get(directory.parent.name) != directory.name:
+                shutil.rmtree(directory)
+                removed += 1
+        return removed
@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+
+COLUMN_GROUPS = {
+    "pos": ["pos_x", "pos_y", "pos_z"],
+    "vel": ["vel_x", "vel_y", "vel_z"],
+    "ang_vel": ["ang_vel_x", "ang_vel_y", "ang_vel_z"],
+    "quat": ["quat_w", "quat_x", "quat_y", "quat_z"],
+    "boost": ["boost_amount"],
+}
+DEFAULT_COLUMNS = ("pos", "vel", "quat", "boost")
+# Columns ReplayContext.from_frames needs
+CONTEXT_COLUMNS = ("pos", "vel", "ang_vel", "quat", "boost", "hit_team_num")
+BALL = "ball"
+METADATA = "metadata.json"
+ANALYZER = "analyzer.json"
+
+
+def _expand_columns(columns: Iterable[str]) -> List[str]:
+    expanded = []
+    for column in columns:
+        expanded.extend(COLUMN_GROUPS.get(column, [column]))
+    return expanded
+
+
+def _to_float32(table: pa.Table) -> pa.Table:
+    schema = pa.schema([
+        field.with_type(pa.float32()) if pa.types.is_floating(field.type) else field
+        for field in table.schema
+    ])
+    return table.cast(schema)
+
+
+@dataclass
+class ReplayFrames:
+    """Memory-mapped frames of one replay, projected to the requested columns.
+
+    With its metadata and analyzer it stands in for the ParsedReplay in
+    ReplayContext.from_frames.
+    """
+    ball: pa.Table
+    players: Dict[str, pa.Table]
+    metadata: dict | None = None
+    analyzer: dict | None = None
+
+    @property
+    def ball_df(self) -> pd.DataFrame:
+        return self.ball.to_pandas()
+
+    @property
+    def player_dfs(self) -> Dict[str, pd.DataFrame]:
+        return {player: table.to_pandas() for player, table in self.players.items()}
+
+    @staticmethod
+    def to_numpy(table: pa.Table, columns: Iterable[str]) -> np.ndarray:
+        """Stacks the given columns of a frame table into an (n_frames, n) array."""
+        return np.column_stack([
+            table.column(column).to_numpy() for column in _expand_columns(columns)
+        ])
+
+
+class FrameStore:
+    """
+    Columnar store of parsed replay frames keyed by replay hash.
+
+    Each replay is a directory holding one uncompressed Arrow IPC (Feather v2)
+    file for the ball and one per player, with float columns cast to float32,
+    so they can be memory-mapped and read column by column, next to the replay's
+    metadata and analyzer JSON. The metadata is written last, so a replay is only
+    in the store once it is complete.
+    """
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def path(self, replay_hash: str, entity: str = BALL) -> Path:
+        return self.root / replay_hash / f"{entity}.arrow"
+
+    def __contains__(self, replay_hash: str) -> bool:
+        return (self.root / replay_hash / METADATA).exists()
+
+    def players(self, replay_hash: str) -> List[str]:
+        return sorted(
+            path.stem for path in (self.root / replay_hash).glob("*.arrow")
+            if path.stem != BALL
+        )
+
+    def write(self, replay_hash: str, replay: ParsedReplay):
+        """Stores a replay that is already loaded."""
+        os.makedirs(self.root / replay_hash, exist_ok=True)
+        self._write_frame(self.path(replay_hash), replay.ball_df)
+        for player, player_df in replay.player_dfs.items():
+            self._write_frame(self.path(replay_hash, str(player)), player_df)
+        self._write_json(self.root / replay_hash / ANALYZER, replay.analyzer)
+        self._write_json(self.root / replay_hash / METADATA, replay.metadata)
+
+    def write_parsed(self, replay_hash: str, parsed_path: str | Path):
+        """
+        Stores a replay straight from the files ParsedReplay.load reads, without
+        building its DataFrames (the game frames aren't needed).
+        """
+        parsed_path = Path(parsed_path)
+        os.makedirs(self.root / replay_hash, exist_ok=True)
+        self._write_table(self.path(replay_hash), pq.read_table(parsed_path / "__ball.parquet"))
+        for path in parsed_path.glob("player_*.parquet"):
+            player = path.name.split("_")[1].split(".")[0]
+            self._write_table(self.path(replay_hash, player), pq.read_table(path))
+        for name in (ANALYZER, METADATA):
+            path = self.root / replay_hash / name
+            tmp_path = path.with_suffix(".tmp")
+            shutil.copyfile(parsed_path / name, tmp_path)
+            os.replace(tmp_path, path)
+
+    def load(
+        self,
+        replay_hash: str,
+        columns: Iterable[str] = DEFAULT_COLUMNS,
+        players: Iterable[str] | None = None
+    ) -> ReplayFrames:
+        """
+        Memory-maps a stored replay, reading only the requested columns.
+
+        Columns may be raw names or the groups in COLUMN_GROUPS. Columns that
+        an entity doesn't have (e.g. boost for the ball) are skipped.
+        """
+        columns = _expand_columns(columns)
+        if players is None:
+            players = self.players(replay_hash)
+        return ReplayFrames(
+            ball=self._read_frame(self.path(replay_hash), columns),
+            players={
+                str(player): self._read_frame(self.path(replay_hash, str(player)), columns)
+                for player in players
+            },
+            metadata=self._read_json(self.root / replay_hash / METADATA),
+            analyzer=self._read_json(self.root / replay_hash / ANALYZER)
+        )
+
+    @staticmethod
+    def _write_frame(path: Path, df: pd.DataFrame):
+        FrameStore._write_table(path, pa.Table.from_pandas(df, preserve_index=False))
+
+    @staticmethod
+    def _write_table(path: Path, table: pa.Table):
+        tmp_path = path.with_suffix(".tmp")
+        feather.write_feather(_to_float32(table), tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_json(path: Path, data: dict):
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path: Path) -> dict | None:
+        if not path.exists():
+            return None
+        with open(path) as file:
+            return json.load(file)
+
+    @staticmethod
+    def _read_frame(path: Path, columns: List[str]) -> pa.Table:
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        names = [column for column in columns if column in reader.schema.names]
+        return pa.Table.from_batches(
+            [reader.get_batch(i).select(names) for i in range(reader.num_record_batches)],
+            schema=pa.schema([reader.schema.field(name) for name in names])
+        )
@@ -1,10 +1,15 @@
-from typing import List
+import pyarrow as pa
+from typing import Dict, List
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
-from bisect import bisect_left
-from .player import Player, generate_players
+from .player import Player
+from .context import ReplayContext
 
 
 class Hit:
+    __slots__ = (
+        "frame", "player_id", "player", "player_changed", "team_changed", "is_goal", "is_shot"
+    )
+
     def __init__(
         self,
         frame: int | None = None,
@@ -26,35 +31,63 @@ class Hit:
         if player:
             self.player_id = player.id
 
+    @staticmethod
+    def to_arrow(hits: List["Hit"]) -> pa.Table:
+        """Table of the hits, one row each. The player is stored by its id."""
+        return pa.table({
+            "frame": pa.array([hit.frame for hit in hits], pa.int64()),
+            "player_id": pa.array([hit.player_id for hit in hits]),
+            "player_changed": pa.array([hit.player_changed for hit in hits], pa.bool_()),
+            "team_changed": pa.array([hit.team_changed for hit in hits], pa.bool_()),
+            "is_goal": pa.array([hit.is_goal for hit in hits], pa.bool_()),
+            "is_shot": pa.array([hit.is_shot for hit in hits], pa.bool_())
+        })
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table, players: Dict[str, Player] | None = None) -> List["Hit"]:
+        """Hits of a to_arrow table, linked to the players with their ids if given."""
+        players = players or {}
+        return [
+            cls(
+                frame=frame,
+                player_id=player_id,
+                player=players.get(player_id),
+                player_changed=player_changed,
+                team_changed=team_changed,
+                is_goal=is_goal,
+                is_shot=is_shot
+            )
+            for frame, player_id, player_changed, team_changed, is_goal, is_shot in zip(
+                *(table.column(column).to_pylist() for column in (
+                    "frame", "player_id", "player_changed", "team_changed", "is_goal", "is_shot"
+                ))
+            )
+        ]
+
 
-def find_goal_hits(replay: ParsedReplay):
+def find_goal_hits(replay: ParsedReplay, context: ReplayContext | None = None):
     """
     Finds the hits which lead to goals.
     
     A list of hits is generated in order of frame number. The last hit from the team that scored is marked as a goal for each goal in a replay. The modified list of hits is then returned.
     """
+    if context is None:
+        context = ReplayContext(replay)
     hits = replay.analyzer["hits"]
-    hit_frames = [hit["frame_number"] for hit in hits]
-    players = {player.id: player for player in generate_players(replay)}
-    goals = replay.metadata["game"]["goals"]
-    for goal in goals:
-        is_orange = goal["is_orange"]
-        start_search = bisect_left(hit_frames, goal["frame"])
-        for i in range(start_search-1, 0, -1):
-            hit = hits[i]
-            player = players[hit["player_unique_id"]]
-            if player.is_orange == is_orange:
-                hit["is_goal"] = True
-                break
+    for i in context.timeline.goal_hits():
+        if i >= 0:
+            hits[i]["is_goal"] = True
     return hits
 
 
-def generate_hits_table(replay: ParsedReplay):
+def generate_hits_table(replay: ParsedReplay, context: ReplayContext | None = None):
     """
     Hit data is extracted into a dictionary keyed by Player objects whose corresponding hits are stored as lists of Hit objects.
     """
-    hits_list = find_goal_hits(replay)
-    player_table = {player.id: player for player in generate_players(replay)}
+    if context is None:
+        context = ReplayContext(replay)
+    hits_list = find_goal_hits(replay, context)
+    player_table = context.players
     hits_table = {player: [] for player in player_table.values()}
     
     player_changed = False
@@ -1,43 +1,11 @@
 import numpy as np
 import pandas as pd
-import rlgym.rocket_league.math as rlmath
-from typing import List
+from typing import List, TYPE_CHECKING
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
-from rlgym.rocket_league.common_values import (
-    BLUE_TEAM,
-    ORANGE_TEAM,
-    BLUE_GOAL_CENTER,
-    ORANGE_GOAL_CENTER,
-    GOAL_THRESHOLD,
-    GOAL_HEIGHT,
-    GOAL_CENTER_TO_POST,
-    CEILING_Z
-)
-
-def rectangle_sdf(pos, halfsize):
-    halfsize = np.array(halfsize)
-    edge_distance = np.abs(pos) - halfsize
-    return np.sum(rlmath.magnitude(np.maximum(edge_distance, 0)))
-
-
-def distance_to_goal(pos, team):
-    if team:
-        goal_pos = ORANGE_GOAL_CENTER
-        y_offset = GOAL_THRESHOLD
-    else:
-        goal_pos = BLUE_GOAL_CENTER
-        y_offset = -GOAL_THRESHOLD
-
-    offset = np.array(goal_pos)
-    offset[1] += y_offset
-    halfsize = [
-        GOAL_CENTER_TO_POST,
-        GOAL_THRESHOLD,
-        GOAL_HEIGHT / 2
-    ]
-
-    return rectangle_sdf(pos - offset, halfsize)
+from .utils.columns import STATE_COLUMNS, PLAYER_COLUMNS
 
+if TYPE_CHECKING:
+    from .context import ReplayContext
 
 def goal_side_sign(is_orange):
     if is_orange:
@@ -93,4 +61,68 @@ def get_ball_analysis(hit, replay: ParsedReplay):
         prefix + "vel_x": goal_side*ball_df["vel_x"],
         prefix + "vel_y": goal_side*ball_df["vel_y"],
         prefix + "vel_z": ball_df["vel_z"],
-    }
\ No newline at end of file
+    }
+
+BALL_FEATURES = ["pos_x", "pos_y", "pos_z", "vel_x", "vel_y", "vel_z"]
+PLAYER_FEATURES = BALL_FEATURES + ["boost_amount"]
+# Columns mirrored with goal_side_sign so every shot attacks the same goal
+SIDE_FEATURES = ["pos_x", "pos_y", "vel_x", "vel_y"]
+
+
+def _side_normalize(values: np.ndarray, columns: List[str], goal_side: np.ndarray):
+    flip = np.isin(columns, SIDE_FEATURES)
+    return values * np.where(flip, goal_side[:, None], 1)
+
+
+def get_shots_analysis(frames, shooter_ids, context: "ReplayContext") -> pd.DataFrame:
+    """
+    Batched version of get_ball_analysis, get_opponent_analysis and get_shooter_analysis.
+
+    Takes the frames and shooter ids of every shot in a replay and returns one row per
+    shot with the same columns as the merged dictionaries of the single-hit functions.
+    """
+    players = list(context.players.values())
+    frames = np.asarray(frames, dtype=np.int64)
+    player_index = {player.id: i for i, player in enumerate(players)}
+    shooter_idx = np.array([player_index[id] for id in shooter_ids], dtype=np.int64)
+    is_orange = np.array([player.is_orange for player in players], dtype=bool)
+    shooter_orange = is_orange[shooter_idx]
+    goal_side = np.where(shooter_orange, -1, 1)
+
+    # (n_players, n_shots, n_features), only the shot frames are gathered. Filled
+    # rather than stacked so replays without players or shots give empty arrays
+    player_columns = [PLAYER_COLUMNS.index(column) for column in PLAYER_FEATURES]
+    player_values = np.empty((len(players), len(frames), len(PLAYER_FEATURES)))
+    for i, player in enumerate(players):
+        player_values[i] = context.player_states[str(player.id)][frames][:, player_columns]
+    shots = np.arange(len(frames))
+
+    ball_columns = [STATE_COLUMNS.index(column) for column in BALL_FEATURES]
+    ball = context.ball[frames][:, ball_columns]
+    ball = _side_normalize(ball, BALL_FEATURES, goal_side)
+    columns = {"ball_" + column: ball[:, i] for i, column in enumerate(BALL_FEATURES)}
+
+    # Opponents keep the order of players, padded with -1 for short-handed teams
+    teams = [np.flatnonzero(~is_orange), np.flatnonzero(is_orange)]
+    num_opponents = max(len(team) for team in teams)
+    opponent_idx = np.full((2, num_opponents), -1, dtype=np.int64)
+    for team, members in enumerate(teams):
+        opponent_idx[1 - team, :len(members)] = members
+    opponent_idx = opponent_idx[shooter_orange.astype(np.int64)]
+    for opponent_num in range(num_opponents):
+        idx = opponent_idx[:, opponent_num]
+        values = player_values[idx, shots]
+        values[idx < 0] = np.nan
+        values = _side_normalize(values, PLAYER_FEATURES, goal_side)
+        prefix = f"op_{opponent_num}_"
+        columns.update({
+            prefix + column: values[:, i] for i, column in enumerate(PLAYER_FEATURES)
+        })
+
+    shooter = _side_normalize(
+        player_values[shooter_idx, shots], PLAYER_FEATURES, goal_side
+    )
+    columns.update({
+        "shooter_" + column: shooter[:, i] for i, column in enumerate(PLAYER_FEATURES)
+    })
+    return pd.DataFrame(columns)
@@ -1,11 +1,28 @@
 import numpy as np
+import pyarrow as pa
 import RocketSim as rsim
-from statistics import mode
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
-from typing import List
-from .shot_detection import sim_detect_shot
+from typing import List, TYPE_CHECKING
+from .shot_detection import sim_detect_shot, sim_detect_shot_at
+from .simulator.recording import TrajectoryRecorder
+from .possessions.segmentation import dribble_flags
+from .records import Team
+
+if TYPE_CHECKING:
+    from .context import ReplayContext
+    from .simulator.cache import SimulationCache
+    from .simulator.pool import SimulationPool
+    from .simulator.prefilter import ShotPrefilter
 
 class Player:
+    """A player of a replay and their hits.
+
+    Players are equal and hash by id, so the same player keys dicts across replays.
+    """
+    __slots__ = (
+        "name", "id", "is_orange", "all_hits", "isolated_hits", "dribbles", "followups", "shots"
+    )
+
     def __init__(self, name: str, id: int, is_orange: bool):
         self.name = name
         self.id = id
@@ -17,57 +34,139 @@ class Player:
         self.shots = {}
     
     def generate_possessions(self, dribble_threshold=15):
+        """
+        Splits the player's hits into possessions at every change of player and sorts
+        them into isolated hits, dribbles and follow-ups.
+
+        The last possession isn't closed by a change of player, so it isn't sorted.
+        """
         if not self.all_hits:
             return
-        
-        possession = None
-        possessions = []
-        for hit in self.all_hits:
-            if hit.player_changed:
-                if possession:
-                    if len(possession) == 1:
-                        self.isolated_hits.append(possession[0])
-                    else:
-                        frames = [hit.frame for hit in possession]
-                        delta_frames = np.diff(frames)
-                        if mode(delta_frames) < dribble_threshold:
-                            self.dribbles.append(possession)
-                        else:
-                            self.followups.append(possession)
-                        0
-                possession = [hit]
-                possessions.append(possession)
+
+        frames = np.array([hit.frame for hit in self.all_hits], dtype=np.int64)
+        changed = np.array([hit.player_changed for hit in self.all_hits], dtype=bool)
+        possession_ids = np.cumsum(changed) - 1
+        closed = (possession_ids >= 0) & (possession_ids < possession_ids[-1])
+        ids = possession_ids[closed]
+        sizes = np.bincount(ids)
+        is_dribble = dribble_flags(frames[closed], ids, dribble_threshold)
+
+        for start, size, dribble in zip(np.flatnonzero(changed), sizes, is_dribble):
+            possession = self.all_hits[start:start + size]
+            if size == 1:
+                self.isolated_hits.append(possession[0])
+            elif dribble:
+                self.dribbles.append(possession)
             else:
-                possession.append(hit)
+                self.followups.append(possession)
     
-    def generate_shots(self, replay: ParsedReplay, time_s=1):
-        arena = rsim.Arena(rsim.GameMode.SOCCAR)
-        for hit in self.isolated_hits:
-            ball_data = replay.ball_df.iloc[hit.frame, :]
-            is_shot, sim_data = sim_detect_shot(ball_data, arena, time_s)
-            hit.is_shot = is_shot
-            if is_shot:
-                self.shots[hit] = {
-                    "ball_state": ball_data,
-                    "sim_data": sim_data
-                }
-            
-        for dribble in self.possessions:
-            hit = dribble[-1]
-            ball_data = replay.ball_df.iloc[hit.frame, :]
-            is_shot, sim_data = sim_detect_shot(ball_data, arena, time_s)
-            hit.is_shot = is_shot
+    def generate_shots(
+        self,
+        replay: ParsedReplay,
+        time_s=1,
+        context: "ReplayContext | None" = None,
+        pool: "SimulationPool | None" = None,
+        prefilter: "ShotPrefilter | None" = None,
+        cache: "SimulationCache | None" = None,
+        record="summary",
+        adaptive=True
+    ):
+        """
+        Simulates the last hit of every isolated hit and possession to find shots.
+
+        self.shots maps each shot to what record asks for: None ("none"), a
+        ShotSummary ("summary") or the DataFrame of simulated ticks ("full").
+        With a pool (which needs a context) the hits are simulated in parallel by
+        BallSimulator and only the verdict is kept. The same goes for a cache,
+        which only simulates the hits it hasn't seen before. A prefilter (which also
+        needs a context) skips the hits that can't be shots. adaptive selects
+        multi-tick stepping for serial simulation (see scripts/benchmark_stepping.py);
+        pools and caches always step adaptively.
+        """
+        last_hits = self.isolated_hits + [dribble[-1] for dribble in self.possessions]
+        frames = np.array([hit.frame for hit in last_hits], dtype=np.int64)
+        needed = np.ones(len(last_hits), dtype=bool)
+        if prefilter is not None:
+            needed = prefilter.needs_simulation(
+                context.ball[frames], context.ball_team[frames], time_s
+            )
+        simulated = np.ones_like(needed) if prefilter and prefilter.validate else needed
+
+        results = [(False, None)] * len(last_hits)
+        indices = np.flatnonzero(simulated)
+        if pool is not None:
+            is_shot, _ = pool.simulate_frames(
+                context, frames[indices], context.ball_team[frames[indices]], time_s
+            )
+            for i, hit_is_shot in zip(indices, is_shot):
+                results[i] = (hit_is_shot, None)
+        elif cache is not None:
+            is_shot, _ = cache.simulate_frames(
+                context, frames[indices], context.ball_team[frames[indices]], time_s
+            )
+            for i, hit_is_shot in zip(indices, is_shot):
+                results[i] = (hit_is_shot, None)
+        else:
+            arena = rsim.Arena(rsim.GameMode.SOCCAR)
+            recorder = TrajectoryRecorder(round(arena.tick_rate))
+            for i in indices:
+                if context is not None:
+                    results[i] = sim_detect_shot_at(
+                        context, frames[i], arena, time_s, record, recorder, adaptive=adaptive
+                    )
+                else:
+                    ball_data = replay.ball_df.iloc[frames[i], :]
+                    results[i] = sim_detect_shot(
+                        ball_data, arena, time_s, record, recorder, adaptive=adaptive
+                    )
+            arena.stop()
+        if prefilter is not None and prefilter.validate:
+            prefilter.check(needed, [is_shot for is_shot, _ in results])
+
+        for hit, (is_shot, sim_data) in zip(last_hits, results):
+            hit.is_shot = bool(is_shot)
             if is_shot:
-                self.shots[hit] = {
-                    "ball_state": ball_data,
-                    "sim_data": sim_data
-                }
-        arena.stop()
+                self.shots[hit] = sim_data
         
     
     @property
     def possessions(self):
         return self.dribbles + self.followups
+
+    @property
+    def team(self) -> Team:
+        return Team.from_is_orange(self.is_orange)
+
+    def __eq__(self, other):
+        if not isinstance(other, Player):
+            return NotImplemented
+        return self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Player(name={self.name!r}, id={self.id!r}, is_orange={self.is_orange!r})"
+
+    @staticmethod
+    def to_arrow(players: List["Player"]) -> pa.Table:
+        """Table of the players' names, ids and teams. Their hits aren't included."""
+        return pa.table({
+            "name": pa.array([player.name for player in players], pa.string()),
+            "id": pa.array([player.id for player in players]),
+            "is_orange": pa.array([player.is_orange for player in players], pa.bool_())
+        })
+
+    @classmethod
+    def from_arrow(cls, table: pa.Table) -> List["Player"]:
+        return [
+            cls(name=name, id=id, is_orange=is_orange)
+            for name, id, is_orange in zip(
+                table.column("name").to_pylist(),
+                table.column("id").to_pylist(),
+                table.column("is_orange").to_pylist()
+            )
+        ]
     
     
 def generate_players(replay: ParsedReplay):
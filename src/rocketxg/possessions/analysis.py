@@ -1,37 +1,117 @@
+import numpy as np
 from typing import List
-from bisect import bisect_left
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
 
 from .base import Hit, Possession, PossessionChain
 from ..simulator.ball_simulator import BallSimulator
+from ..simulator.cache import SimulationCache
+from ..simulator.pool import SimulationPool
+from ..simulator.prefilter import ShotPrefilter
+from ..context import ReplayContext
+from ..records import HitType, Outcome
 
-def find_goal_hits(replay: ParsedReplay, hits: List[Hit]):
-    hit_frames = [hit.frame_number for hit in hits]
-    goals = replay.metadata["game"]["goals"]
-    for goal in goals:
-        start_search = bisect_left(hit_frames, goal["frame"])
-        for i in range(start_search - 1, 0, -1):
-            if hits[i].team == goal["is_orange"]:
-                hits[i].hit_type = "goal"
-                break
+def find_goal_hits(replay: ParsedReplay, hits: List[Hit], context: ReplayContext | None = None):
+    """Marks the hit credited with each goal, hits being one per replay.analyzer["hits"] entry."""
+    if context is None:
+        context = ReplayContext(replay)
+    for i in context.timeline.goal_hits():
+        if i >= 0:
+            hits[i].hit_type = HitType.GOAL
             
 
-def detect_shots(chains: List[PossessionChain], time: float=1):
-    simulator = BallSimulator()
+def _simulate_frames(
+    context: ReplayContext,
+    frames: np.ndarray,
+    teams: np.ndarray,
+    time: float,
+    pool: SimulationPool | None = None,
+    cache: SimulationCache | None = None,
+    simulator: BallSimulator | None = None
+):
+    if pool is not None:
+        return pool.simulate_frames(context, frames, teams, time)
+    if cache is not None:
+        return cache.simulate_frames(context, frames, teams, time)
+
+    if simulator is None:
+        simulator = BallSimulator()
+    is_shot = np.zeros(len(frames), dtype=bool)
+    on_goal = np.zeros(len(frames), dtype=bool)
+    for i, (frame, team) in enumerate(zip(frames, teams)):
+        simulator.team = bool(team)
+        simulator.update_ball_from_context(context, frame)
+        simulator.simulate(time, record="none", adaptive=True)
+        is_shot[i] = simulator.is_shot
+        on_goal[i] = simulator.on_goal
+    return is_shot, on_goal
+
+
+def detect_shots(
+    chains: List[PossessionChain],
+    context: ReplayContext,
+    time: float=1,
+    pool: SimulationPool | None = None,
+    prefilter: ShotPrefilter | None = None,
+    cache: SimulationCache | None = None,
+    simulator: BallSimulator | None = None
+) -> int:
+    """
+    Marks the last hit of every chain that is simulated into the attacked goal as a shot.
+
+    simulator is reused for serial simulation when there is neither a pool nor a cache.
+    Returns the number of shots found.
+    """
+    # Skip shots we know are goals and hits without a team (never shots)
+    last_hits = [
+        chain.possessions[-1].hits[-1] for chain in chains
+        if chain.possessions[-1].hits[-1].hit_type != HitType.GOAL
+        and chain.possessions[-1].hits[-1].team is not None
+    ]
+    frames = np.array([hit.frame_number for hit in last_hits], dtype=np.int64)
+    teams = np.array([hit.team for hit in last_hits], dtype=bool)
+
+    needed = np.ones(len(last_hits), dtype=bool)
+    if prefilter is not None:
+        needed = prefilter.needs_simulation(context.ball[frames], teams, time)
+    simulated = np.ones_like(needed) if prefilter and prefilter.validate else needed
+
+    is_shot = np.zeros(len(last_hits), dtype=bool)
+    on_goal = np.zeros(len(last_hits), dtype=bool)
+    is_shot[simulated], on_goal[simulated] = _simulate_frames(
+        context, frames[simulated], teams[simulated], time, pool, cache, simulator
+    )
+    if prefilter is not None and prefilter.validate:
+        prefilter.check(needed, is_shot)
+
     shots = 0
+    for last_hit, hit_is_shot, hit_on_goal in zip(last_hits, is_shot, on_goal):
+        if hit_is_shot:
+            shots += 1
+            last_hit.hit_type = HitType.SHOT
+            last_hit.on_goal = bool(hit_on_goal)
+    return shots
+
+
+def classify_outcomes(chains: List[PossessionChain]):
+    """
+    Sets the outcome of goals, shots and chains once they are marked.
+
+    Goals are on goal. A shot that was going in but didn't score was saved (or
+    blocked), the other shots went wide. A chain ends in a goal or a shot when its
+    last hit is one, otherwise its team lost the ball.
+    """
     for chain in chains:
+        for possession in chain.possessions:
+            for hit in possession.hits:
+                if hit.hit_type == HitType.GOAL:
+                    hit.on_goal = True
+                    hit.outcome = Outcome.GOAL
+                elif hit.hit_type == HitType.SHOT:
+                    hit.outcome = Outcome.SAVE if hit.on_goal else Outcome.WIDE
         last_hit = chain.possessions[-1].hits[-1]
-        # Skip shots we know are goals
-        if last_hit.hit_type == "goal":
-            continue
-        
-        simulator.team = last_hit.team
-        simulator.update_ball(last_hit.ball_data)
-        simulator.simulate(time)
-        
-        if simulator.is_shot:
-            shots += 1
-            last_hit.hit_type = "shot"
-            last_hit.metadata["on_goal"] = simulator.on_goal
-    print(f"num_shots: {shots}")
-            
\ No newline at end of file
+        if last_hit.hit_type == HitType.GOAL:
+            chain.outcome = Outcome.GOAL
+        elif last_hit.hit_type == HitType.SHOT:
+            chain.outcome = Outcome.SHOT
+        elif chain.team is not None:
+            chain.outcome = Outcome.TURNOVER
@@ -1,45 +1,191 @@
+import numpy as np
+import pyarrow as pa
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Optional, TYPE_CHECKING
+from ..records import (
+    Team,
+    HitType,
+    Outcome,
+    team_array,
+    teams_from_arrow,
+    enum_array,
+    enums_from_arrow,
+    nest,
+    unnest,
+    split
+)
 
-from dataclasses import dataclass
-from typing import List, Set, Optional
+if TYPE_CHECKING:
+    from ..context import ReplayContext
 
 
-@dataclass
+@dataclass(slots=True)
 class Hit:
+    """A touch of the ball.
+
+    The ball and player states aren't stored on the hit: they are read from the
+    shared ReplayContext by frame number when accessed. materialize() copies them
+    into the hit and drops the context, e.g. before exporting or keeping hits
+    around after the replay is done.
+    """
     frame_number: int
     player_id: str
-    team: str
-    ball_data: dict
-    player_state: dict
-    hit_type: str = None  # 'shot', 'pass', 'dribble', 'aerial', 'clearance'
-    outcome: str = None   # 'goal', 'save', 'post', 'wide'
-    metadata: dict = None
+    team: Team | None
+    context: Optional["ReplayContext"] = field(default=None, repr=False, compare=False)
+    hit_type: HitType | None = None
+    outcome: Outcome | None = None  # goal, save or wide, set on shots
+    on_goal: bool | None = None  # set on shots, whether the simulated ball went in
+    xg: float | None = None  # set on shots by score.assign_xg
+    metadata: dict | None = None
+    _ball_data: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+    _player_state: Optional[Dict[str, np.ndarray]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def ball_data(self) -> np.ndarray:
+        """Ball state at the hit, columns STATE_COLUMNS."""
+        if self._ball_data is not None:
+            return self._ball_data
+        return self.context.ball[self.frame_number]
+
+    @property
+    def player_state(self) -> Dict[str, np.ndarray]:
+        """player_dfs key to the player's state at the hit, columns PLAYER_COLUMNS."""
+        if self._player_state is not None:
+            return self._player_state
+        return {
+            player: states[self.frame_number]
+            for player, states in self.context.player_states.items()
+        }
+
+    def materialize(self) -> "Hit":
+        """Copies the states out of the context so the hit no longer references it."""
+        if self.context is not None:
+            self._ball_data = self.ball_data.copy()
+            self._player_state = {
+                player: state.copy() for player, state in self.player_state.items()
+            }
+            self.context = None
+        return self
+
+    @staticmethod
+    def to_arrow(hits: List["Hit"]) -> pa.Table:
+        """
+        Table of the hits, one row each. The ball and player states and metadata
+        aren't included, from_arrow reads the states from a context again.
+        """
+        return pa.table({
+            "frame_number": pa.array([hit.frame_number for hit in hits], pa.int64()),
+            "player_id": pa.array([hit.player_id for hit in hits], pa.string()),
+            "team": team_array([hit.team for hit in hits]),
+            "hit_type": enum_array([hit.hit_type for hit in hits]),
+            "outcome": enum_array([hit.outcome for hit in hits]),
+            "on_goal": pa.array([hit.on_goal for hit in hits], pa.bool_()),
+            "xg": pa.array([hit.xg for hit in hits], pa.float64())
+        })
 
+    @classmethod
+    def from_arrow(cls, table: pa.Table, context: "ReplayContext | None" = None) -> List["Hit"]:
+        return [
+            cls(
+                frame_number=frame,
+                player_id=player,
+                team=team,
+                context=context,
+                hit_type=hit_type,
+                outcome=outcome,
+                on_goal=on_goal,
+                xg=xg
+            )
+            for frame, player, team, hit_type, outcome, on_goal, xg in zip(
+                table.column("frame_number").to_pylist(),
+                table.column("player_id").to_pylist(),
+                teams_from_arrow(table.column("team")),
+                enums_from_arrow(table.column("hit_type"), HitType),
+                enums_from_arrow(table.column("outcome"), Outcome),
+                table.column("on_goal").to_pylist(),
+                table.column("xg").to_pylist()
+            )
+        ]
 
-@dataclass
+
+@dataclass(slots=True)
 class Possession:
     start_frame: int
     end_frame: int
-    player_id: int
-    team: str
+    player_id: str
+    team: Team | None
     hits: List[Hit]
     duration: float = 0  # seconds
     possession_type: str = None  # TODO: 'organized', 'counter', 'fifty-fifty'
     chain_id: Optional[int] = None
+    is_dribble: bool = False  # most common gap between hits below the dribble threshold
 
     @property
     def num_hits(self):
         return len(self.hits)
 
+    @staticmethod
+    def to_arrow(possessions: List["Possession"]) -> pa.Table:
+        """Table of the possessions, one row each with their hits nested as a list column."""
+        return pa.table({
+            "start_frame": pa.array([p.start_frame for p in possessions], pa.int64()),
+            "end_frame": pa.array([p.end_frame for p in possessions], pa.int64()),
+            "player_id": pa.array([p.player_id for p in possessions], pa.string()),
+            "team": team_array([p.team for p in possessions]),
+            "duration": pa.array([p.duration for p in possessions], pa.float64()),
+            "possession_type": pa.array([p.possession_type for p in possessions], pa.string()),
+            "chain_id": pa.array([p.chain_id for p in possessions], pa.int64()),
+            "is_dribble": pa.array([p.is_dribble for p in possessions], pa.bool_()),
+            "hits": nest(
+                Hit.to_arrow([hit for p in possessions for hit in p.hits]),
+                [len(p.hits) for p in possessions]
+            )
+        })
+
+    @classmethod
+    def from_arrow(
+        cls, table: pa.Table, context: "ReplayContext | None" = None
+    ) -> List["Possession"]:
+        hit_table, offsets = unnest(table.column("hits"))
+        hits = split(Hit.from_arrow(hit_table, context), offsets)
+        return [
+            cls(
+                start_frame=start_frame,
+                end_frame=end_frame,
+                player_id=player,
+                team=team,
+                hits=possession_hits,
+                duration=duration,
+                possession_type=possession_type,
+                chain_id=chain_id,
+                is_dribble=is_dribble
+            )
+            for start_frame, end_frame, player, team, duration, possession_type,
+                chain_id, is_dribble, possession_hits in zip(
+                table.column("start_frame").to_pylist(),
+                table.column("end_frame").to_pylist(),
+                table.column("player_id").to_pylist(),
+                teams_from_arrow(table.column("team")),
+                table.column("duration").to_pylist(),
+                table.column("possession_type").to_pylist(),
+                table.column("chain_id").to_pylist(),
+                table.column("is_dribble").to_pylist(),
+                hits
+            )
+        ]
 
-@dataclass
+
+@dataclass(slots=True)
 class PossessionChain:
     start_frame: int
     end_frame: int
     players: Set[str]
-    team: str
+    team: Team | None
     possessions: List[Possession]
     duration: float = 0  # seconds
-    outcome: str = None  # 'shot', 'goal', 'turnover', 'clearance'
+    outcome: Outcome | None = None  # goal, shot or turnover
 
     @property
     def num_hits(self):
@@ -48,3 +194,47 @@ class PossessionChain:
     @property
     def num_players(self):
         return len(self.players)
+
+    @staticmethod
+    def to_arrow(chains: List["PossessionChain"]) -> pa.Table:
+        """
+        Table of the chains, one row each with their possessions (and their hits)
+        nested as a list column. players isn't stored, it's the possessions' players.
+        """
+        return pa.table({
+            "start_frame": pa.array([chain.start_frame for chain in chains], pa.int64()),
+            "end_frame": pa.array([chain.end_frame for chain in chains], pa.int64()),
+            "team": team_array([chain.team for chain in chains]),
+            "duration": pa.array([chain.duration for chain in chains], pa.float64()),
+            "outcome": enum_array([chain.outcome for chain in chains]),
+            "possessions": nest(
+                Possession.to_arrow([p for chain in chains for p in chain.possessions]),
+                [len(chain.possessions) for chain in chains]
+            )
+        })
+
+    @classmethod
+    def from_arrow(
+        cls, table: pa.Table, context: "ReplayContext | None" = None
+    ) -> List["PossessionChain"]:
+        possession_table, offsets = unnest(table.column("possessions"))
+        possessions = split(Possession.from_arrow(possession_table, context), offsets)
+        return [
+            cls(
+                start_frame=start_frame,
+                end_frame=end_frame,
+                players={possession.player_id for possession in chain_possessions},
+                team=team,
+                possessions=chain_possessions,
+                duration=duration,
+                outcome=outcome
+            )
+            for start_frame, end_frame, team, duration, outcome, chain_possessions in zip(
+                table.column("start_frame").to_pylist(),
+                table.column("end_frame").to_pylist(),
+                teams_from_arrow(table.column("team")),
+                table.column("duration").to_pylist(),
+                enums_from_arrow(table.column("outcome"), Outcome),
+                possessions
+            )
+        ]
@@ -1,11 +1,56 @@
-from typing import List
+import numpy as np
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Iterator, List
 from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
 from .base import Hit, Possession, PossessionChain
-from .analysis import find_goal_hits, detect_shots
+from .analysis import classify_outcomes, find_goal_hits, detect_shots
+from .segmentation import Segmentation, dribble_flags, segment_hits
+from ..context import ReplayContext
+from ..features import SHOT_TIME
+from ..records import Team, HitType
+from ..timeline import GOAL
+from ..simulator.ball_simulator import BallSimulator
+from ..simulator.cache import SimulationCache
+from ..simulator.pool import SimulationPool
+from ..simulator.prefilter import ShotPrefilter
+
+
+@dataclass
+class _PendingChain:
+    """A closed chain waiting to know whether its last hit scored.
+
+    It scored if the first goal of its team after its last hit comes before any
+    other hit of that team.
+    """
+    chain: PossessionChain
+    goal_frame: int | None
+    scored: bool | None = None
+
+    def __post_init__(self):
+        if self.goal_frame is None:
+            self.scored = False
+
+    def see(self, hit: Hit):
+        if self.scored is not None:
+            return
+        if hit.frame_number >= self.goal_frame:
+            self.scored = True
+        elif hit.team == self.chain.team:
+            self.scored = False
+
+    def end(self):
+        if self.scored is None:
+            self.scored = True
 
 
 class PossessionAnalyzer:
     """Analyzes Ball Possessions in a ParsedReplay
+
+    analyze_replay processes a whole replay at once. stream (or start_replay, feed
+    and flush) emits each chain, already classified, as soon as it is closed by a
+    team change or a gap longer than max_possession_gap and it is known whether its
+    last hit scored.
     
     Attributes:
         current_chain (PossessionChain): Current chain of possessions (single team)
@@ -13,82 +58,193 @@ class PossessionAnalyzer:
         params (dict): Option parameters for the replay analysis
             - max_possession_gap: maximum number of frames between touches for a possession to count.
             - frames_per_second: number of frames per second the replay is recorded at.
-            - shot_time: time into the future hits are simulated and shots are detected.
+            - shot_time: time into the future hits are simulated and shots are detected, the
+              horizon of the training shots (SHOT_TIME) by default.
+            - dribble_threshold: most common number of frames between a player's touches for a dribble.
+        pool (SimulationPool): Optional pool used to simulate shots in parallel.
+        prefilter (ShotPrefilter): Optional filter that skips hits which can't be shots.
+        cache (SimulationCache): Optional cache of simulation results, used when there is no pool
+            (give the pool its own cache instead).
     """
-    def __init__(self):
+    def __init__(
+        self,
+        pool: SimulationPool | None = None,
+        prefilter: ShotPrefilter | None = None,
+        cache: SimulationCache | None = None
+    ):
+        self.pool = pool
+        self.prefilter = prefilter
+        self.cache = cache
         self.current_chain: PossessionChain | None = None
         self.current_possession: Possession | None = None
+        self._simulator: BallSimulator | None = None
+        self._replay: ParsedReplay | None = None
+        self._context: ReplayContext | None = None
+        self._pending: Deque[_PendingChain] = deque()
+        self._reset()
         self.params = {
             "max_possession_gap": 120,  # frames
             "frames_per_second": 30,  # fps
-            "shot_time": 2 # s
+            "shot_time": SHOT_TIME, # s
+            "dribble_threshold": 15  # frames
         }
 
-    def analyze_replay(self, replay: ParsedReplay) -> List[PossessionChain]:
-        self.current_chain = None
-        self.current_possession = None
-        chains = self._generate_possession_chains(replay)
+    def analyze_replay(
+        self, replay: ParsedReplay, context: ReplayContext | None = None
+    ) -> List[PossessionChain]:
+        if context is None:
+            context = ReplayContext(replay)
+        chains = self._generate_possession_chains(replay, context)
         possessions = [possession for chain in chains for possession in chain.possessions]
         hits = [hit for possession in possessions for hit in possession.hits]
-        self._classify_hits(replay, hits)
+        self._classify_hits(replay, hits, context)
         self._classify_possessions(replay, possessions)
-        self._classify_chains(replay, chains)
+        self._classify_chains(replay, chains, context)
         return hits, possessions, chains
 
-    def _generate_possession_chains(self, replay: ParsedReplay) -> List[PossessionChain]:
+    def stream(
+        self, replay: ParsedReplay, context: ReplayContext | None = None
+    ) -> Iterator[PossessionChain]:
+        """Yields the classified chains of a replay one by one."""
+        self.start_replay(replay, context)
+        for hit_dict in replay.analyzer["hits"]:
+            yield from self.feed(hit_dict)
+        yield from self.flush()
+
+    def start_replay(self, replay: ParsedReplay, context: ReplayContext | None = None):
+        """Prepares incremental analysis of a replay with feed()."""
+        if context is None:
+            context = ReplayContext(replay)
+        self._replay = replay
+        self._context = context
+        self._reset()
+        self._pending.clear()
+
+    def feed(self, hit_dict: dict) -> List[PossessionChain]:
+        """
+        Adds the next hit (an entry of replay.analyzer["hits"]).
+
+        Returns the chains completed by this hit, classified, in replay order.
+        """
+        hit = self._make_hit(hit_dict, self._context)
+        closed_chain = self._add_hit(hit)
+        if closed_chain:
+            self._pending.append(_PendingChain(closed_chain, self._next_goal(closed_chain)))
+        for pending in self._pending:
+            pending.see(hit)
+        return self._emit()
+
+    def flush(self) -> List[PossessionChain]:
+        """Closes the replay and returns its remaining chains, classified."""
+        closed_chain = self._close_chain()
+        if closed_chain:
+            self._pending.append(_PendingChain(closed_chain, self._next_goal(closed_chain)))
+        for pending in self._pending:
+            pending.end()
+        chains = self._emit()
+        self._reset()
+        return chains
+
+    def _next_goal(self, chain: PossessionChain) -> int | None:
+        if chain.team is None:
+            return None
+        timeline = self._context.timeline
+        last_frame = chain.possessions[-1].hits[-1].frame_number
+        goal = timeline.first_after(GOAL, last_frame, chain.team)
+        return timeline.frame(GOAL, goal) if goal is not None else None
+
+    def _emit(self) -> List[PossessionChain]:
         chains = []
-        current_player = None
-        current_team = None
-        last_hit_frame = None
+        while self._pending and self._pending[0].scored is not None:
+            pending = self._pending.popleft()
+            if pending.scored:
+                pending.chain.possessions[-1].hits[-1].hit_type = HitType.GOAL
+            chains.append(pending.chain)
+        if chains:
+            possessions = [possession for chain in chains for possession in chain.possessions]
+            self._classify_possessions(self._replay, possessions)
+            self._classify_chains(self._replay, chains, self._context)
+        return chains
 
-        for hit_dict in replay.analyzer["hits"]:
-            frame = hit_dict["frame_number"]
-            player = hit_dict["player_unique_id"]
-            team = self._get_player_team(player, replay)
-            hit = Hit(
-                frame_number=frame,
-                player_id=player,
-                team=team,
-                ball_data=replay.ball_df.iloc[frame, :],
-                player_state=self._get_player_states(frame, replay),
-                metadata={}
-            )
-            frames_since_last = frame - last_hit_frame if last_hit_frame else 0
-            last_hit_frame = frame
-
-            if team != current_team or frames_since_last > self.params["max_possession_gap"]:
-                self._finalize_possession()
-                self._finalize_chain()
-                if self.current_chain:
-                    chains.append(self.current_chain)
+    def segment_replay(
+        self, replay: ParsedReplay, context: ReplayContext | None = None
+    ) -> Segmentation:
+        """Possession and chain tables of a replay, without building any objects."""
+        if context is None:
+            context = ReplayContext(replay)
+        hits = replay.analyzer["hits"]
+        player_ids = [hit["player_unique_id"] for hit in hits]
+        return segment_hits(
+            [hit["frame_number"] for hit in hits],
+            player_ids,
+            [context.teams.get(player) for player in player_ids],
+            max_possession_gap=self.params["max_possession_gap"],
+            frames_per_second=self.params["frames_per_second"],
+            dribble_threshold=self.params["dribble_threshold"]
+        )
 
+    def _generate_possession_chains(
+        self, replay: ParsedReplay, context: ReplayContext
+    ) -> List[PossessionChain]:
+        return self.segment_replay(replay, context).build_chains(context)
+
+    def _reset(self):
+        self.current_chain = None
+        self.current_possession = None
+        self._current_player = None
+        self._current_team = None
+        self._last_hit_frame = None
+
+    @staticmethod
+    def _make_hit(hit_dict: dict, context: ReplayContext) -> Hit:
+        player = hit_dict["player_unique_id"]
+        return Hit(
+            frame_number=hit_dict["frame_number"],
+            player_id=player,
+            team=Team.from_is_orange(context.teams.get(player)),
+            context=context
+        )
+
+    def _add_hit(self, hit: Hit) -> PossessionChain | None:
+        """Adds a hit to the current possession and chain, returns the chain it closed if any."""
+        frame = hit.frame_number
+        frames_since_last = frame - self._last_hit_frame if self._last_hit_frame is not None else 0
+        self._last_hit_frame = frame
+
+        # The first hit always starts a chain, even without a team (like segment_hits)
+        closed_chain = None
+        if (
+            self.current_chain is None
+            or hit.team != self._current_team
+            or frames_since_last > self.params["max_possession_gap"]
+        ):
+            closed_chain = self._close_chain()
+            self._start_possession(hit)
+            self._start_chain(self.current_possession)
+            self._current_player = hit.player_id
+            self._current_team = hit.team
+
+        else:
+            if hit.player_id != self._current_player:
+                self._finalize_possession()
                 self._start_possession(hit)
-                self._start_chain(self.current_possession)
-                current_player = player
-                current_team = team
+                self.current_chain.possessions.append(
+                    self.current_possession
+                )
+                self.current_chain.players.add(hit.player_id)
+                self._current_player = hit.player_id
 
             else:
-                if player != current_player:
-                    self._finalize_possession()
-                    self._start_possession(hit)
-                    self.current_chain.possessions.append(
-                        self.current_possession
-                    )
-                    self.current_chain.players.add(player)
-                    current_player = player
-
-                else:
-                    self.current_possession.end_frame = frame
-                    self.current_possession.hits.append(hit)
-
-                self.current_chain.end_frame = frame
-                self.current_chain.possessions
-        
+                self.current_possession.end_frame = frame
+                self.current_possession.hits.append(hit)
+
+            self.current_chain.end_frame = frame
+        return closed_chain
+
+    def _close_chain(self) -> PossessionChain | None:
         self._finalize_possession()
         self._finalize_chain()
-        if self.current_chain:
-            chains.append(self.current_chain)
-        return chains
+        return self.current_chain
 
     def _start_possession(self, hit: Hit) -> None:
         self.current_possession = Possession(
@@ -116,6 +272,10 @@ class PossessionAnalyzer:
         start = self.current_possession.start_frame
         end = self.current_possession.end_frame
         self.current_possession.duration = self._calculate_duration(start, end)
+        frames = [hit.frame_number for hit in self.current_possession.hits]
+        self.current_possession.is_dribble = bool(dribble_flags(
+            frames, np.zeros(len(frames), dtype=np.int64), self.params["dribble_threshold"]
+        )[0])
 
     def _finalize_chain(self):
         """Final calculations on the current PossessionChain"""
@@ -129,31 +289,32 @@ class PossessionAnalyzer:
     def _calculate_duration(self, start: int, end: int) -> float:
         return (end - start) / self.params["frames_per_second"]
 
-    @staticmethod
-    def _get_player_team(player_id: int, replay: ParsedReplay) -> bool:
-        for player in replay.metadata["players"]:
-            if player["unique_id"] == player_id:
-                return player["is_orange"]
-
-    @staticmethod
-    def _get_player_states(frame: int, replay: ParsedReplay) -> dict:
-        return {
-            player: state.iloc[frame, :]
-            for player, state in replay.player_dfs.items()
-        }
-        
-    def _classify_hits(self, replay: ParsedReplay, hits: List[Hit]):
+    def _classify_hits(self, replay: ParsedReplay, hits: List[Hit], context: ReplayContext):
         # Find goals (Compare hit frame to game periods)
-        find_goal_hits(replay, hits)
+        find_goal_hits(replay, hits, context)
     
     def _classify_possessions(self, replay: ParsedReplay, possessions: List[Possession]):
         # Find dribbles (Time between player hits)
         pass
     
-    def _classify_chains(self, replay: ParsedReplay, chains: List[PossessionChain]):
+    def _classify_chains(
+        self, replay: ParsedReplay, chains: List[PossessionChain], context: ReplayContext
+    ):
         # Find passes (Links between players possessions)
         # Find 50/50s (Links between opponent possessons)
         # Detect Shots (Last hit of a possession chain)
-        detect_shots(chains, time=self.params["shot_time"])
-        # Detect Saves (Opponent hits after a shot)
-        pass
+        num_shots = detect_shots(
+            chains, context, time=self.params["shot_time"],
+            pool=self.pool, prefilter=self.prefilter, cache=self.cache,
+            simulator=self.simulator if self.pool is None and self.cache is None else None
+        )
+        # Goal, save or wide shots and how chains ended
+        classify_outcomes(chains)
+        return num_shots
+
+    @property
+    def simulator(self) -> BallSimulator:
+        """BallSimulator reused by every serial shot detection of this analyzer."""
+        if self._simulator is None:
+            self._simulator = BallSimulator()
+        return self._simulator
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple, TYPE_CHECKING
+from .base import Hit, Possession, PossessionChain
+from ..records import Team
+
+if TYPE_CHECKING:
+    from ..context import ReplayContext
+
+NO_TEAM = -1
+
+
+def _starts(new_group: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(new_group)
+
+
+def _ends(starts: np.ndarray, n: int) -> np.ndarray:
+    return np.append(starts[1:], n)[:len(starts)] - 1
+
+
+def grouped_mode(groups: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Most common value of every group, ties going to the value seen first like statistics.mode.
+
+    Returns the groups that have values and their modes, sorted by group.
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values)
+    if len(values) == 0:
+        return groups[:0], values[:0]
+    order = np.lexsort((values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (sorted_groups[1:] != sorted_groups[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    run_starts = _starts(new_run)
+    counts = np.diff(np.append(run_starts, len(order)))
+    first_seen = np.minimum.reduceat(order, run_starts)
+    run_groups = sorted_groups[run_starts]
+
+    best = np.lexsort((first_seen, -counts, run_groups))
+    best_groups = run_groups[best]
+    first_of_group = np.ones(len(best), dtype=bool)
+    first_of_group[1:] = best_groups[1:] != best_groups[:-1]
+    return best_groups[first_of_group], sorted_values[run_starts][best][first_of_group]
+
+
+def dribble_flags(
+    frames: np.ndarray, possession_ids: np.ndarray, dribble_threshold: int = 15
+) -> np.ndarray:
+    """
+    Whether each possession is a dribble: at least two hits whose most common
+    frame gap is below dribble_threshold. possession_ids must be sorted 0..n-1.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    possession_ids = np.asarray(possession_ids, dtype=np.int64)
+    num_possessions = possession_ids[-1] + 1 if len(possession_ids) else 0
+    same = possession_ids[1:] == possession_ids[:-1]
+    groups, modes = grouped_mode(possession_ids[1:][same], np.diff(frames)[same])
+    is_dribble = np.zeros(num_possessions, dtype=bool)
+    is_dribble[groups] = modes < dribble_threshold
+    return is_dribble
+
+
+@dataclass
+class Segmentation:
+    """Columnar possession and chain segmentation of a replay's hits.
+
+    Attributes:
+        hits (pd.DataFrame): frame_number, player_id, team, possession_id and chain_id per hit.
+        possessions (pd.DataFrame): One row per possession, indexed by possession_id.
+        chains (pd.DataFrame): One row per chain, indexed by chain_id.
+    """
+    hits: pd.DataFrame
+    possessions: pd.DataFrame
+    chains: pd.DataFrame
+
+    def build_chains(self, context: "ReplayContext | None" = None) -> List[PossessionChain]:
+        """PossessionChain objects for the tables, with hits resolving their states from context."""
+        hits = [
+            Hit(
+                frame_number=frame,
+                player_id=player,
+                team=None if pd.isna(team) else Team.from_is_orange(team),
+                context=context
+            )
+            for frame, player, team in zip(
+                self.hits["frame_number"].tolist(),
+                self.hits["player_id"].tolist(),
+                self.hits["team"].tolist()
+            )
+        ]
+        hit_starts = self.possessions["first_hit"].tolist() + [len(hits)]
+        possessions = [
+            Possession(
+                start_frame=start_frame,
+                end_frame=end_frame,
+                player_id=player,
+                team=None if pd.isna(team) else Team.from_is_orange(team),
+                hits=hits[hit_starts[i]:hit_starts[i + 1]],
+                duration=duration,
+                chain_id=chain_id,
+                is_dribble=is_dribble
+            )
+            for i, (start_frame, end_frame, player, team, duration, chain_id, is_dribble)
+            in enumerate(zip(
+                *(self.possessions[column].tolist() for column in (
+                    "start_frame", "end_frame", "player_id", "team",
+                    "duration", "chain_id", "is_dribble"
+                ))
+            ))
+        ]
+        possession_starts = self.chains["first_possession"].tolist() + [len(possessions)]
+        return [
+            PossessionChain(
+                start_frame=start_frame,
+                end_frame=end_frame,
+                players={
+                    possession.player_id
+                    for possession in possessions[possession_starts[i]:possession_starts[i + 1]]
+                },
+                team=None if pd.isna(team) else Team.from_is_orange(team),
+                possessions=possessions[possession_starts[i]:possession_starts[i + 1]],
+                duration=duration
+            )
+            for i, (start_frame, end_frame, team, duration) in enumerate(zip(
+                *(self.chains[column].tolist() for column in (
+                    "start_frame", "end_frame", "team", "duration"
+                ))
+            ))
+        ]
+
+
+def segment_hits(
+    frames: Sequence[int],
+    player_ids: Sequence,
+    teams: Sequence,
+    max_possession_gap: int = 120,
+    frames_per_second: float = 30,
+    dribble_threshold: int = 15
+) -> Segmentation:
+    """
+    Splits hits (in frame order) into possessions and chains like PossessionAnalyzer.
+
+    A chain ends when the team changes or more than max_possession_gap frames pass
+    between hits, a possession also ends when the player changes. teams holds
+    is_orange or None for hits by players without a team.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    player_codes, players = pd.factorize(pd.Series(player_ids, dtype=object))
+    team_codes = np.array(
+        [NO_TEAM if team is None else int(team) for team in teams], dtype=np.int8
+    )
+    n = len(frames)
+
+    new_chain = np.ones(n, dtype=bool)
+    new_chain[1:] = (team_codes[1:] != team_codes[:-1]) | (np.diff(frames) > max_possession_gap)
+    new_possession = new_chain.copy()
+    new_possession[1:] |= player_codes[1:] != player_codes[:-1]
+    chain_ids = np.cumsum(new_chain) - 1
+    possession_ids = np.cumsum(new_possession) - 1
+
+    team_values = pd.array(
+        np.where(team_codes == NO_TEAM, None, team_codes == 1), dtype="boolean"
+    )
+    hits = pd.DataFrame({
+        "frame_number": frames,
+        "player_id": players.take(player_codes),
+        "team": team_values,
+        "possession_id": possession_ids,
+        "chain_id": chain_ids
+    })
+
+    possession_starts = _starts(new_possession)
+    possession_ends = _ends(possession_starts, n)
+    possessions = pd.DataFrame({
+        "start_frame": frames[possession_starts],
+        "end_frame": frames[possession_ends],
+        "player_id": players.take(player_codes[possession_starts]),
+        "team": team_values[possession_starts],
+        "chain_id": chain_ids[possession_starts],
+        "first_hit": possession_starts,
+        "num_hits": possession_ends - possession_starts + 1,
+        "duration": (frames[possession_ends] - frames[possession_starts]) / frames_per_second,
+        "is_dribble": dribble_flags(frames, possession_ids, dribble_threshold)
+    })
+    possessions.index.name = "possession_id"
+
+    chain_starts = _starts(new_chain)
+    chain_ends = _ends(chain_starts, n)
+    # Distinct (chain, player) pairs counted per chain
+    chain_player_pairs = np.unique(chain_ids * len(players) + player_codes)
+    chain_players = np.bincount(
+        chain_player_pairs // max(len(players), 1), minlength=len(chain_starts)
+    )
+    chains = pd.DataFrame({
+        "start_frame": frames[chain_starts],
+        "end_frame": frames[chain_ends],
+        "team": team_values[chain_starts],
+        "first_possession": possession_ids[chain_starts],
+        "num_possessions": np.bincount(chain_ids[possession_starts], minlength=len(chain_starts)),
+        "num_hits": chain_ends - chain_starts + 1,
+        "num_players": chain_players,
+        "duration": (frames[chain_ends] - frames[chain_starts]) / frames_per_second
+    })
+    chains.index.name = "chain_id"
+    return Segmentation(hits, possessions, chains)
@@ -0,0 +1,87 @@
+import numpy as np
+import pyarrow as pa
+from enum import IntEnum, StrEnum
+from typing import List, Sequence
+
+
+class Team(IntEnum):
+    """Team of a player or hit. Compares equal to is_orange, so it can be used as one."""
+    BLUE = 0
+    ORANGE = 1
+
+    @classmethod
+    def from_is_orange(cls, is_orange) -> "Team | None":
+        """Team for a replay is_orange value, None for players without a team."""
+        if is_orange is None:
+            return None
+        return cls.ORANGE if is_orange else cls.BLUE
+
+
+class HitType(StrEnum):
+    SHOT = "shot"
+    GOAL = "goal"
+    PASS = "pass"
+    DRIBBLE = "dribble"
+    AERIAL = "aerial"
+    CLEARANCE = "clearance"
+
+
+class Outcome(StrEnum):
+    GOAL = "goal"
+    SAVE = "save"
+    POST = "post"
+    WIDE = "wide"
+    SHOT = "shot"
+    TURNOVER = "turnover"
+    CLEARANCE = "clearance"
+
+
+TEAM_TYPE = pa.int8()
+
+
+def team_array(teams: Sequence) -> pa.Array:
+    """int8 array of teams (or is_orange values), null for no team."""
+    return pa.array([None if team is None else int(team) for team in teams], TEAM_TYPE)
+
+
+def teams_from_arrow(column) -> List[Team | None]:
+    return [None if team is None else Team(team) for team in column.to_pylist()]
+
+
+def enum_array(values: Sequence) -> pa.Array:
+    """Dictionary-encoded string array of enum values, null for None."""
+    return pa.array(
+        [None if value is None else str(value) for value in values], pa.string()
+    ).dictionary_encode()
+
+
+def enums_from_arrow(column, enum: type) -> List:
+    members = {member.value: member for member in enum}
+    members[None] = None
+    return [members[value] for value in column.to_pylist()]
+
+
+def nest(table: pa.Table, counts: Sequence[int]) -> pa.Array:
+    """Packs consecutive rows of table into a list<struct> array, counts[i] rows per list."""
+    offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    rows = pa.StructArray.from_arrays(
+        [column.combine_chunks() for column in table.columns], names=table.column_names
+    )
+    return pa.ListArray.from_arrays(pa.array(offsets), rows)
+
+
+def unnest(column) -> tuple[pa.Table, np.ndarray]:
+    """Inverse of nest: the rows of every list as one table and the list offsets."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    offsets = column.offsets.to_numpy()
+    rows = column.values.slice(offsets[0], offsets[-1] - offsets[0])
+    return pa.Table.from_struct_array(rows), offsets - offsets[0]
+
+
+def split(records: List, offsets: np.ndarray) -> List[List]:
+    """Slices a flat list of records at the offsets returned by unnest."""
+    bounds = offsets.tolist()
+    return [records[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
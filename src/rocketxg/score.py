@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import os
+import sys
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+from .context import ReplayContext
+from .features import SHOTS, FeatureCache, extract_features, find_shots
+from .possessions.base import Hit, PossessionChain
+from .train import load_model
+
+
+def assign_xg(chains: Iterable[PossessionChain], shots: pd.DataFrame, xg: np.ndarray) -> List[Hit]:
+    """
+    Copies the xG of find_shots shots onto the chain hits at the same frame by the
+    same player. Returns those hits, the other hits keep xg None.
+    """
+    shot_xg = dict(zip(
+        zip(shots["frame"].tolist(), shots["shooter_id"].tolist()), np.asarray(xg).tolist()
+    ))
+    hits = []
+    for chain in chains:
+        for possession in chain.possessions:
+            for hit in possession.hits:
+                value = shot_xg.get((hit.frame_number, hit.player_id))
+                if value is not None:
+                    hit.xg = value
+                    hits.append(hit)
+    return hits
+
+
+class XGScorer:
+    """An xG model and the feature schema it was trained on.
+
+    Shots are found and featurized like the training rows (find_shots and the
+    registered extractors), and every replay is scored with one feature matrix and
+    one prediction call. Use load_scorer to load a model once per process.
+
+    Attributes:
+        booster (xgb.Booster): The trained model.
+        features (list): Feature columns the model expects, in order.
+        version (str): Version of the saved model.
+        iteration_range (tuple): Trees used for predictions, up to the best iteration.
+    """
+    def __init__(
+        self,
+        booster: xgb.Booster,
+        features: List[str],
+        version: str | None = None,
+        best_iteration: int | None = None
+    ):
+        self.booster = booster
+        self.features = list(features)
+        self.version = version
+        self.iteration_range = (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+    @classmethod
+    def load(cls, path: str | Path, version: str | None = None) -> "XGScorer":
+        booster, schema = load_model(path, version)
+        return cls(booster, schema["features"], schema.get("version"), schema.get("best_iteration"))
+
+    def feature_matrix(self, features: pd.DataFrame) -> np.ndarray:
+        """
+        (n_shots, n_features) float32 matrix in schema order of extract_features (or
+        FeatureCache) output. Raises ValueError when a schema column is missing.
+        """
+        missing = [column for column in self.features if column not in features.columns]
+        if missing:
+            raise ValueError(
+                f"Features {missing} of model {self.version} are not produced by the "
+                "registered extractors"
+            )
+        return features[self.features].to_numpy(dtype=np.float32)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Goal probability of every row of a feature matrix."""
+        if len(features) == 0:
+            return np.empty(0, dtype=np.float32)
+        return self.booster.inplace_predict(features, iteration_range=self.iteration_range)
+
+    def score_shots(self, context: ReplayContext, shots: pd.DataFrame) -> np.ndarray:
+        """xG of a shots table (frame, shooter_id and is_goal per shot, see find_shots)."""
+        return self.predict_proba(self.feature_matrix(extract_features(context, shots)))
+
+
+@lru_cache(maxsize=None)
+def load_scorer(path: str, version: str | None = None) -> XGScorer:
+    """XGScorer of a saved model, loaded once per process."""
+    return XGScorer.load(path, version)
+
+
+def score_replay(
+    path: str | Path,
+    scorer: XGScorer,
+    feature_cache: FeatureCache | None = None,
+    replay_hash: str | None = None
+) -> pd.DataFrame:
+    """
+    Finds and scores the shots of a replay (a .replay file or a parsed replay), the
+    same shots the training rows are made of.
+
+    With a feature cache and the replay hash the shots and features are read from
+    (or added to) the cache, so a replay whose groups are fresh isn't even loaded.
+    Returns one row per shot with the replay path, frame, shooter_id, is_goal, xg and
+    the model version.
+    """
+    if feature_cache is not None and replay_hash is not None:
+        features = feature_cache.features(
+            replay_hash, lambda: ReplayContext(ParsedReplay.load(path))
+        )
+        shots = feature_cache.read(SHOTS, replay_hash)
+        shots["xg"] = scorer.predict_proba(scorer.feature_matrix(features))
+    else:
+        context = ReplayContext(ParsedReplay.load(path))
+        shots, _ = find_shots(context)
+        shots["xg"] = scorer.score_shots(context, shots)
+    shots.insert(0, "replay", str(path))
+    shots["model_version"] = scorer.version
+    return shots
+
+
+def _score_path(
+    path: Path, model_path: str, version: str | None, feature_cache_path: str | None
+) -> pd.DataFrame:
+    feature_cache = replay_hash = None
+    # Replay files are cached by content hash like in process_data
+    if feature_cache_path is not None and path.is_file():
+        feature_cache = FeatureCache(feature_cache_path)
+        with open(path, "rb") as file:
+            replay_hash = hashlib.file_digest(file, "sha256").hexdigest()
+    return score_replay(path, load_scorer(model_path, version), feature_cache, replay_hash)
+
+
+def find_replays(paths: Iterable[str | Path]) -> List[Path]:
+    """The given replay files and the .replay files found under the given directories."""
+    replays = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            replays.extend(sorted(path.rglob("*.replay")))
+        else:
+            replays.append(path)
+    return replays
+
+
+def score_paths(
+    paths: List[Path],
+    model_path: str,
+    version: str | None = None,
+    workers: int = 1,
+    feature_cache_path: str | None = None
+) -> Iterator[Tuple[Path, pd.DataFrame | Exception]]:
+    """Yields (path, shots) or (path, Exception) for every replay."""
+    model_path = str(model_path)
+    if workers <= 1:
+        for path in paths:
+            try:
+                yield path, _score_path(path, model_path, version, feature_cache_path)
+            except Exception as e:
+                yield path, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_score_path, path, model_path, version, feature_cache_path): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Scores the shots of replays with an xG model.")
+    parser.add_argument("model", type=str, help="model directory written by save_model")
+    parser.add_argument("replays", type=str, nargs="+", help="replay files or directories")
+    parser.add_argument("-o", "--output", type=str, default=None, help="parquet file for the shots")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--version", type=str, default=None)
+    parser.add_argument("--feature-cache", type=str, default=None)
+    args = parser.parse_args(argv)
+
+    paths = find_replays(args.replays)
+    tables = []
+    failures = {}
+    for path, result in score_paths(
+        paths, args.model, args.version, args.workers, args.feature_cache
+    ):
+        if isinstance(result, Exception):
+            failures[path] = result
+            print(f"Failed {path}: {result}", file=sys.stderr)
+            continue
+        print(f"{path}: {len(result)} shots, {result['xg'].sum():.2f} xG")
+        tables.append(result)
+
+    if args.output and tables:
+        pd.concat(tables, ignore_index=True).to_parquet(args.output, index=False)
+    print(f"Scored {len(paths) - len(failures)}/{len(paths)} replays")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,32 @@
 import numpy as np
 import pandas as pd
+from typing import TYPE_CHECKING
 import RocketSim as rsim
 import rlgym.rocket_league.math as rlmath
 
 from rlgym.rocket_league.sim import RocketSimEngine
-from .hit_analysis import distance_to_goal
+from .utils.geometry import point_goal_distance
+from .utils.columns import POS, VEL, ANG_VEL
+from .simulator.recording import TrajectoryRecorder, TRAJECTORY_COLUMNS
+from .simulator.prefilter import safe_stride
+
+if TYPE_CHECKING:
+    from .context import ReplayContext
 
 sim = RocketSimEngine()
 sim.close()
 
 
 def detect_shot(pos, team, threshold=500):
-    dist = distance_to_goal(pos, not team)
+    dist = point_goal_distance(pos, not team)
     if dist < threshold:
         return True
     return False
 
 
-def sim_detect_shot(ball_data, arena, time_s=1):
-    is_shot = False
-    team = ball_data["hit_team_num"]
-    if team:
-        goal_dir = 1
-    else:
-        goal_dir = -1
-
-    tick_rate = round(arena.tick_rate)
-    ticks = round(tick_rate*time_s)
-
+def sim_detect_shot(
+    ball_data, arena, time_s=1, record="full", recorder=None, adaptive=False
+):
     ball_pos = ball_data[["pos_x", "pos_y", "pos_z"]].to_numpy()
     ball_vel = ball_data[["vel_x", "vel_y", "vel_z"]].to_numpy()
     ball_ang_vel = ball_data[["ang_vel_x",
@@ -43,23 +42,87 @@ def sim_detect_shot(ball_data, arena, time_s=1):
     except ValueError:
         pass
     arena.ball.set_state(ball_state)
-    ball_sim_data = []
-    for _ in range(ticks):
-        arena.step(1)
+    return _simulate_shot(
+        arena, ball_data["hit_team_num"], time_s, record, recorder, adaptive
+    )
+
+
+def sim_detect_shot_at(
+    context: "ReplayContext",
+    frame: int,
+    arena,
+    time_s=1,
+    record="full",
+    recorder=None,
+    adaptive=False
+):
+    """sim_detect_shot for a replay frame, reading the context's precomputed arrays."""
+    state = context.ball[frame]
+    ball_state = rsim.BallState()
+    ball_state.pos = rsim.Vec(*state[POS])
+    ball_state.vel = rsim.Vec(*state[VEL])
+    ball_state.ang_vel = rsim.Vec(*state[ANG_VEL])
+    try:
+        ball_state.rot_mat = rsim.RotMat(
+            *context.ball_rot_mats[frame].transpose().flatten())
+    except ValueError:
+        pass
+    arena.ball.set_state(ball_state)
+    return _simulate_shot(
+        arena, context.ball_team[frame], time_s, record, recorder, adaptive
+    )
+
+
+def _simulate_shot(
+    arena,
+    team,
+    time_s=1,
+    record="full",
+    recorder=None,
+    adaptive=False,
+    threshold=500,
+    max_stride=30
+):
+    """
+    Returns is_shot and, depending on record, nothing ("none"), a ShotSummary
+    ("summary") or a DataFrame of every simulated tick ("full").
+
+    Pass the same recorder to repeated calls to reuse its trajectory buffer.
+    adaptive steps up to max_stride ticks at once while nothing can happen, like
+    BallSimulator.simulate, and is ignored for full recordings.
+    """
+    is_shot = False
+    if team:
+        goal_dir = 1
+    else:
+        goal_dir = -1
+
+    tick_rate = round(arena.tick_rate)
+    ticks = round(tick_rate*time_s)
+    if recorder is None:
+        recorder = TrajectoryRecorder(tick_rate)
+    recorder.reset(ticks, record)
+
+    adaptive = adaptive and record != "full"
+    next_state = arena.ball.get_state() if adaptive else None
+    shot_tick = -1
+    tick = -1
+    while tick < ticks - 1:
+        stride = 1
+        if adaptive and goal_dir*next_state.vel[1] <= 0:
+            stride = safe_stride(
+                next_state.pos, next_state.vel, not team, threshold,
+                min(ticks - 1 - tick, max_stride), tick_rate
+            )
+        arena.step(stride)
+        tick += stride
         next_state = arena.ball.get_state()
 
-        is_shot = detect_shot(next_state.pos, team)
-        current_ball_state = {"shot": is_shot}
-        current_ball_state.update({
-            key: val for key, val in zip(["pos_x", "pos_y", "pos_z"], next_state.pos)
-        })
-        current_ball_state.update({
-            key: val for key, val in zip(["vel_x", "vel_y", "vel_z"], next_state.vel)
-        })
-        current_ball_state.update({
-            key: val for key, val in zip(["ang_vel_x", "ang_vel_y", "ang_vel_z"], next_state.ang_vel)
-        })
-        ball_sim_data.append(current_ball_state)
+        dist = point_goal_distance(next_state.pos, not team)
+        is_shot = dist < threshold
+        recorder.record(next_state, dist)
+        if is_shot:
+            shot_tick = tick
 
         # Stop the simulation if hit is going away from net
         if goal_dir*next_state.vel[1] > 0:
@@ -68,4 +131,12 @@ def sim_detect_shot(ball_data, arena, time_s=1):
         # Stop the simulation if hit is detected as a shot
         if is_shot:
             break
-    return is_shot, pd.DataFrame(ball_sim_data)
+
+    if record == "full":
+        ball_sim_data = pd.DataFrame(recorder.trajectory.copy(), columns=TRAJECTORY_COLUMNS)
+        shot = np.zeros(len(ball_sim_data), dtype=bool)
+        if is_shot:
+            shot[-1] = True
+        ball_sim_data.insert(0, "shot", shot)
+        return is_shot, ball_sim_data
+    return is_shot, recorder.summary(shot_tick)
@@ -1,22 +1,62 @@
+import numpy as np
 import pandas as pd
 import RocketSim as rsim
 import rlgym.rocket_league.math as rlmath
 from rlgym.rocket_league.sim import RocketSimEngine
 from rlgym.rocket_league.common_values import GOAL_THRESHOLD
-from ..utils.math import distance_to_goal
+from ..utils.geometry import point_goal_distance
+from ..context import ReplayContext
+from ..utils.columns import POS, VEL, ANG_VEL
+from .recording import TrajectoryRecorder, ShotSummary
+from .prefilter import safe_stride
+
+# Packed state layout: pos, vel, ang_vel, row-major rotation matrix
+STATE_SIZE = 18
+ROT_MAT = slice(9, 18)
+
+# Layout of the outcome rows returned by BallSimulator.simulate_states
+RESULT_SIZE = 4
+SHOT_TICK, GOAL_TICK, TICKS, TERMINATED = range(RESULT_SIZE)
 
 # Hacky way to use the RocketSim engine installation from rlgym
 sim = RocketSimEngine()
 sim.close()
 
+
+def pack_states(context: ReplayContext, frames) -> np.ndarray:
+    """(N, 18) ball states for the given frames, ready to be sent to a SimulationPool."""
+    frames = np.asarray(frames, dtype=np.int64)
+    return np.hstack([
+        context.ball[frames][:, :ROT_MAT.start],
+        context.ball_rot_mats[frames].reshape(-1, 9)
+    ])
+
+
+def shot_verdicts(results: np.ndarray, ticks: int):
+    """is_shot and on_goal after the first ticks of the simulations described by results."""
+    shot_tick = results[:, SHOT_TICK]
+    goal_tick = results[:, GOAL_TICK]
+    return (
+        (shot_tick >= 0) & (shot_tick < ticks),
+        (goal_tick >= 0) & (goal_tick < ticks)
+    )
+
+
 class BallSimulator:
     def __init__(self):
         self.arena = rsim.Arena(rsim.GameMode.SOCCAR)
         self.team = None
         self.is_shot = False
         self.on_goal = False
+        self.shot_tick = -1
+        self.goal_tick = -1
+        self.ticks = 0
+        self.terminated = False
+        self.summary: ShotSummary | None = None
+        self.recorder = TrajectoryRecorder(round(self.arena.tick_rate))
         self.params = {
             "shot_threshold": 500, # uu
+            "max_stride": 30, # ticks per arena.step in adaptive mode
         }
     
     def update_ball(self, ball_data: pd.Series):
@@ -26,15 +66,29 @@ class BallSimulator:
                               "ang_vel_y", "ang_vel_z"]].to_numpy()
         ball_quat = ball_data[["quat_w", "quat_x", "quat_y", "quat_z"]].to_numpy()
         
-        ball_state = rsim.BallState()
-        ball_state.pos = rsim.Vec(*ball_pos)
-        ball_state.vel = rsim.Vec(*ball_vel)
-        ball_state.ang_vel = rsim.Vec(*ball_ang_vel)
         try:
-            ball_state.rot_mat = rsim.RotMat(
-                *rlmath.quat_to_rot_mtx(ball_quat).transpose().flatten())
+            rot_mat = rlmath.quat_to_rot_mtx(ball_quat)
         except ValueError:
-            pass
+            rot_mat = None
+        self.set_state(ball_pos, ball_vel, ball_ang_vel, rot_mat)
+
+    def update_ball_from_context(self, context: ReplayContext, frame: int):
+        """Sets the ball to a replay frame using the context's precomputed arrays."""
+        state = context.ball[frame]
+        self.set_state(
+            state[POS], state[VEL], state[ANG_VEL], context.ball_rot_mats[frame]
+        )
+
+    def set_state(self, pos, vel, ang_vel, rot_mat: np.ndarray | None = None):
+        ball_state = rsim.BallState()
+        ball_state.pos = rsim.Vec(*pos)
+        ball_state.vel = rsim.Vec(*vel)
+        ball_state.ang_vel = rsim.Vec(*ang_vel)
+        if rot_mat is not None:
+            try:
+                ball_state.rot_mat = rsim.RotMat(*rot_mat.transpose().flatten())
+            except ValueError:
+                pass
         
         self.arena.ball.set_state(ball_state)
     
@@ -42,10 +96,26 @@ class BallSimulator:
         self,
         time: float=1,
         break_if_goal: bool=True,
-        break_if_wrong_direction: bool=True
+        break_if_wrong_direction: bool=True,
+        record: str="full",
+        adaptive: bool=False
     ):
+        """
+        Simulates the ball and flags shots toward the goal the team attacks.
+
+        record selects what is kept besides the verdict: "none", "summary"
+        (self.summary) or "full" (self.summary and the sim_data trajectory).
+        adaptive steps several ticks at once while the ball can neither reach the
+        shot threshold nor touch the arena, so the verdicts and ticks match per-tick
+        stepping. It is ignored for full recordings, and summaries only see the
+        ticks that were stepped to.
+        """
         self.is_shot = False
         self.on_goal = False
+        self.shot_tick = -1
+        self.goal_tick = -1
+        self.ticks = 0
+        self.terminated = False
         tick_rate = round(self.arena.tick_rate)
         ticks = round(tick_rate*time)
         
@@ -55,29 +125,78 @@ class BallSimulator:
         else:
             goal_direction = None
             
-        self.sim_data = []
-        for _ in range(ticks):
-            self.arena.step(1)
+        adaptive = adaptive and goal_direction != None and record != "full"
+        self.recorder.reset(ticks, record)
+        ball_state = self.arena.ball.get_state() if adaptive else None
+        tick = -1
+        while tick < ticks - 1:
+            stride = 1
+            # Step tick by tick while moving away, the break must land on the right tick
+            if adaptive and goal_direction * ball_state.vel[1] <= 0:
+                stride = safe_stride(
+                    ball_state.pos, ball_state.vel, not self.team,
+                    self.params["shot_threshold"],
+                    min(ticks - 1 - tick, self.params["max_stride"]),
+                    tick_rate
+                )
+            self.arena.step(stride)
+            tick += stride
+            self.ticks = tick + 1
             ball_state = self.arena.ball.get_state()
-            self.sim_data.append(ball_state)
             
-            if goal_direction != None:
+            if goal_direction == None:
+                self.recorder.record(ball_state)
+            else:
                 # Detect Shots that aren't necessarily goals
-                dist = distance_to_goal(ball_state.pos, not self.team)
-                if  dist <= self.params["shot_threshold"]:
-                    self.is_shot = True
+                dist = point_goal_distance(ball_state.pos, not self.team)
+                self.recorder.record(ball_state, dist)
+                if dist < self.params["shot_threshold"]:
+                    self._mark_shot(tick)
                 
                 # Stop the simulation if hit is in the net
                 if -goal_direction*ball_state.pos[1] > GOAL_THRESHOLD:
-                    self.is_shot = True
-                    self.on_goal = True
+                    self._mark_shot(tick)
+                    if not self.on_goal:
+                        self.on_goal = True
+                        self.goal_tick = tick
+                        self.recorder.record_goal(ball_state)
                     if break_if_goal:
+                        self.terminated = True
                         break
                     
                 # Stop the simulation if hit is going away from net
                 if goal_direction * ball_state.vel[1] > 0:
                     if break_if_wrong_direction:
+                        self.terminated = True
                         break
-                
-            
-        
\ No newline at end of file
+        self.summary = self.recorder.summary(self.shot_tick, self.goal_tick)
+
+    @property
+    def sim_data(self) -> np.ndarray:
+        """(ticks, 9) pos, vel and ang_vel of the last full recording, see TRAJECTORY_COLUMNS."""
+        return self.recorder.trajectory
+
+    def _mark_shot(self, tick: int):
+        if not self.is_shot:
+            self.is_shot = True
+            self.shot_tick = tick
+
+    def simulate_states(
+        self, states: np.ndarray, teams, time: float = 1, adaptive: bool = True
+    ) -> np.ndarray:
+        """
+        Simulates packed (N, 18) ball states (see pack_states).
+
+        Returns one (shot_tick, goal_tick, ticks, terminated) row per state. Ticks
+        are -1 when the event didn't happen; terminated means the simulation stopped
+        before the horizon, so the outcome holds for any longer horizon as well.
+        """
+        results = np.zeros((len(states), RESULT_SIZE), dtype=np.int64)
+        for i, (state, team) in enumerate(zip(states, teams)):
+            self.team = bool(team)
+            self.set_state(
+                state[POS], state[VEL], state[ANG_VEL], state[ROT_MAT].reshape(3, 3)
+            )
+            self.simulate(time, record="none", adaptive=adaptive)
+            results[i] = self.shot_tick, self.goal_tick, self.ticks, self.terminated
+        return results
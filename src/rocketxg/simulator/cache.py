@@ -0,0 +1,204 @@
+import hashlib
+import sqlite3
+import struct
+import numpy as np
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+from .ball_simulator import (
+    BallSimulator,
+    STATE_SIZE,
+    RESULT_SIZE,
+    TICKS,
+    TERMINATED,
+    pack_states,
+    shot_verdicts
+)
+from ..context import ReplayContext
+
+TICK_RATE = 120  # RocketSim soccar arena
+# Quantization step of a packed state: pos (uu), vel (uu/s), ang_vel (rad/s), rotation matrix
+QUANTUM = np.array([1e-2] * 3 + [1e-2] * 3 + [1e-4] * 3 + [1e-5] * 9)
+# Exactly representable as float64, int64 max is not and its cast back is undefined
+_NON_FINITE = 2.0 ** 62
+_SQL_BATCH = 500  # keys per SELECT, below SQLite's bound parameter limit
+# Part of every key, bump it when BallSimulator verdicts change so stored results
+# computed by an older simulator are never reused
+_KEY_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sim_results (
+    key BLOB PRIMARY KEY,
+    shot_tick INTEGER NOT NULL,
+    goal_tick INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    terminated INTEGER NOT NULL
+)
+"""
+# Keep the stored result unless the new one covers a longer horizon
+_UPSERT = """
+INSERT INTO sim_results (key, shot_tick, goal_tick, ticks, terminated)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    shot_tick = excluded.shot_tick,
+    goal_tick = excluded.goal_tick,
+    ticks = excluded.ticks,
+    terminated = excluded.terminated
+WHERE NOT sim_results.terminated AND excluded.ticks > sim_results.ticks
+"""
+
+
+def _covers(result: np.ndarray, ticks: int) -> bool:
+    return bool(result[TERMINATED]) or result[TICKS] >= ticks
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class SimulationCache:
+    """Content-addressed cache of BallSimulator outcomes.
+
+    Results are keyed by the quantized packed ball state, the team and the shot
+    threshold. A result stores when the ball became a shot and went in rather than
+    the verdict itself, so a simulation over a longer horizon also answers queries
+    for shorter ones. Recently used results are kept in memory, and everything is
+    persisted to a SQLite file when a path is given.
+
+    Attributes:
+        capacity (int): Number of results kept in the in-memory LRU tier.
+        shot_threshold (float): BallSimulator shot_threshold the results were computed with.
+        stats (CacheStats): Running counts of cache hits and misses.
+    """
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        capacity: int = 100_000,
+        shot_threshold: float = 500
+    ):
+        self.capacity = capacity
+        self.shot_threshold = shot_threshold
+        self.stats = CacheStats()
+        self.memory: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(_SCHEMA)
+            self.connection.commit()
+        self._simulator: BallSimulator | None = None
+
+    def key(self, state: np.ndarray, team: bool) -> bytes:
+        scaled = np.round(np.asarray(state, dtype=np.float64) / QUANTUM)
+        scaled[~np.isfinite(scaled)] = _NON_FINITE
+        digest = hashlib.blake2b(scaled.astype(np.int64).tobytes(), digest_size=16)
+        digest.update(struct.pack("<B?d", _KEY_VERSION, bool(team), self.shot_threshold))
+        return digest.digest()
+
+    def lookup(self, keys: List[bytes], ticks: int) -> Dict[bytes, np.ndarray]:
+        """Cached results of the keys that cover at least the given number of ticks."""
+        found = {}
+        missing = []
+        for key in keys:
+            result = self.memory.get(key)
+            if result is not None and _covers(result, ticks):
+                self.memory.move_to_end(key)
+                found[key] = result
+            else:
+                missing.append(key)
+
+        if self.connection is not None and missing:
+            for start in range(0, len(missing), _SQL_BATCH):
+                batch = missing[start:start + _SQL_BATCH]
+                rows = self.connection.execute(
+                    "SELECT key, shot_tick, goal_tick, ticks, terminated FROM sim_results "
+                    f"WHERE key IN ({', '.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, *values in rows:
+                    result = np.array(values, dtype=np.int64)
+                    self._remember(key, result)
+                    if _covers(result, ticks):
+                        found[key] = result
+        return found
+
+    def store(self, keys: List[bytes], results: np.ndarray):
+        for key, result in zip(keys, results):
+            cached = self.memory.get(key)
+            if cached is None or not _covers(cached, result[TICKS]):
+                self._remember(key, result)
+        if self.connection is not None:
+            self.connection.executemany(
+                _UPSERT, [(key, *map(int, result)) for key, result in zip(keys, results)]
+            )
+            self.connection.commit()
+
+    def simulate(
+        self,
+        states: np.ndarray,
+        teams,
+        time: float = 1,
+        simulate: Callable[[np.ndarray, np.ndarray, float], np.ndarray] | None = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns is_shot and on_goal for packed (N, 18) ball states, only simulating
+        the states that aren't cached.
+
+        simulate runs the missing states and returns BallSimulator.simulate_states
+        rows; it defaults to a BallSimulator owned by the cache.
+        """
+        states = np.asarray(states, dtype=np.float64).reshape(-1, STATE_SIZE)
+        teams = np.asarray(teams, dtype=bool)
+        ticks = round(TICK_RATE * time)
+        keys = [self.key(state, team) for state, team in zip(states, teams)]
+        found = self.lookup(keys, ticks)
+
+        results = np.zeros((len(keys), RESULT_SIZE), dtype=np.int64)
+        missing = []
+        for i, key in enumerate(keys):
+            if key in found:
+                results[i] = found[key]
+            else:
+                missing.append(i)
+        self.stats.hits += len(keys) - len(missing)
+        self.stats.misses += len(missing)
+
+        if missing:
+            if simulate is None:
+                simulate = self._simulate
+            simulated = simulate(states[missing], teams[missing], time)
+            self.store([keys[i] for i in missing], simulated)
+            results[missing] = simulated
+        return shot_verdicts(results, ticks)
+
+    def simulate_frames(
+        self, context: ReplayContext, frames, teams, time: float = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """simulate() for the ball states at the given frames of a replay."""
+        return self.simulate(pack_states(context, frames), teams, time)
+
+    def _simulate(self, states: np.ndarray, teams: np.ndarray, time: float) -> np.ndarray:
+        if self._simulator is None:
+            self._simulator = BallSimulator()
+            self._simulator.params["shot_threshold"] = self.shot_threshold
+        return self._simulator.simulate_states(states, teams, time)
+
+    def _remember(self, key: bytes, result: np.ndarray):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,88 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+from .ball_simulator import (
+    BallSimulator,
+    STATE_SIZE,
+    RESULT_SIZE,
+    pack_states,
+    shot_verdicts
+)
+from .cache import SimulationCache, TICK_RATE
+from ..context import ReplayContext
+
+# Long-lived simulator owned by each worker process
+_simulator: BallSimulator | None = None
+
+
+def _init_worker():
+    global _simulator
+    _simulator = BallSimulator()
+
+
+def _simulate_shard(states: np.ndarray, teams: np.ndarray, time: float) -> np.ndarray:
+    return _simulator.simulate_states(states, teams, time)
+
+
+class SimulationPool:
+    """Simulates ball states across worker processes that each own a RocketSim arena.
+
+    The arenas live as long as the pool, so one pool can be reused for every replay
+    of a season. Use it as a context manager or call close() when done.
+
+    Attributes:
+        shard_size (int): Number of states sent to a worker at a time.
+        cache (SimulationCache): Optional cache consulted before sending states to the workers.
+    """
+    def __init__(
+        self,
+        workers: int | None = None,
+        shard_size: int = 64,
+        cache: SimulationCache | None = None
+    ):
+        self.shard_size = shard_size
+        self.cache = cache
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker
+        )
+
+    def simulate(
+        self, states: np.ndarray, teams, time: float = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Runs BallSimulator.simulate for every packed state.
+
+        Returns the is_shot and on_goal flags in the order of the input states.
+        """
+        states = np.asarray(states, dtype=np.float64).reshape(-1, STATE_SIZE)
+        teams = np.asarray(teams, dtype=bool)
+        if self.cache is not None:
+            return self.cache.simulate(states, teams, time, self._simulate_states)
+        return shot_verdicts(
+            self._simulate_states(states, teams, time), round(TICK_RATE * time)
+        )
+
+    def _simulate_states(self, states: np.ndarray, teams: np.ndarray, time: float) -> np.ndarray:
+        starts = range(0, len(states), self.shard_size)
+        shards = self.executor.map(
+            _simulate_shard,
+            [states[i:i + self.shard_size] for i in starts],
+            [teams[i:i + self.shard_size] for i in starts],
+            [time] * len(starts)
+        )
+        return np.concatenate([np.zeros((0, RESULT_SIZE), dtype=np.int64), *shards])
+
+    def simulate_frames(
+        self, context: ReplayContext, frames, teams, time: float = 1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """simulate() for the ball states at the given frames of a replay."""
+        return self.simulate(pack_states(context, frames), teams, time)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,115 @@
+import math
+import warnings
+import numpy as np
+from dataclasses import dataclass
+from rlgym.rocket_league.common_values import BALL_MAX_SPEED
+from ..utils.columns import POS, VEL
+from ..utils.geometry import (
+    goal_distance,
+    point_goal_distance,
+    surface_clearance,
+    point_surface_clearance
+)
+
+GRAVITY_Z = 650  # uu/s^2
+
+
+def _reach(speed: np.ndarray, time: float) -> np.ndarray:
+    """Upper bound of the distance travelled in time, with gravity as the only acceleration."""
+    return np.minimum(speed + GRAVITY_Z * time, BALL_MAX_SPEED) * time
+
+
+def safe_stride(
+    pos,
+    vel,
+    goal_team: bool,
+    shot_threshold: float,
+    max_ticks: int,
+    tick_rate: float = 120
+) -> int:
+    """
+    Number of ticks (at least 1, at most max_ticks) the ball can be stepped at once
+    without any per-tick check changing: it can't get within shot_threshold of the
+    goal box of goal_team nor touch the arena, so its y velocity can't flip either.
+    """
+    if max_ticks <= 1:
+        return 1
+    speed = math.sqrt(vel[0] * vel[0] + vel[1] * vel[1] + vel[2] * vel[2])
+    top_speed = min(speed + GRAVITY_Z * max_ticks / tick_rate, BALL_MAX_SPEED)
+    budget = min(
+        point_goal_distance(pos, goal_team) - shot_threshold,
+        point_surface_clearance(pos)
+    )
+    if budget <= 0:
+        return 1
+    if top_speed <= 0:
+        return max_ticks
+    return max(1, min(max_ticks, int(budget * tick_rate / top_speed)))
+
+
+@dataclass
+class PrefilterStats:
+    candidates: int = 0
+    skipped: int = 0
+    false_negatives: int = 0
+
+    @property
+    def simulated(self) -> int:
+        return self.candidates - self.skipped
+
+
+class ShotPrefilter:
+    """Classifies hits that certainly can't become shots without running RocketSim.
+
+    A hit is skipped when the ball can't come within shot_threshold of the attacked goal
+    within the simulated time, or when it is moving away from that goal and can't touch
+    anything during the first tick (the simulation would stop right there). Both bounds are
+    conservative, so every shot found by the simulators also passes the filter.
+
+    Attributes:
+        shot_threshold (float): Distance to the goal box that counts as a shot.
+        tick_rate (float): Simulation ticks per second.
+        validate (bool): If True, callers simulate the skipped hits too and report any shot
+            the filter would have dropped through check().
+        stats (PrefilterStats): Running counts of candidates, skipped sims and false negatives.
+    """
+    def __init__(self, shot_threshold: float = 500, tick_rate: float = 120, validate: bool = False):
+        self.shot_threshold = shot_threshold
+        self.tick_rate = tick_rate
+        self.validate = validate
+        self.stats = PrefilterStats()
+
+    def needs_simulation(self, states: np.ndarray, teams, time: float) -> np.ndarray:
+        """
+        Returns a mask of the hits that have to be simulated.
+
+        states are ball rows laid out as STATE_COLUMNS, teams the hitter's is_orange.
+        """
+        states = np.asarray(states, dtype=np.float64)
+        teams = np.asarray(teams, dtype=bool)
+        pos = states[:, POS]
+        vel = states[:, VEL]
+        speed = np.linalg.norm(vel, axis=-1)
+        margin = goal_distance(pos, ~teams) - self.shot_threshold
+
+        out_of_reach = margin > _reach(speed, time)
+
+        tick_reach = _reach(speed, 1 / self.tick_rate)
+        goal_direction = np.where(teams, 1, -1)
+        going_away = (
+            (goal_direction * vel[:, 1] > 0)
+            & (margin > tick_reach)
+            & (surface_clearance(pos) > tick_reach)
+        )
+
+        needed = ~(out_of_reach | going_away)
+        self.stats.candidates += len(needed)
+        self.stats.skipped += int((~needed).sum())
+        return needed
+
+    def check(self, needed: np.ndarray, is_shot: np.ndarray):
+        """Validation: records and warns about shots among the hits the filter skipped."""
+        dropped = int((~np.asarray(needed) & np.asarray(is_shot, dtype=bool)).sum())
+        if dropped:
+            self.stats.false_negatives += dropped
+            warnings.warn(f"Shot prefilter skipped {dropped} hits that are shots")
@@ -0,0 +1,80 @@
+import numpy as np
+from dataclasses import dataclass
+from ..utils.columns import STATE_COLUMNS, POS, VEL, ANG_VEL
+
+# none: only the verdict, summary: ShotSummary, full: ShotSummary and the trajectory
+RECORD_MODES = ("none", "summary", "full")
+TRAJECTORY_COLUMNS = STATE_COLUMNS[:9]
+
+
+@dataclass
+class ShotSummary:
+    """Compact outcome of a shot simulation.
+
+    Attributes:
+        shot_time (float): Seconds until the ball counted as a shot, None if it never did.
+        goal_time (float): Seconds until the ball was in the net, None if it never was.
+        min_distance (float): Closest distance to the attacked goal box (uu).
+        entry_point (np.ndarray): Ball position on the first tick in the net.
+        trajectory (np.ndarray): (ticks, 9) float32 pos, vel and ang_vel, only kept in full mode.
+    """
+    shot_time: float | None
+    goal_time: float | None
+    min_distance: float
+    entry_point: np.ndarray | None = None
+    trajectory: np.ndarray | None = None
+
+
+class TrajectoryRecorder:
+    """Records simulated ball states into a preallocated (ticks, 9) float32 buffer.
+
+    The buffer is reused by every simulation and only grows when a longer horizon
+    is requested, so recording doesn't allocate per tick. In summary mode only the
+    minimum distance to the goal and the entry point are tracked.
+    """
+    def __init__(self, tick_rate: float = 120, capacity: int = 0):
+        self.tick_rate = tick_rate
+        self.buffer = np.empty((capacity, len(TRAJECTORY_COLUMNS)), dtype=np.float32)
+        self.reset(0)
+
+    def reset(self, ticks: int, mode: str = "summary"):
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Unknown record mode {mode!r}, expected one of {RECORD_MODES}")
+        self.mode = mode
+        if mode == "full" and len(self.buffer) < ticks:
+            self.buffer = np.empty((ticks, len(TRAJECTORY_COLUMNS)), dtype=np.float32)
+        self.ticks = 0
+        self.min_distance = np.inf
+        self.entry_point = None
+
+    def record(self, ball_state, distance: float | None = None):
+        if self.mode == "none":
+            return
+        if distance is not None and distance < self.min_distance:
+            self.min_distance = distance
+        if self.mode == "full":
+            row = self.buffer[self.ticks]
+            row[POS] = ball_state.pos.as_numpy()
+            row[VEL] = ball_state.vel.as_numpy()
+            row[ANG_VEL] = ball_state.ang_vel.as_numpy()
+        self.ticks += 1
+
+    def record_goal(self, ball_state):
+        if self.mode != "none" and self.entry_point is None:
+            self.entry_point = ball_state.pos.as_numpy().astype(np.float32)
+
+    @property
+    def trajectory(self) -> np.ndarray:
+        """View of the recorded ticks, overwritten by the next simulation."""
+        return self.buffer[:self.ticks]
+
+    def summary(self, shot_tick: int = -1, goal_tick: int = -1) -> ShotSummary | None:
+        if self.mode == "none":
+            return None
+        return ShotSummary(
+            shot_time=(shot_tick + 1) / self.tick_rate if shot_tick >= 0 else None,
+            goal_time=(goal_tick + 1) / self.tick_rate if goal_tick >= 0 else None,
+            min_distance=float(self.min_distance),
+            entry_point=self.entry_point,
+            trajectory=self.trajectory.copy() if self.mode == "full" else None
+        )
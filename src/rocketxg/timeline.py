@@ -0,0 +1,145 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Iterable, Tuple
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+
+HIT = "hit"
+GOAL = "goal"
+DEMO = "demo"
+KICKOFF = "kickoff"
+NO_TEAM = -1
+
+
+def _team_code(team) -> int:
+    return NO_TEAM if team is None else int(team)
+
+
+@dataclass
+class _Events:
+    """Events of one type sorted by frame, with their index in the source list."""
+    frames: np.ndarray
+    index: np.ndarray
+    source_frames: np.ndarray
+    source_teams: np.ndarray
+    by_team: Dict[int, Tuple[np.ndarray, np.ndarray]]  # team code to (frames, index)
+
+    @classmethod
+    def build(cls, frames: Iterable[int], teams: Iterable) -> "_Events":
+        source_frames = np.fromiter(frames, dtype=np.int64)
+        team_codes = np.fromiter((_team_code(team) for team in teams), dtype=np.int8)
+        order = np.argsort(source_frames, kind="stable")
+        sorted_frames = source_frames[order]
+        sorted_teams = team_codes[order]
+        by_team = {
+            int(team): (sorted_frames[sorted_teams == team], order[sorted_teams == team])
+            for team in np.unique(sorted_teams)
+        }
+        return cls(sorted_frames, order, source_frames, team_codes, by_team)
+
+    def select(self, team=None) -> Tuple[np.ndarray, np.ndarray]:
+        if team is None:
+            return self.frames, self.index
+        return self.by_team.get(_team_code(team), (self.frames[:0], self.index[:0]))
+
+
+_NO_EVENTS = _Events.build((), ())
+
+
+class EventTimeline:
+    """Frame-indexed events of a replay for "what happened near frame X" lookups.
+
+    Every event type (HIT, GOAL, DEMO, KICKOFF or anything added with add) keeps its
+    frames in a sorted array, overall and per team, so queries are binary searches.
+    Queries return indices into the list the events came from (e.g.
+    replay.analyzer["hits"]), or None when there is no such event. Teams are
+    is_orange values or Team, events without a team only match team=None.
+    """
+    def __init__(self):
+        self.events: Dict[str, _Events] = {}
+
+    @classmethod
+    def from_replay(cls, replay: ParsedReplay, teams: Dict[str, bool | None]) -> "EventTimeline":
+        """
+        Timeline of the analyzer hits, goals, demos and kickoffs of a replay.
+
+        teams maps player ids to is_orange, as in ReplayContext.teams. Hits and demos
+        count for the team of the hitter and the attacker, kickoffs have no team.
+        """
+        timeline = cls()
+        hits = replay.analyzer["hits"]
+        timeline.add(
+            HIT,
+            [hit["frame_number"] for hit in hits],
+            [teams.get(hit["player_unique_id"]) for hit in hits]
+        )
+        goals = replay.metadata["game"]["goals"]
+        timeline.add(GOAL, [goal["frame"] for goal in goals], [goal["is_orange"] for goal in goals])
+        demos = replay.metadata.get("demos", [])
+        timeline.add(
+            DEMO,
+            [demo["frame_number"] for demo in demos],
+            [teams.get(demo["attacker_unique_id"]) for demo in demos]
+        )
+        periods = replay.analyzer.get("gameplay_periods", [])
+        timeline.add(KICKOFF, [period["start_frame"] for period in periods], [None] * len(periods))
+        return timeline
+
+    def add(self, kind: str, frames: Iterable[int], teams: Iterable):
+        """Adds (or replaces) an event type, teams holding the team of every event or None."""
+        self.events[kind] = _Events.build(frames, teams)
+
+    def __contains__(self, kind: str) -> bool:
+        return kind in self.events
+
+    def __len__(self) -> int:
+        return sum(len(events.frames) for events in self.events.values())
+
+    def count(self, kind: str) -> int:
+        return len(self._get(kind).frames)
+
+    def frame(self, kind: str, index: int) -> int:
+        """Frame of the event with the given source index."""
+        return int(self.events[kind].source_frames[index])
+
+    def last_before(self, kind: str, frame: int, team=None, inclusive: bool = False) -> int | None:
+        """Index of the last event before frame (or at it if inclusive)."""
+        frames, index = self._get(kind).select(team)
+        i = np.searchsorted(frames, frame, side="right" if inclusive else "left") - 1
+        return int(index[i]) if i >= 0 else None
+
+    def first_after(self, kind: str, frame: int, team=None, inclusive: bool = False) -> int | None:
+        """Index of the first event after frame (or at it if inclusive)."""
+        frames, index = self._get(kind).select(team)
+        i = np.searchsorted(frames, frame, side="left" if inclusive else "right")
+        return int(index[i]) if i < len(frames) else None
+
+    def window(self, kind: str, start: int, end: int, team=None) -> np.ndarray:
+        """Indices of the events with start <= frame < end, in frame order."""
+        frames, index = self._get(kind).select(team)
+        return index[np.searchsorted(frames, start):np.searchsorted(frames, end)]
+
+    def last_touch(self, team, frame: int) -> int | None:
+        """Index of the last hit by team before frame."""
+        return self.last_before(HIT, frame, team)
+
+    def next_opponent_touch(self, team, frame: int) -> int | None:
+        """Index of the first hit by the other team after frame."""
+        return self.first_after(HIT, frame, not team)
+
+    def goal_hits(self) -> np.ndarray:
+        """
+        Index of the hit credited with every goal (in metadata order): the last hit
+        by the scoring team before the goal frame, -1 if that team never touched it.
+        """
+        goals = self._get(GOAL)
+        goal_hits = np.full(len(goals.source_frames), -1, dtype=np.int64)
+        for team in (0, 1):
+            scored = np.flatnonzero(goals.source_teams == team)
+            frames, index = self._get(HIT).select(team)
+            before = np.searchsorted(frames, goals.source_frames[scored]) - 1
+            found = before >= 0
+            goal_hits[scored[found]] = index[before[found]]
+        return goal_hits
+
+    def _get(self, kind: str) -> _Events:
+        return self.events.get(kind, _NO_EVENTS)
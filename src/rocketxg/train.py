@@ -0,0 +1,226 @@
+import json
+import time
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import xgboost as xgb
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from .dataset import KEY, PARTITIONS, open_dataset, partition_filter
+
+LABEL = "is_goal"
+NON_FEATURES = (KEY, LABEL, *PARTITIONS)
+MODEL_FILE = "model.ubj"
+SCHEMA_FILE = "schema.json"
+
+DEFAULT_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "learning_rate": 0.05,
+    "max_depth": 6
+}
+
+
+def feature_columns(root: str | Path) -> List[str]:
+    """Numeric columns of a ShotDataset that are model features, in schema order."""
+    schema = open_dataset(root).schema
+    return [
+        field.name for field in schema
+        if field.name not in NON_FEATURES
+        and (pa.types.is_floating(field.type) or pa.types.is_integer(field.type))
+    ]
+
+
+def replay_hashes(
+    root: str | Path,
+    season: str | Iterable[str] | None = None,
+    event: str | Iterable[str] | None = None
+) -> List[str]:
+    """Sorted replay hashes of a ShotDataset, reading only the key column batch by batch."""
+    hashes = set()
+    for batch in open_dataset(root).to_batches(
+        columns=[KEY], filter=partition_filter(season, event)
+    ):
+        hashes.update(pc.unique(batch.column(0)).to_pylist())
+    return sorted(hashes)
+
+
+def split_replays(
+    hashes: List[str], validation_fraction: float = 0.2, seed: int = 0
+) -> Tuple[List[str], List[str]]:
+    """Splits replay hashes into train and validation replays, so no replay is in both."""
+    hashes = np.array(sorted(hashes), dtype=object)
+    rng = np.random.default_rng(seed)
+    shuffled = hashes[rng.permutation(len(hashes))]
+    num_validation = int(round(len(hashes) * validation_fraction))
+    if len(hashes) > 1:
+        num_validation = min(max(num_validation, 1), len(hashes) - 1)
+    return sorted(shuffled[num_validation:]), sorted(shuffled[:num_validation])
+
+
+class ShotBatches(xgb.DataIter):
+    """Streams the record batches of a ShotDataset into XGBoost.
+
+    Only the feature and label columns of the matching partitions are read, one
+    batch at a time, so the dataset never has to fit in memory. Rows are kept
+    when their replay is in replay_hashes.
+
+    Attributes:
+        features (list): Feature columns, in the order given to XGBoost.
+        batch_size (int): Maximum rows per batch handed to XGBoost.
+    """
+    def __init__(
+        self,
+        root: str | Path,
+        features: List[str],
+        replay_hashes: Iterable[str],
+        season: str | Iterable[str] | None = None,
+        event: str | Iterable[str] | None = None,
+        batch_size: int = 1 << 20,
+        cache_prefix: str | None = None
+    ):
+        self.dataset = open_dataset(root)
+        self.features = list(features)
+        self.replays = pa.array(list(replay_hashes), pa.string())
+        self.filter = partition_filter(season, event)
+        self.batch_size = batch_size
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def reset(self):
+        self._batches = None
+
+    def next(self, input_data) -> bool:
+        if self._batches is None:
+            self._batches = self.dataset.to_batches(
+                columns=[KEY, LABEL, *self.features],
+                filter=self.filter,
+                batch_size=self.batch_size
+            )
+        for batch in self._batches:
+            batch = batch.filter(pc.is_in(batch.column(KEY), value_set=self.replays))
+            if batch.num_rows == 0:
+                continue
+            data = np.column_stack([
+                batch.column(feature).to_numpy(zero_copy_only=False) for feature in self.features
+            ]).astype(np.float32)
+            label = batch.column(LABEL).to_numpy(zero_copy_only=False).astype(np.float32)
+            input_data(data=data, label=label, feature_names=self.features)
+            return True
+        return False
+
+
+def train(
+    root: str | Path,
+    params: dict | None = None,
+    num_boost_round: int = 5000,
+    early_stopping_rounds: int = 50,
+    validation_fraction: float = 0.2,
+    seed: int = 0,
+    season: str | Iterable[str] | None = None,
+    event: str | Iterable[str] | None = None,
+    max_bin: int = 256,
+    batch_size: int = 1 << 20,
+    cache_dir: str | Path | None = None,
+    verbose_eval: int | bool = 100
+) -> Tuple[xgb.Booster, List[str]]:
+    """
+    Trains an xG model on a ShotDataset without loading it into memory.
+
+    Replays are split into train and validation sets and batches are streamed into
+    QuantileDMatrix objects, so only the quantized feature matrix is kept. With a
+    cache_dir the quantized pages are stored there instead (external memory), for
+    datasets whose quantized matrix doesn't fit in RAM either. Training stops when
+    the validation loss hasn't improved for early_stopping_rounds rounds, so at
+    least two replays are needed (one of them held out), otherwise ValueError is
+    raised.
+
+    Returns the booster and its feature columns.
+    """
+    params = {**DEFAULT_PARAMS, "seed": seed, **(params or {})}
+    features = feature_columns(root)
+    hashes = replay_hashes(root, season, event)
+    if len(hashes) < 2:
+        raise ValueError(
+            f"Found {len(hashes)} replays in {root}, training needs at least 2 so "
+            "validation replays can be held out for early stopping"
+        )
+    train_replays, validation_replays = split_replays(hashes, validation_fraction, seed)
+
+    if cache_dir is not None:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+    def batches(replays, name):
+        cache_prefix = str(Path(cache_dir) / name) if cache_dir is not None else None
+        return ShotBatches(root, features, replays, season, event, batch_size, cache_prefix)
+
+    if cache_dir is not None:
+        dtrain = xgb.ExtMemQuantileDMatrix(batches(train_replays, "train"), max_bin=max_bin)
+        dvalidation = xgb.ExtMemQuantileDMatrix(
+            batches(validation_replays, "validation"), max_bin=max_bin, ref=dtrain
+        )
+    else:
+        dtrain = xgb.QuantileDMatrix(batches(train_replays, "train"), max_bin=max_bin)
+        dvalidation = xgb.QuantileDMatrix(
+            batches(validation_replays, "validation"), max_bin=max_bin, ref=dtrain
+        )
+
+    booster = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=num_boost_round,
+        evals=[(dtrain, "train"), (dvalidation, "validation")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=verbose_eval
+    )
+    return booster, features
+
+
+def save_model(
+    booster: xgb.Booster, features: List[str], path: str | Path, version: str | None = None
+) -> Path:
+    """
+    Writes the booster and the feature schema it expects to path/version, the
+    version defaulting to the current time. Returns the model directory.
+    """
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    directory = Path(path) / version
+    directory.mkdir(parents=True, exist_ok=True)
+    booster.save_model(directory / MODEL_FILE)
+    schema = {
+        "version": version,
+        "features": features,
+        "label": LABEL,
+        "best_iteration": getattr(booster, "best_iteration", None),
+        "best_score": getattr(booster, "best_score", None)
+    }
+    with open(directory / SCHEMA_FILE, "w") as file:
+        json.dump(schema, file, indent=2)
+    return directory
+
+
+def model_dir(path: str | Path, version: str | None = None) -> Path:
+    """
+    Directory of a saved model: path itself if it holds a model, otherwise its
+    version subdirectory, the most recently saved one when no version is given.
+    """
+    path = Path(path)
+    if version is not None:
+        path = path / version
+    if (path / SCHEMA_FILE).exists():
+        return path
+    schemas = list(path.glob(f"*/{SCHEMA_FILE}"))
+    if not schemas:
+        raise FileNotFoundError(f"No saved model in {path}")
+    return max(schemas, key=lambda schema: schema.stat().st_mtime_ns).parent
+
+
+def load_model(path: str | Path, version: str | None = None) -> Tuple[xgb.Booster, Dict]:
+    """Booster and schema of a model saved by save_model (see model_dir for path)."""
+    path = model_dir(path, version)
+    booster = xgb.Booster()
+    booster.load_model(path / MODEL_FILE)
+    with open(path / SCHEMA_FILE) as file:
+        schema = json.load(file)
+    return booster, schema
@@ -0,0 +1,14 @@
+STATE_COLUMNS = [
+    "pos_x", "pos_y", "pos_z",
+    "vel_x", "vel_y", "vel_z",
+    "ang_vel_x", "ang_vel_y", "ang_vel_z",
+    "quat_w", "quat_x", "quat_y", "quat_z"
+]
+PLAYER_COLUMNS = STATE_COLUMNS + ["boost_amount"]
+
+# Column slices into state arrays laid out as STATE_COLUMNS / PLAYER_COLUMNS
+POS = slice(0, 3)
+VEL = slice(3, 6)
+ANG_VEL = slice(6, 9)
+QUAT = slice(9, 13)
+BOOST = 13
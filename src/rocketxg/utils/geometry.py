@@ -0,0 +1,164 @@
+import math
+import numpy as np
+
+from rlgym.rocket_league.common_values import (
+    BALL_RADIUS,
+    BACK_WALL_Y,
+    SIDE_WALL_X,
+    CEILING_Z,
+    BLUE_GOAL_CENTER,
+    ORANGE_GOAL_CENTER,
+    GOAL_THRESHOLD,
+    GOAL_HEIGHT,
+    GOAL_CENTER_TO_POST
+)
+
+# Goal boxes used by distance_to_goal, indexed by team (0: blue goal, 1: orange goal).
+# Each box starts at the goal line and extends GOAL_THRESHOLD*2 behind it.
+GOAL_HALFSIZE = np.array([GOAL_CENTER_TO_POST, GOAL_THRESHOLD, GOAL_HEIGHT / 2])
+GOAL_BOX_CENTERS = np.array([
+    np.add(BLUE_GOAL_CENTER, [0, -GOAL_THRESHOLD, 0]),
+    np.add(ORANGE_GOAL_CENTER, [0, GOAL_THRESHOLD, 0])
+])
+# y of the goal line and the direction pointing into the net, indexed by team
+GOAL_LINE_Y = np.array([BLUE_GOAL_CENTER[1], ORANGE_GOAL_CENTER[1]], dtype=np.float64)
+GOAL_SIDE = np.array([-1, 1])
+GOAL_WIDTH = 2 * GOAL_CENTER_TO_POST
+
+SURFACE_MARGIN = 300  # uu, covers the curved transitions between floor and walls
+CORNER_PLANE = 8064  # |x| + |y| of the corner walls
+
+# Plain floats for the per-tick scalar path
+_BOX_CENTERS = [tuple(center) for center in GOAL_BOX_CENTERS.tolist()]
+_HALFSIZE = tuple(GOAL_HALFSIZE.tolist())
+
+
+def _team_index(team) -> np.ndarray:
+    return np.asarray(team, dtype=bool).astype(np.int64)
+
+
+def rectangle_sdf(pos, halfsize) -> np.ndarray:
+    """Distance from (..., 3) positions to an axis-aligned box centered at the origin."""
+    edge_distance = np.abs(pos) - halfsize
+    return np.linalg.norm(np.maximum(edge_distance, 0), axis=-1)
+
+
+def goal_distance(pos, team) -> np.ndarray:
+    """
+    Distance from (..., 3) positions to the goal box of team (True for the orange goal).
+
+    team is a bool or an array that broadcasts against the positions' leading dimensions.
+    """
+    centers = GOAL_BOX_CENTERS[_team_index(team)]
+    return rectangle_sdf(np.asarray(pos, dtype=np.float64) - centers, GOAL_HALFSIZE)
+
+
+def goal_distances(pos) -> np.ndarray:
+    """(..., 2) distances from (..., 3) positions to the blue and the orange goal box."""
+    pos = np.asarray(pos, dtype=np.float64)
+    return rectangle_sdf(pos[..., None, :] - GOAL_BOX_CENTERS, GOAL_HALFSIZE)
+
+
+def point_goal_distance(pos, team) -> float:
+    """goal_distance of a single position, in plain Python for per-tick checks."""
+    center_x, center_y, center_z = _BOX_CENTERS[bool(team)]
+    half_x, half_y, half_z = _HALFSIZE
+    dx = max(abs(pos[0] - center_x) - half_x, 0.0)
+    dy = max(abs(pos[1] - center_y) - half_y, 0.0)
+    dz = max(abs(pos[2] - center_z) - half_z, 0.0)
+    return math.sqrt(dx * dx + dy * dy + dz * dz)
+
+
+def surface_clearance(pos) -> np.ndarray:
+    """Lower bound of the distance (..., 3) balls can travel before touching the arena."""
+    pos = np.asarray(pos, dtype=np.float64)
+    x, y, z = np.moveaxis(np.abs(pos), -1, 0)
+    return np.minimum.reduce([
+        pos[..., 2] - BALL_RADIUS,
+        CEILING_Z - z - BALL_RADIUS,
+        SIDE_WALL_X - x - BALL_RADIUS,
+        BACK_WALL_Y - y - BALL_RADIUS,
+        (CORNER_PLANE - x - y) / math.sqrt(2) - BALL_RADIUS
+    ]) - SURFACE_MARGIN
+
+
+def point_surface_clearance(pos) -> float:
+    """surface_clearance of a single position, in plain Python for per-tick checks."""
+    x, y, z = abs(pos[0]), abs(pos[1]), pos[2]
+    return min(
+        z - BALL_RADIUS,
+        CEILING_Z - abs(z) - BALL_RADIUS,
+        SIDE_WALL_X - x - BALL_RADIUS,
+        BACK_WALL_Y - y - BALL_RADIUS,
+        (CORNER_PLANE - x - y) / math.sqrt(2) - BALL_RADIUS
+    ) - SURFACE_MARGIN
+
+
+def goal_plane_projection(pos, vel, team) -> np.ndarray:
+    """
+    Where (..., 3) balls moving in a straight line cross the goal line plane of team.
+
+    Rows moving away from that plane give NaN.
+    """
+    pos = np.asarray(pos, dtype=np.float64)
+    vel = np.asarray(vel, dtype=np.float64)
+    line_y = GOAL_LINE_Y[_team_index(team)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        time = (line_y - pos[..., 1]) / vel[..., 1]
+    points = pos + vel * time[..., None]
+    points[~(time >= 0)] = np.nan
+    return points
+
+
+def trajectory_goal_crossing(trajectory, team) -> np.ndarray:
+    """
+    First point where (..., T, 3) trajectories cross the goal line plane of team,
+    interpolated between ticks. Trajectories that never cross give NaN.
+    """
+    trajectory = np.asarray(trajectory, dtype=np.float64)
+    team = _team_index(team)
+    line_y = GOAL_LINE_Y[team][..., None]
+    past = GOAL_SIDE[team][..., None] * (trajectory[..., 1] - line_y) >= 0
+    crossed = past.any(axis=-1)
+
+    after = np.argmax(past, axis=-1)[..., None, None]
+    before = np.maximum(after - 1, 0)
+    p1 = np.take_along_axis(trajectory, after, axis=-2)[..., 0, :]
+    p0 = np.take_along_axis(trajectory, before, axis=-2)[..., 0, :]
+    dy = p1[..., 1] - p0[..., 1]
+    fraction = np.divide(
+        line_y[..., 0] - p0[..., 1], dy, out=np.ones_like(dy), where=dy != 0
+    )
+    points = p0 + (p1 - p0) * fraction[..., None]
+    points[~crossed] = np.nan
+    return points
+
+
+def on_target(points) -> np.ndarray:
+    """Whether (..., 3) goal line crossings are between the posts and under the crossbar."""
+    points = np.asarray(points, dtype=np.float64)
+    return (
+        (np.abs(points[..., 0]) <= GOAL_CENTER_TO_POST)
+        & (points[..., 2] >= 0)
+        & (points[..., 2] <= GOAL_HEIGHT)
+    )
+
+
+def shot_angle(pos, team) -> np.ndarray:
+    """Angle (rad) between the posts of the goal of team seen from (..., 3) positions, in the x-y plane."""
+    pos = np.asarray(pos, dtype=np.float64)
+    dy = GOAL_LINE_Y[_team_index(team)] - pos[..., 1]
+    left = GOAL_CENTER_TO_POST - pos[..., 0]
+    right = -GOAL_CENTER_TO_POST - pos[..., 0]
+    return np.arctan2(GOAL_WIDTH * np.abs(dy), left * right + dy * dy)
+
+
+def visible_goal_width(pos, team) -> np.ndarray:
+    """Width of the goal mouth of team perpendicular to the line of sight from (..., 3) positions."""
+    pos = np.asarray(pos, dtype=np.float64)
+    dy = GOAL_LINE_Y[_team_index(team)] - pos[..., 1]
+    distance = np.hypot(pos[..., 0], dy)
+    return np.divide(
+        GOAL_WIDTH * np.abs(dy), distance,
+        out=np.zeros_like(distance), where=distance > 0
+    )
@@ -11,26 +11,37 @@ from rlgym.rocket_league.common_values import (
     GOAL_CENTER_TO_POST,
     CEILING_Z
 )
+from .geometry import rectangle_sdf, point_goal_distance
 
-def rectangle_sdf(pos, halfsize) -> float:
-    halfsize = np.array(halfsize)
-    edge_distance = np.abs(pos) - halfsize
-    return np.sum(rlmath.magnitude(np.maximum(edge_distance, 0)))
+def distance_to_goal(pos, team) -> float:
+    """Distance from a position to the goal box of team, see utils.geometry for batches."""
+    return point_goal_distance(pos, team)
 
+def quat_to_rot_mtx_batch(quats: np.ndarray) -> np.ndarray:
+    """
+    Vectorized rlmath.quat_to_rot_mtx for an (N, 4) array of (w, x, y, z) quaternions.
 
-def distance_to_goal(pos, team) -> float:
-    if team:
-        goal_pos = ORANGE_GOAL_CENTER
-        y_offset = GOAL_THRESHOLD
-    else:
-        goal_pos = BLUE_GOAL_CENTER
-        y_offset = -GOAL_THRESHOLD
+    Rows with a zero norm give a zero matrix like rlmath, rows with non-finite values give NaN.
+    """
+    quats = np.asarray(quats, dtype=np.float64)
+    w, x, y, z = -quats.T
+    norm = np.einsum("ij,ij->i", quats, quats)
+    valid = norm != 0
+    s = np.divide(1.0, norm, out=np.zeros_like(norm), where=valid)
+
+    theta = np.empty((len(quats), 3, 3))
+    # front direction
+    theta[:, 0, 0] = 1.0 - 2.0 * s * (y * y + z * z)
+    theta[:, 1, 0] = 2.0 * s * (x * y + z * w)
+    theta[:, 2, 0] = 2.0 * s * (x * z - y * w)
+    # left direction
+    theta[:, 0, 1] = 2.0 * s * (x * y - z * w)
+    theta[:, 1, 1] = 1.0 - 2.0 * s * (x * x + z * z)
+    theta[:, 2, 1] = 2.0 * s * (y * z + x * w)
+    # up direction
+    theta[:, 0, 2] = 2.0 * s * (x * z + y * w)
+    theta[:, 1, 2] = 2.0 * s * (y * z - x * w)
+    theta[:, 2, 2] = 1.0 - 2.0 * s * (x * x + y * y)
 
-    offset = np.array(goal_pos)
-    offset[1] += y_offset
-    halfsize = [
-        GOAL_CENTER_TO_POST,
-        GOAL_THRESHOLD,
-        GOAL_HEIGHT / 2
-    ]
-    return rectangle_sdf(pos - offset, halfsize)
\ No newline at end of file
+    theta[~valid] = 0
+    return theta
@@ -0,0 +1,27 @@
+import pytest
+from pathlib import Path
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+from replays import make_replay, write_parsed
+
+
+@pytest.fixture
+def replay() -> ParsedReplay:
+    return make_replay()
+
+
+@pytest.fixture
+def parsed_replay(tmp_path) -> Path:
+    return write_parsed(make_replay(), tmp_path / "parsed" / "game")
+
+
+@pytest.fixture
+def raw_dir(tmp_path) -> Path:
+    """Two games of an RLCS match, laid out like the ingested replay directories."""
+    match_dir = (
+        tmp_path / "raw" / "RLCS 2024" / "Major 1" / "Europe" / "Regional 1"
+        / "Swiss" / "Round 1" / "Blue Team vs Orange Team"
+    )
+    match_dir.mkdir(parents=True)
+    for game in (1, 2):
+        (match_dir / f"game{game}.replay").write_bytes(f"replay {game}".encode())
+    return tmp_path / "raw"
@@ -0,0 +1,117 @@
+import json
+import subprocess
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from rlgym_tools.rocket_league.replays.parsed_replay import ParsedReplay
+from rocketxg.utils.columns import STATE_COLUMNS, PLAYER_COLUMNS
+
+BLUE = "1001"
+ORANGE = "2002"
+PLAYERS = {
+    BLUE: {"name": "blue", "online_id": "76561198000000001", "is_orange": False},
+    ORANGE: {"name": "orange", "online_id": "76561198000000002", "is_orange": True},
+}
+# Hits of the default replay: (frame, player, ball state at the hit). Blue shoots
+# wide at 30, on target at 250 (saved at 260) and scores from 400. A player's last
+# possession is never a shot for find_shots, so blue touches the ball once more
+HITS = [
+    (10, BLUE, "away"),
+    (20, ORANGE, "away"),
+    (30, BLUE, "shot"),
+    (200, ORANGE, "away"),
+    (210, ORANGE, "away"),
+    (250, BLUE, "goal"),
+    (260, ORANGE, "away"),
+    (400, BLUE, "goal"),
+    (500, ORANGE, "away"),
+    (550, BLUE, "away"),
+]
+GOALS = [(430, False)]
+
+
+def ball_state(kind: str, is_orange: bool) -> np.ndarray:
+    """
+    Ball state (STATE_COLUMNS) right after a hit by a team: "goal" flies into the
+    attacked goal, "shot" comes within the shot threshold above the crossbar and
+    "away" rolls toward the hitter's own goal, so it is never a shot.
+    """
+    direction = -1 if is_orange else 1
+    pos, vel = {
+        "goal": ((0, 3500, 300), (0, 3000, 0)),
+        "shot": ((0, 4200, 1200), (0, 1500, 0)),
+        "away": ((0, 0, 93), (0, -1000, 0)),
+    }[kind]
+    return np.array([
+        pos[0], direction * pos[1], pos[2],
+        vel[0], direction * vel[1], vel[2],
+        0, 0, 0,
+        1, 0, 0, 0
+    ], dtype=np.float64)
+
+
+def make_replay(hits=HITS, goals=GOALS, num_frames: int = 600) -> ParsedReplay:
+    """
+    Small 1v1 replay. The ball holds the state of the last hit until the next one,
+    so features and simulations read the state given for every hit frame.
+    """
+    ball = np.tile(ball_state("away", False), (num_frames, 1))
+    hit_team = np.full(num_frames, np.nan)
+    for frame, player, kind in hits:
+        is_orange = PLAYERS[player]["is_orange"]
+        ball[frame:] = ball_state(kind, is_orange)
+        hit_team[frame:] = float(is_orange)
+    ball_df = pd.DataFrame(ball, columns=STATE_COLUMNS).astype(np.float32)
+    ball_df["hit_team_num"] = hit_team
+
+    player_dfs = {}
+    for i, player in enumerate(PLAYERS):
+        state = np.zeros((num_frames, len(PLAYER_COLUMNS)))
+        state[:, 0] = 1000 * (i + 1)
+        state[:, 1] = np.linspace(-2000, 2000, num_frames)
+        state[:, 2] = 17
+        state[:, 9] = 1
+        state[:, PLAYER_COLUMNS.index("boost_amount")] = 33
+        player_dfs[player] = pd.DataFrame(state, columns=PLAYER_COLUMNS).astype(np.float32)
+
+    metadata = {
+        "players": [
+            {"unique_id": player, "online_id_kind": "Steam", **info}
+            for player, info in PLAYERS.items()
+        ],
+        "game": {"goals": [
+            {"frame": frame, "player_name": "", "is_orange": is_orange}
+            for frame, is_orange in goals
+        ]},
+        "demos": [],
+    }
+    analyzer = {
+        "hits": [{"frame_number": frame, "player_unique_id": player} for frame, player, _ in hits],
+        "gameplay_periods": [{"start_frame": 0, "end_frame": num_frames - 1}],
+    }
+    game_df = pd.DataFrame({"time": np.arange(num_frames) / 30, "delta": 1 / 30})
+    return ParsedReplay(metadata, analyzer, game_df, ball_df, player_dfs)
+
+
+def write_parsed(replay: ParsedReplay, folder: Path) -> Path:
+    """Writes a replay in the layout carball uses, for ParsedReplay.load."""
+    folder.mkdir(parents=True, exist_ok=True)
+    replay.ball_df.to_parquet(folder / "__ball.parquet")
+    replay.game_df.to_parquet(folder / "__game.parquet")
+    for player, player_df in replay.player_dfs.items():
+        player_df.to_parquet(folder / f"player_{player}.parquet")
+    with open(folder / "metadata.json", "w") as file:
+        json.dump(replay.metadata, file)
+    with open(folder / "analyzer.json", "w") as file:
+        json.dump(replay.analyzer, file)
+    return folder
+
+
+def fake_process_replay(replay_path, output_folder, carball_path=None, skip_existing=True):
+    """
+    Stands in for the carball subprocess of rlgym_tools' process_replay, writing
+    make_replay() into output_folder/<replay name> like it does.
+    """
+    folder = Path(output_folder) / Path(replay_path).name.replace(".replay", "")
+    write_parsed(make_replay(), folder)
+    return subprocess.CompletedProcess(args=[], returncode=0)
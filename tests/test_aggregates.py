@@ -0,0 +1,157 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from database.aggregates import (
+    PLAYER_STATS,
+    TEAM_STATS,
+    AggregateStore,
+    ReplayStats,
+    canonical_player_ids,
+    replay_stats,
+    roster_key
+)
+from database.models import Base, PlayerAggregate, TeamAggregate
+from rocketxg.context import ReplayContext
+from rocketxg.features import find_shots
+from replays import BLUE, ORANGE, PLAYERS, make_replay
+
+BLUE_ID = f"Steam:{PLAYERS[BLUE]['online_id']}"
+ORANGE_ID = f"Steam:{PLAYERS[ORANGE]['online_id']}"
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def store(session) -> AggregateStore:
+    return AggregateStore(session.bind.dialect.name)
+
+
+def row(is_orange: bool, columns=PLAYER_STATS, **values) -> dict:
+    return {"is_orange": is_orange, **{column: values.get(column, 0) for column in columns}}
+
+
+def stats(blue_goals=0, orange_goals=0, blue=BLUE_ID, orange=ORANGE_ID) -> ReplayStats:
+    """Stats of a 1v1 replay whose teams are named by their rosters."""
+    return ReplayStats(
+        players={
+            blue: {"name": "blue", "platform": "Steam", **row(False, goals=blue_goals, hits=5)},
+            orange: {"name": "orange", "platform": "Steam", **row(True, goals=orange_goals, hits=4)},
+        },
+        teams={
+            roster_key([blue]): row(False, TEAM_STATS, goals=blue_goals, hits=5, chains=3),
+            roster_key([orange]): row(True, TEAM_STATS, goals=orange_goals, hits=4, chains=2),
+        }
+    )
+
+
+def player_totals(session):
+    return {
+        player_id: (games, goals, hits)
+        for player_id, games, goals, hits in session.execute(select(
+            PlayerAggregate.player_id, PlayerAggregate.games,
+            PlayerAggregate.goals, PlayerAggregate.hits
+        ))
+    }
+
+
+def team_totals(session):
+    return {
+        team: (games, goals, chains)
+        for team, games, goals, chains in session.execute(select(
+            TeamAggregate.team, TeamAggregate.games, TeamAggregate.goals, TeamAggregate.chains
+        ))
+    }
+
+
+def test_ingest_sums_replays(session, store):
+    store.ingest(session, "a", stats(blue_goals=2))
+    store.ingest(session, "b", stats(blue_goals=1, orange_goals=3))
+    session.commit()
+
+    assert player_totals(session) == {BLUE_ID: (2, 3, 10), ORANGE_ID: (2, 3, 8)}
+    assert team_totals(session) == {BLUE_ID: (2, 3, 6), ORANGE_ID: (2, 3, 4)}
+    assert store.leaderboard(session, "goals", per_game=True) == [
+        (BLUE_ID, "blue", 2, 1.5), (ORANGE_ID, "orange", 2, 1.5)
+    ]
+
+
+def test_ingest_again_replaces_contribution(session, store):
+    store.ingest(session, "a", stats(blue_goals=2))
+    store.ingest(session, "b", stats(orange_goals=1))
+    store.ingest(session, "a", stats(blue_goals=1, orange="Steam:3"))
+    session.commit()
+
+    # The orange player of "a" was someone else after all
+    assert player_totals(session) == {
+        BLUE_ID: (2, 1, 10), ORANGE_ID: (1, 1, 4), "Steam:3": (1, 0, 4)
+    }
+    assert team_totals(session)[BLUE_ID] == (2, 1, 6)
+    store.rebuild(session)
+    assert player_totals(session) == {
+        BLUE_ID: (2, 1, 10), ORANGE_ID: (1, 1, 4), "Steam:3": (1, 0, 4)
+    }
+
+
+def test_remove(session, store):
+    store.ingest(session, "a", stats(blue_goals=2))
+    store.ingest(session, "b", stats(blue_goals=1))
+    store.remove(session, "a")
+    session.commit()
+
+    assert player_totals(session)[BLUE_ID] == (1, 1, 5)
+    store.remove(session, "b")
+    assert player_totals(session)[BLUE_ID] == (0, 0, 0)
+    assert store.leaderboard(session, "goals") == []
+
+
+def test_name_teams_without_history_names_blue_team1(session, store):
+    named = store.name_teams(session, stats(), ("Blue Team", "Orange Team"))
+
+    assert {team: row["is_orange"] for team, row in named.teams.items()} == {
+        "Blue Team": False, "Orange Team": True
+    }
+    assert named.players == stats().players
+
+
+def test_name_teams_follows_rosters_across_sides(session, store):
+    store.ingest(session, "a", store.name_teams(session, stats(), ("Blue Team", "Orange Team")))
+
+    # The blue player of "a" plays orange in "b"
+    swapped = stats(blue=ORANGE_ID, orange=BLUE_ID, blue_goals=1)
+    named = store.name_teams(session, swapped, ("Blue Team", "Orange Team"))
+
+    assert named.teams["Orange Team"]["is_orange"] is False
+    assert named.teams["Orange Team"]["goals"] == 1
+    assert named.teams["Blue Team"]["is_orange"] is True
+    store.ingest(session, "b", named)
+    assert team_totals(session) == {"Blue Team": (2, 0, 5), "Orange Team": (2, 1, 5)}
+
+
+@pytest.mark.parametrize("names", [(None, "Orange Team"), ("Blue Team", "Blue Team")])
+def test_name_teams_keeps_rosters_without_two_names(session, store, names):
+    assert store.name_teams(session, stats(), names) == stats()
+
+
+def test_replay_stats_of_shots():
+    context = ReplayContext(make_replay())
+    shots, players = find_shots(context)
+    xg = dict(zip(zip(shots["frame"], shots["shooter_id"]), [0.1, 0.2, 0.5]))
+    # Shots of other players at the same frames aren't blue's
+    xg[(30, ORANGE)] = 0.9
+
+    result = replay_stats(context, players, xg)
+
+    ids = canonical_player_ids(context.replay.metadata["players"])
+    assert ids == {BLUE: BLUE_ID, ORANGE: ORANGE_ID}
+    blue = result.players[BLUE_ID]
+    assert (blue["shots"], blue["goals"], blue["hits"]) == (3, 1, 5)
+    assert blue["xg"] == pytest.approx(0.8)
+    assert result.players[ORANGE_ID]["xg"] == 0
+    assert result.teams[roster_key([BLUE_ID])]["xg"] == pytest.approx(0.8)
+    assert result.teams[roster_key([ORANGE_ID])]["is_orange"] is True
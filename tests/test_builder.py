@@ -0,0 +1,116 @@
+import shutil
+import subprocess
+import pytest
+from sqlalchemy import func, select
+from database import builder
+from database.builder import RLCSParser
+from database.models import Event, IngestManifest, Match, Replay, ReplayCatalog, Season, Split
+from rocketxg.frame_store import FrameStore
+from replays import fake_process_replay
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    calls = []
+
+    def process_replay(replay_path, output_folder, **kwargs):
+        calls.append(replay_path)
+        return fake_process_replay(replay_path, output_folder, **kwargs)
+
+    monkeypatch.setattr(builder, "process_replay", process_replay)
+    return calls
+
+
+@pytest.fixture
+def parser(tmp_path) -> RLCSParser:
+    return RLCSParser(
+        f"sqlite:///{tmp_path / 'rlcs.db'}", tmp_path / "parsed", frame_dir=tmp_path / "frames"
+    )
+
+
+def count(parser: RLCSParser, model) -> int:
+    with parser.Session() as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def statuses(parser: RLCSParser):
+    with parser.Session() as session:
+        return sorted(session.scalars(select(IngestManifest.status)))
+
+
+def test_registers_replays_with_their_parsed_folder(parser, raw_dir, parse_calls):
+    parser.process_directory(raw_dir)
+
+    assert len(parse_calls) == 2
+    with parser.Session() as session:
+        catalog = session.scalars(select(ReplayCatalog).order_by(ReplayCatalog.game_number)).all()
+    assert [entry.game_number for entry in catalog] == [1, 2]
+    for entry in catalog:
+        assert entry.season_name == "RLCS 2024"
+        assert entry.event_name == "Regional 1"
+        assert (entry.team1, entry.team2) == ("Blue Team", "Orange Team")
+        # process_replay writes into a folder named after the replay file
+        assert entry.parsed_path.endswith(f"game{entry.game_number}")
+        assert (parser.parsed_dir / entry.replay_hash / f"game{entry.game_number}"
+                / "metadata.json").exists()
+        assert entry.replay_hash in FrameStore(parser.frame_dir)
+
+
+def test_second_run_skips_unchanged_replays(parser, raw_dir, parse_calls):
+    parser.process_directory(raw_dir)
+    parser.process_directory(raw_dir)
+
+    assert len(parse_calls) == 2
+    assert count(parser, Replay) == 2
+    assert count(parser, ReplayCatalog) == 2
+    assert count(parser, Season) == 1
+    assert count(parser, Event) == 1
+    assert count(parser, Match) == 1
+    assert statuses(parser) == ["parsed", "parsed"]
+
+
+def test_copies_are_recorded_as_duplicates(parser, raw_dir, parse_calls):
+    original = next(raw_dir.rglob("game1.replay"))
+    shutil.copy(original, original.with_name("game3.replay"))
+
+    parser.process_directory(raw_dir)
+
+    assert len(parse_calls) == 2
+    assert count(parser, Replay) == 2
+    assert statuses(parser) == ["duplicate", "parsed", "parsed"]
+
+
+def test_new_parser_reuses_hierarchy_rows(parser, raw_dir, parse_calls, tmp_path):
+    parser.process_directory(raw_dir)
+    match_dir = next(raw_dir.rglob("game1.replay")).parent
+    (match_dir / "game3.replay").write_bytes(b"replay 3")
+
+    # A new parser starts with an empty id cache, so the rows are looked up
+    RLCSParser(parser.engine.url, tmp_path / "parsed").process_directory(raw_dir)
+
+    assert count(parser, Replay) == 3
+    assert count(parser, Event) == 1
+    assert count(parser, Match) == 1
+
+
+def test_failed_parse_is_recorded(parser, raw_dir, monkeypatch):
+    def failing_process_replay(replay_path, output_folder, **kwargs):
+        return subprocess.CompletedProcess(args=[], returncode=1)
+
+    monkeypatch.setattr(builder, "process_replay", failing_process_replay)
+    parser.process_directory(raw_dir)
+
+    assert count(parser, Replay) == 0
+    assert statuses(parser) == ["failed", "failed"]
+
+
+def test_get_or_create_matches_missing_parents(parser):
+    with parser.Session() as session:
+        season = parser._get_or_create(session, Season, name="RLCS 2024")
+        split = parser._get_or_create(session, Split, season_id=season, name="Major 1")
+        first = parser._get_or_create(session, Event, region_id=None, split_id=split, name="Major")
+        parser._cache.clear()
+        second = parser._get_or_create(session, Event, region_id=None, split_id=split, name="Major")
+        session.commit()
+    assert first == second
+    assert count(parser, Event) == 1
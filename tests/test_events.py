@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from database.aggregates import canonical_player_ids
+from database.events import EventStore, event_rows
+from database.models import Base, Hit, Possession, PossessionChain, ReplayCatalog
+from database.queries import query_hits
+from rocketxg.possessions.possession import PossessionAnalyzer
+from replays import BLUE, HITS, make_replay
+
+BLUE_ID = canonical_player_ids(make_replay().metadata["players"])[BLUE]
+
+
+@pytest.fixture(scope="module")
+def chains():
+    _, _, chains = PossessionAnalyzer().analyze_replay(make_replay())
+    return chains
+
+
+@pytest.fixture
+def store(tmp_path) -> EventStore:
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([
+            ReplayCatalog(replay_hash="a", season_name="RLCS 2024", event_name="Major 1"),
+            ReplayCatalog(replay_hash="b", season_name="RLCS 2025", event_name="Major 1"),
+        ])
+        session.commit()
+    return EventStore(engine)
+
+
+def count(store: EventStore, model, replay_hash: str) -> int:
+    with Session(store.engine) as session:
+        return session.scalar(
+            select(func.count()).select_from(model).where(model.replay_hash == replay_hash)
+        )
+
+
+def hit_frames(store: EventStore, **filters):
+    with Session(store.engine) as session:
+        query = query_hits(session.query(Hit.replay_hash, Hit.frame_number), **filters)
+        return sorted(tuple(row) for row in query.all())
+
+
+def test_write_counts_rows(store, chains):
+    written = store.write("a", chains)
+
+    assert written == {
+        "possession_chains": len(chains),
+        "possessions": sum(len(chain.possessions) for chain in chains),
+        "hits": len(HITS),
+    }
+    assert count(store, Hit, "a") == len(HITS)
+
+
+def test_write_replaces_replay(store, chains):
+    store.write("a", chains)
+    store.write("b", chains)
+    store.write_rows("a", event_rows("a", chains[:2]))
+
+    assert count(store, PossessionChain, "a") == 2
+    assert count(store, Hit, "a") == chains[0].num_hits + chains[1].num_hits
+    assert count(store, Hit, "b") == len(HITS)
+
+    store.remove("a")
+    assert count(store, Possession, "a") == 0
+    assert count(store, Hit, "b") == len(HITS)
+
+
+def test_event_rows_use_player_ids(chains):
+    ids = canonical_player_ids(make_replay().metadata["players"])
+    _, possessions, hits = event_rows("a", chains, ids)
+
+    assert {row["player_id"] for row in possessions} == set(ids.values())
+    assert [row["hit_index"] for row in hits] == list(range(len(HITS)))
+    assert [row["frame_number"] for row in hits] == [frame for frame, _, _ in HITS]
+
+
+def test_query_shots_includes_goals(store, chains):
+    store.write("a", chains, canonical_player_ids(make_replay().metadata["players"]))
+
+    assert hit_frames(store, hit_type="shot") == [("a", 30), ("a", 250), ("a", 400)]
+    assert hit_frames(store, hit_type="shot", on_goal=True) == [("a", 250), ("a", 400)]
+    assert hit_frames(store, hit_type="shot", on_goal=False) == [("a", 30)]
+    assert hit_frames(store, hit_type="goal") == [("a", 400)]
+    assert hit_frames(store, hit_type="shot", player_id=BLUE_ID) == [
+        ("a", 30), ("a", 250), ("a", 400)
+    ]
+    assert hit_frames(store, hit_type="shot", player_id=BLUE) == []
+
+
+def test_query_hits_by_catalog(store, chains):
+    store.write("a", chains)
+    store.write("b", chains)
+
+    assert len(hit_frames(store, hit_type="goal")) == 2
+    assert hit_frames(store, hit_type="goal", season="RLCS 2025") == [("b", 400)]
+    assert hit_frames(store, hit_type="goal", event="Major 2") == []
+    with Session(store.engine) as session:
+        outcomes = session.execute(
+            select(Hit.outcome, func.count()).where(Hit.replay_hash == "a")
+            .group_by(Hit.outcome).order_by(Hit.outcome)
+        ).all()
+    assert [tuple(row) for row in outcomes] == [(None, 7), ("goal", 1), ("save", 1), ("wide", 1)]
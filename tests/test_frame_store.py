@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from rocketxg.context import ReplayContext
+from rocketxg.frame_store import CONTEXT_COLUMNS, FrameStore
+from rocketxg.timeline import HIT
+from replays import BLUE, ORANGE
+
+
+def test_write_and_load_round_trip(tmp_path, replay):
+    store = FrameStore(tmp_path)
+    assert "abc" not in store
+
+    store.write("abc", replay)
+
+    assert "abc" in store
+    assert store.players("abc") == sorted([BLUE, ORANGE])
+    frames = store.load("abc", ["pos", "boost"])
+    assert frames.ball.column_names == ["pos_x", "pos_y", "pos_z"]
+    assert frames.players[BLUE].column_names == ["pos_x", "pos_y", "pos_z", "boost_amount"]
+    np.testing.assert_allclose(
+        frames.ball_df.to_numpy(), replay.ball_df[["pos_x", "pos_y", "pos_z"]].to_numpy()
+    )
+    assert frames.metadata == replay.metadata
+    assert frames.analyzer == replay.analyzer
+
+
+def test_write_parsed_matches_write(tmp_path, replay, parsed_replay):
+    store = FrameStore(tmp_path)
+    store.write("loaded", replay)
+    store.write_parsed("parsed", parsed_replay)
+
+    loaded = store.load("loaded", CONTEXT_COLUMNS)
+    parsed = store.load("parsed", CONTEXT_COLUMNS)
+    assert parsed.ball.equals(loaded.ball)
+    assert parsed.players.keys() == loaded.players.keys()
+    for player, table in loaded.players.items():
+        assert parsed.players[player].equals(table)
+    assert parsed.metadata == loaded.metadata
+
+
+def test_incomplete_replay_is_not_in_store(tmp_path, replay):
+    store = FrameStore(tmp_path)
+    store.write("abc", replay)
+    (tmp_path / "abc" / "metadata.json").unlink()
+    assert "abc" not in store
+
+
+def test_context_from_frames_matches_replay(tmp_path, replay):
+    store = FrameStore(tmp_path)
+    store.write("abc", replay)
+
+    context = ReplayContext.from_frames(store.load("abc", CONTEXT_COLUMNS))
+    expected = ReplayContext(replay)
+
+    # Frames are stored as float32, like carball writes them
+    np.testing.assert_array_equal(context.ball, expected.ball)
+    np.testing.assert_array_equal(context.ball_team, expected.ball_team)
+    assert context.player_states.keys() == expected.player_states.keys()
+    for player, states in expected.player_states.items():
+        np.testing.assert_array_equal(context.player_states[player], states)
+    assert context.teams == expected.teams
+    assert context.players.keys() == expected.players.keys()
+    assert context.timeline.count(HIT) == expected.timeline.count(HIT)
+
+
+def test_context_from_frames_needs_metadata(tmp_path, replay):
+    store = FrameStore(tmp_path)
+    store.write("abc", replay)
+    frames = store.load("abc", CONTEXT_COLUMNS)
+    frames.metadata = None
+    with pytest.raises(ValueError):
+        ReplayContext.from_frames(frames)
@@ -0,0 +1,118 @@
+import pytest
+from rocketxg.possessions.possession import PossessionAnalyzer
+from rocketxg.records import HitType, Outcome, Team
+from replays import BLUE, ORANGE, make_replay
+
+
+def summary(chains):
+    """Everything the analyzer decides about the chains, without the objects."""
+    return [
+        (
+            chain.start_frame, chain.end_frame, chain.team, chain.duration, chain.outcome,
+            [
+                (
+                    possession.start_frame, possession.end_frame, possession.player_id,
+                    possession.team, possession.duration, possession.is_dribble,
+                    [
+                        (hit.frame_number, hit.player_id, hit.team,
+                         hit.hit_type, hit.outcome, hit.on_goal)
+                        for hit in possession.hits
+                    ]
+                )
+                for possession in chain.possessions
+            ]
+        )
+        for chain in chains
+    ]
+
+
+def with_unknown_first_hit(replay):
+    """Adds a first hit by a player missing from the metadata, so without a team."""
+    replay.analyzer["hits"].insert(0, {"frame_number": 5, "player_unique_id": "spectator"})
+    return replay
+
+
+REPLAYS = {
+    "default": make_replay,
+    "no team": lambda: with_unknown_first_hit(make_replay()),
+    "gaps and dribbles": lambda: make_replay(hits=[
+        (10, BLUE, "away"), (14, BLUE, "away"), (18, BLUE, "away"),
+        (200, BLUE, "away"), (205, ORANGE, "away"), (210, BLUE, "shot"),
+        (300, ORANGE, "away"),
+    ], goals=[]),
+}
+
+
+@pytest.mark.parametrize("name", REPLAYS)
+def test_stream_matches_batch(name):
+    replay = REPLAYS[name]()
+    _, _, batch = PossessionAnalyzer().analyze_replay(replay)
+    streamed = list(PossessionAnalyzer().stream(replay))
+    assert summary(streamed) == summary(batch)
+
+
+def test_chain_outcomes():
+    _, _, chains = PossessionAnalyzer().analyze_replay(make_replay())
+
+    last_hits = [chain.possessions[-1].hits[-1] for chain in chains]
+    assert [(hit.frame_number, chain.outcome) for hit, chain in zip(last_hits, chains)] == [
+        (10, Outcome.TURNOVER),
+        (20, Outcome.TURNOVER),
+        (30, Outcome.SHOT),
+        (210, Outcome.TURNOVER),
+        (250, Outcome.SHOT),
+        (260, Outcome.TURNOVER),
+        (400, Outcome.GOAL),
+        (500, Outcome.TURNOVER),
+        (550, Outcome.TURNOVER),
+    ]
+    shots = {hit.frame_number: (hit.hit_type, hit.outcome, hit.on_goal) for hit in last_hits}
+    assert shots[30] == (HitType.SHOT, Outcome.WIDE, False)
+    assert shots[250] == (HitType.SHOT, Outcome.SAVE, True)
+    assert shots[400] == (HitType.GOAL, Outcome.GOAL, True)
+
+
+def test_chain_without_team():
+    _, _, chains = PossessionAnalyzer().analyze_replay(with_unknown_first_hit(make_replay()))
+
+    assert (chains[0].start_frame, chains[0].team, chains[0].outcome) == (5, None, None)
+    assert chains[1].team == Team.BLUE
+
+
+def test_gaps_and_dribbles():
+    _, _, chains = PossessionAnalyzer().analyze_replay(REPLAYS["gaps and dribbles"]())
+
+    # More than max_possession_gap frames between 18 and 200 ends the chain
+    assert [(chain.start_frame, chain.end_frame) for chain in chains] == [
+        (10, 18), (200, 200), (205, 205), (210, 210), (300, 300)
+    ]
+    assert chains[0].possessions[0].is_dribble
+    assert chains[0].duration == pytest.approx(8 / 30)
+    assert chains[3].outcome == Outcome.SHOT
+
+
+def test_feed_emits_chains_once_their_goal_is_known():
+    replay = make_replay()
+    analyzer = PossessionAnalyzer()
+    analyzer.start_replay(replay)
+
+    emitted = {}
+    for hit in replay.analyzer["hits"]:
+        for chain in analyzer.feed(hit):
+            emitted[chain.start_frame] = hit["frame_number"]
+    for chain in analyzer.flush():
+        emitted[chain.start_frame] = None
+
+    # A chain is emitted, in order, once its team touches the ball again or the
+    # hit after its team's next goal is seen: the chain at 400 scored at 430
+    assert emitted == {
+        10: 30, 20: 30, 30: 250, 200: 250, 250: 400, 260: 400,
+        400: 500, 500: 550, 550: None,
+    }
+
+
+def test_analyzer_is_reused_across_replays():
+    analyzer = PossessionAnalyzer()
+    first = summary(analyzer.stream(make_replay()))
+    second = summary(analyzer.stream(make_replay()))
+    assert first == second
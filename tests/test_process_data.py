@@ -0,0 +1,101 @@
+from pathlib import Path
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select, update
+from sqlalchemy.orm import Session
+import process_data
+from database import builder
+from database.builder import RLCSParser
+from database.models import Hit, ReplayCatalog, TeamReplayStats
+from rocketxg.dataset import load_shots
+from replays import HITS, fake_process_replay
+
+
+@pytest.fixture
+def database_url(tmp_path, raw_dir, monkeypatch) -> str:
+    """Catalog of the two replays in raw_dir."""
+    monkeypatch.setattr(builder, "process_replay", fake_process_replay)
+    url = f"sqlite:///{tmp_path / 'rlcs.db'}"
+    RLCSParser(url, tmp_path / "parsed").process_directory(raw_dir)
+    return url
+
+
+def catalog(database_url: str):
+    with Session(create_engine(database_url)) as session:
+        return session.execute(select(ReplayCatalog.replay_hash, ReplayCatalog.parsed_path)).all()
+
+
+def test_jobs_from_catalog(database_url):
+    jobs = list(process_data.jobs_from_catalog(database_url))
+
+    assert sorted(job.replay_hash for job in jobs) == sorted(h for h, _ in catalog(database_url))
+    for job in jobs:
+        assert (job.season, job.event) == ("RLCS 2024", "Regional 1")
+        assert (job.team1, job.team2) == ("Blue Team", "Orange Team")
+        assert (job.path / "metadata.json").exists()
+
+
+def test_parsed_folder_of_old_catalog_entries(parsed_replay):
+    # Catalogs used to store parsed_dir/<hash>, the parent of the parsed folder
+    assert process_data.parsed_folder(parsed_replay.parent) == parsed_replay
+    assert process_data.parsed_folder(parsed_replay) == parsed_replay
+
+
+def test_run_from_catalog(tmp_path, database_url):
+    out_dir = tmp_path / "shots"
+    failures = process_data.run(None, out_dir, workers=1, database_url=database_url)
+
+    assert failures == {}
+    shots = load_shots(out_dir)
+    hashes = sorted(h for h, _ in catalog(database_url))
+    assert sorted(shots["replay_hash"].unique()) == hashes
+    assert shots.groupby("replay_hash").size().tolist() == [3, 3]
+    assert shots["is_goal"].sum() == 2
+    assert set(shots["event"]) == {"Regional 1"}
+
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        teams = session.execute(
+            select(TeamReplayStats.team, TeamReplayStats.is_orange).distinct()
+        ).all()
+        hits = session.scalar(select(func.count()).select_from(Hit))
+    assert sorted(teams) == [("Blue Team", False), ("Orange Team", True)]
+    assert hits == 2 * len(HITS)
+
+
+def test_run_from_old_catalog_paths(tmp_path, database_url):
+    engine = create_engine(database_url)
+    with Session(engine) as session:
+        for replay_hash, parsed_path in catalog(database_url):
+            session.execute(
+                update(ReplayCatalog)
+                .where(ReplayCatalog.replay_hash == replay_hash)
+                .values(parsed_path=str(Path(parsed_path).parent))
+            )
+        session.commit()
+
+    failures = process_data.run(None, tmp_path / "shots", workers=1, database_url=database_url)
+
+    assert failures == {}
+    assert len(load_shots(tmp_path / "shots")) == 6
+
+
+def test_frame_store_is_used_on_later_runs(tmp_path, database_url, monkeypatch):
+    frame_dir = tmp_path / "frames"
+    process_data.run(
+        None, tmp_path / "first", workers=1, database_url=database_url, frame_dir=frame_dir
+    )
+
+    def load(path):
+        raise AssertionError(f"{path} was loaded although it is in the frame store")
+
+    monkeypatch.setattr(process_data.ParsedReplay, "load", load)
+    failures = process_data.run(
+        None, tmp_path / "second", workers=1, database_url=database_url, frame_dir=frame_dir
+    )
+
+    assert failures == {}
+    order = ["replay_hash", "ball_pos_y"]
+    first = load_shots(tmp_path / "first").sort_values(order, ignore_index=True)
+    second = load_shots(tmp_path / "second").sort_values(order, ignore_index=True)
+    pd.testing.assert_frame_equal(first, second)
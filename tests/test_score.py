@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+from rocketxg import score
+from rocketxg.context import ReplayContext
+from rocketxg.features import (
+    SHOTS,
+    FeatureCache,
+    FeatureExtractor,
+    extract_features,
+    find_shots
+)
+from rocketxg.possessions.possession import PossessionAnalyzer
+from rocketxg.score import XGScorer, assign_xg
+from rocketxg.train import save_model
+from replays import BLUE, make_replay
+
+
+@pytest.fixture(scope="module")
+def shots():
+    return find_shots(ReplayContext(make_replay()))[0]
+
+
+@pytest.fixture(scope="module")
+def features(shots):
+    return extract_features(ReplayContext(make_replay()), shots)
+
+
+@pytest.fixture(scope="module")
+def model_dir(tmp_path_factory, features):
+    columns = [column for column in features.columns if column != "is_goal"]
+    data = xgb.DMatrix(features[columns].to_numpy(np.float32), label=features["is_goal"])
+    booster = xgb.train({"objective": "binary:logistic", "max_depth": 2}, data, num_boost_round=3)
+    return save_model(booster, columns, tmp_path_factory.mktemp("models"), "v1")
+
+
+def test_feature_matrix_follows_schema_order():
+    scorer = XGScorer(xgb.Booster(), ["b", "a"], "v1")
+    features = pd.DataFrame({"a": [1.0, 2.0], "b": [3, 4], "is_goal": [True, False]})
+
+    matrix = scorer.feature_matrix(features)
+
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix, [[3, 1], [4, 2]])
+
+
+def test_feature_matrix_rejects_missing_columns():
+    scorer = XGScorer(xgb.Booster(), ["a", "c"], "v1")
+    with pytest.raises(ValueError, match=r"\['c'\]"):
+        scorer.feature_matrix(pd.DataFrame({"a": [1.0]}))
+
+
+def test_load_and_predict(model_dir, features):
+    scorer = XGScorer.load(model_dir.parent)
+
+    assert scorer.version == "v1"
+    matrix = scorer.feature_matrix(features)
+    xg = scorer.predict_proba(matrix)
+    np.testing.assert_allclose(xg, scorer.booster.predict(xgb.DMatrix(matrix)), rtol=1e-6)
+    assert ((xg > 0) & (xg < 1)).all()
+    assert scorer.predict_proba(matrix[:0]).shape == (0,)
+
+
+def test_score_replay_with_and_without_cache(tmp_path, parsed_replay, model_dir, monkeypatch):
+    scorer = XGScorer.load(model_dir)
+    scored = score.score_replay(parsed_replay, scorer)
+    assert scored["frame"].tolist() == [30, 250, 400]
+    assert (scored["model_version"] == "v1").all()
+
+    cache = FeatureCache(tmp_path / "features")
+    # Read back from parquet, shooter_id may come back as a string dtype
+    cached = score.score_replay(parsed_replay, scorer, cache, "abc")
+    pd.testing.assert_frame_equal(cached, scored, check_dtype=False)
+
+    def load(path):
+        raise AssertionError(f"{path} was loaded although its features are cached")
+
+    monkeypatch.setattr(score.ParsedReplay, "load", load)
+    pd.testing.assert_frame_equal(
+        score.score_replay(parsed_replay, scorer, cache, "abc"), scored, check_dtype=False
+    )
+
+
+def test_feature_cache_recomputes_stale_groups(tmp_path, shots):
+    calls = []
+
+    def constant(context, shots):
+        calls.append(len(shots))
+        return pd.DataFrame({"constant": np.ones(len(shots))})
+
+    cache = FeatureCache(tmp_path, {"constant": FeatureExtractor("constant", 1, constant)})
+    context = ReplayContext(make_replay())
+    load_context = lambda: context
+
+    assert cache.stale("abc") == [SHOTS, "constant"]
+    first = cache.features("abc", load_context)
+    assert cache.stale("abc") == []
+    assert cache.features("abc", lambda: pytest.fail("nothing is stale")).equals(first)
+
+    # A group whose rows don't match the shots is recomputed, the shots are kept
+    cache.write("constant", "abc", pd.DataFrame({"constant": [1.0]}))
+    assert cache.stale("abc") == ["constant"]
+    cache.features("abc", load_context, lambda context: pytest.fail("shots are fresh"))
+    assert calls == [len(shots), len(shots)]
+
+    # A new extractor version is a new group
+    cache = FeatureCache(tmp_path, {"constant": FeatureExtractor("constant", 2, constant)})
+    assert cache.stale("abc") == ["constant"]
+
+
+def test_assign_xg_matches_frame_and_shooter(shots):
+    _, _, chains = PossessionAnalyzer().analyze_replay(make_replay())
+    # A shot by someone else at the same frame must not be matched
+    others = pd.DataFrame({"frame": [30], "shooter_id": ["someone"], "is_goal": [False]})
+    table = pd.concat([shots, others], ignore_index=True)
+
+    hits = assign_xg(chains, table, [0.1, 0.2, 0.5, 0.9])
+
+    assert [(hit.frame_number, hit.player_id, hit.xg) for hit in hits] == [
+        (30, BLUE, 0.1), (250, BLUE, 0.2), (400, BLUE, 0.5)
+    ]
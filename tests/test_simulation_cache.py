@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from rocketxg.context import ReplayContext
+from rocketxg.simulator.ball_simulator import BallSimulator, STATE_SIZE, pack_states
+from rocketxg.simulator.cache import QUANTUM, TICK_RATE, SimulationCache
+
+
+class FakeSimulator:
+    """simulate() hook answering every state with the same result row, counting calls."""
+    def __init__(self, shot_tick=-1, goal_tick=-1, terminated=False):
+        self.shot_tick = shot_tick
+        self.goal_tick = goal_tick
+        self.terminated = terminated
+        self.simulated = 0
+
+    def __call__(self, states, teams, time):
+        self.simulated += len(states)
+        ticks = round(TICK_RATE * time)
+        row = [self.shot_tick, self.goal_tick, ticks, self.terminated]
+        return np.array([row] * len(states), dtype=np.int64)
+
+
+@pytest.fixture
+def states():
+    # On the quantization grid, so small offsets stay in the same cell
+    states = np.random.default_rng(0).normal(size=(4, STATE_SIZE)) * 1000
+    return np.round(states / QUANTUM) * QUANTUM
+
+
+def test_key_depends_on_team_and_threshold(states):
+    cache = SimulationCache()
+    assert cache.key(states[0], False) != cache.key(states[0], True)
+    assert cache.key(states[0], False) != SimulationCache(shot_threshold=400).key(states[0], False)
+    assert cache.key(states[0], False) == cache.key(states[0] + QUANTUM / 10, False)
+    assert cache.key(states[0], False) != cache.key(states[0] + QUANTUM * 10, False)
+
+
+def test_key_of_non_finite_state(states):
+    state = states[0].copy()
+    state[0] = np.nan
+    cache = SimulationCache()
+    assert cache.key(state, False) == cache.key(state, False)
+    state[0] = np.inf
+    assert cache.key(state, False) == cache.key(state, False)
+
+
+def test_verdicts_depend_on_horizon(states):
+    # Shot after 2s and goal after 2.5s, the simulation ran for 3s
+    simulate = FakeSimulator(shot_tick=2 * TICK_RATE, goal_tick=int(2.5 * TICK_RATE))
+    cache = SimulationCache()
+    teams = np.zeros(len(states), dtype=bool)
+
+    is_shot, on_goal = cache.simulate(states, teams, 3, simulate)
+    assert is_shot.all() and on_goal.all()
+
+    is_shot, on_goal = cache.simulate(states, teams, 1, simulate)
+    assert not is_shot.any() and not on_goal.any()
+    # The shorter horizon is answered by the stored 3s results
+    assert simulate.simulated == len(states)
+    assert cache.stats.hits == len(states)
+
+
+def test_longer_horizon_is_simulated_again(states):
+    simulate = FakeSimulator()
+    cache = SimulationCache()
+    teams = np.ones(len(states), dtype=bool)
+
+    cache.simulate(states, teams, 1, simulate)
+    cache.simulate(states, teams, 3, simulate)
+    assert simulate.simulated == 2 * len(states)
+
+    # Now the 3s results are stored and answer both horizons
+    cache.simulate(states, teams, 1, simulate)
+    cache.simulate(states, teams, 3, simulate)
+    assert simulate.simulated == 2 * len(states)
+
+
+def test_terminated_results_answer_any_horizon(states):
+    simulate = FakeSimulator(terminated=True)
+    cache = SimulationCache()
+    teams = np.zeros(len(states), dtype=bool)
+
+    cache.simulate(states, teams, 1, simulate)
+    cache.simulate(states, teams, 3, simulate)
+    assert simulate.simulated == len(states)
+
+
+def test_results_are_persisted(tmp_path, states):
+    path = tmp_path / "sim.sqlite"
+    teams = np.zeros(len(states), dtype=bool)
+    with SimulationCache(path) as cache:
+        cache.simulate(states, teams, 3, FakeSimulator(shot_tick=10))
+    # A shorter simulation doesn't replace the stored result
+    with SimulationCache(path) as cache:
+        cache.memory.clear()
+        cache.store([cache.key(states[0], False)], np.array([[-1, -1, TICK_RATE, 0]]))
+
+    simulate = FakeSimulator()
+    with SimulationCache(path) as cache:
+        is_shot, _ = cache.simulate(states, teams, 3, simulate)
+    assert simulate.simulated == 0
+    assert is_shot.all()
+
+
+def test_cached_verdicts_match_the_simulator(replay):
+    context = ReplayContext(replay)
+    frames = np.array([hit["frame_number"] for hit in replay.analyzer["hits"]])
+    teams = context.ball_team[frames].astype(bool)
+
+    cache = SimulationCache()
+    is_shot, on_goal = cache.simulate_frames(context, frames, teams, 3)
+
+    simulator = BallSimulator()
+    expected = simulator.simulate_states(pack_states(context, frames), teams, 3, adaptive=False)
+    np.testing.assert_array_equal(is_shot, expected[:, 0] >= 0)
+    np.testing.assert_array_equal(on_goal, expected[:, 1] >= 0)
+    assert is_shot.sum() == 3 and on_goal.sum() == 2